@@ -144,11 +144,31 @@ override_doctype_class = {
 # Hook on document methods and events
 
 doc_events = {
+	"Currency Exchange": {
+		"on_update": "onco.onco.exchange_rate_cache.invalidate_exchange_rates",
+		"on_trash": "onco.onco.exchange_rate_cache.invalidate_exchange_rates"
+	},
+	"Purchase Order": {
+		"validate": "onco.onco.importation_consumption.validate_purchase_order",
+		"on_submit": [
+			"onco.onco.importation_consumption.on_purchase_order_submit",
+			"onco.onco.supplier_notifications.queue_supplier_notification"
+		],
+		"on_cancel": "onco.onco.importation_consumption.on_purchase_order_cancel"
+	},
 	"Purchase Receipt": {
 		"on_submit": "onco.onco.doctype.shipments.shipments.on_purchase_receipt_submit"
 	},
 	"Sales Invoice": {
-		"validate": "onco.onco.tender_validation.validate_sales_invoice_tender_price"
+		"validate": "onco.onco.tender_validation.validate_sales_invoice_tender_price",
+		"on_submit": [
+			"onco.onco.tender_fulfillment.on_sales_invoice_submit",
+			"onco.onco.tender_validation.post_sales_invoice_deviations"
+		],
+		"on_cancel": [
+			"onco.onco.tender_fulfillment.on_sales_invoice_cancel",
+			"onco.onco.tender_validation.reverse_sales_invoice_deviations"
+		]
 	}
 }
 
@@ -156,8 +176,14 @@ doc_events = {
 # ---------------
 
 scheduler_events = {
+	"cron": {
+		"*/5 * * * *": [
+			"onco.onco.supplier_notifications.process_supplier_notification_outbox"
+		]
+	},
 	"daily": [
-		"onco.tasks.send_expiry_reminders"
+		"onco.tasks.send_expiry_reminders",
+		"onco.onco.tender_cost_drift.refresh_tender_price_deviations"
 	]
 }
 
@@ -0,0 +1,91 @@
+"""
+Microbenchmarks for the Frappe-free tender compute kernel
+
+Runs every kernel function on synthetic tenders (10k rows by default) with the
+pure-Python path and, when NumPy is installed, the vectorized path, and prints
+throughput in rows per second. Needs no site:
+
+    python -m onco.onco.benchmarks.tender_kernel
+    python -m onco.onco.benchmarks.tender_kernel --rows 50000 --repeat 20
+
+or on a bench:
+
+    bench --site [site-name] execute onco.onco.benchmarks.tender_kernel.run --kwargs "{'rows': 10000}"
+"""
+
+import argparse
+import random
+import time
+
+from onco.onco import tender_kernel
+
+
+def make_columns(rows, seed=42):
+	"""Synthetic tender columns: quantities, supplied quantities, prices, costs and statuses"""
+	rng = random.Random(seed)
+	tender_qty = [float(rng.randint(1, 5000)) for _ in range(rows)]
+	return {
+		"tender_qty": tender_qty,
+		"supplied_qty": [qty * rng.random() for qty in tender_qty],
+		"tender_price": [round(rng.uniform(10, 1000), 2) for _ in range(rows)],
+		"item_cost": [round(rng.uniform(10, 1000), 2) for _ in range(rows)],
+		"status": [rng.choice(("Pending Approval", "Approved", "Rejected")) for _ in range(rows)],
+	}
+
+
+def to_arrays(columns):
+	import numpy as np
+	return {
+		key: np.array(values, dtype=object if key == "status" else np.float64)
+		for key, values in columns.items()
+	}
+
+
+def cases(columns):
+	return {
+		"apply_extra_qty (Percent)": lambda: tender_kernel.apply_extra_qty(columns["tender_qty"], "Percent", 10),
+		"apply_extra_qty (Quantity)": lambda: tender_kernel.apply_extra_qty(columns["tender_qty"], "Quantity", 25),
+		"status_figures": lambda: tender_kernel.status_figures(columns["tender_qty"], columns["supplied_qty"]),
+		"fulfillment_percent": lambda: tender_kernel.fulfillment_percent(columns["tender_qty"], columns["supplied_qty"]),
+		"price_deviations": lambda: tender_kernel.price_deviations(columns["tender_price"], columns["item_cost"]),
+		"deviation_summary": lambda: tender_kernel.deviation_summary(columns["item_cost"], columns["status"]),
+	}
+
+
+def measure(fn, repeat):
+	best = float("inf")
+	for _ in range(repeat):
+		start = time.perf_counter()
+		fn()
+		best = min(best, time.perf_counter() - start)
+	return best
+
+
+def run(rows=10000, repeat=10):
+	"""Run all kernel benchmarks and return {path: {case: rows_per_second}}"""
+	columns = make_columns(rows)
+	paths = {"python": columns}
+	try:
+		paths["numpy"] = to_arrays(columns)
+	except ImportError:
+		print("NumPy not installed, skipping the vectorized path")
+
+	results = {}
+	print(f"{'case':<30}{'path':<8}{'best ms':>10}{'rows/s':>16}")
+	for path, path_columns in paths.items():
+		results[path] = {}
+		for name, fn in cases(path_columns).items():
+			best = measure(fn, repeat)
+			throughput = rows / best if best else float("inf")
+			results[path][name] = throughput
+			print(f"{name:<30}{path:<8}{best * 1000:>10.3f}{throughput:>16,.0f}")
+
+	return results
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--rows", type=int, default=10000)
+	parser.add_argument("--repeat", type=int, default=10)
+	args = parser.parse_args()
+	run(args.rows, args.repeat)
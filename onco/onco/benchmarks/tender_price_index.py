@@ -0,0 +1,96 @@
+"""
+Benchmark: Sales Invoice tender price validation, full tender load vs cached price index
+
+Validates a synthetic 300-line invoice against a synthetic 800-line tender with the
+previous implementation (frappe.get_doc of the tender on every validate) and with
+the cached price index. Nothing is persisted; the transaction is rolled back.
+
+Usage:
+    bench --site [site-name] execute onco.onco.benchmarks.tender_price_index.run
+    bench --site [site-name] execute onco.onco.benchmarks.tender_price_index.run --kwargs "{'runs': 50}"
+"""
+
+import time
+
+import frappe
+
+from onco.onco.tender_validation import (
+	clear_tender_price_index,
+	get_tender_price_index,
+	validate_sales_invoice_tender_price,
+)
+
+
+def run(tender_lines=800, invoice_lines=300, runs=20):
+	"""Run the benchmark and print the average time per invoice validation"""
+	try:
+		tender = make_tender(tender_lines)
+		invoice = make_invoice(tender, invoice_lines)
+
+		before = timeit(lambda: legacy_validate(invoice), runs)
+
+		clear_tender_price_index(tender)
+		get_tender_price_index(tender)  # warm the cache, as after the first invoice
+		after = timeit(lambda: validate_sales_invoice_tender_price(invoice, "validate"), runs)
+
+		print(f"Tender lines: {tender_lines}, invoice lines: {invoice_lines}, runs: {runs}")
+		print(f"Before (full tender load): {before * 1000:.2f} ms per validate")
+		print(f"After (cached price index): {after * 1000:.2f} ms per validate")
+		print(f"Speed-up: {before / after if after else float('inf'):.1f}x")
+
+		return {"before_ms": before * 1000, "after_ms": after * 1000}
+	finally:
+		clear_tender_price_index()
+		frappe.db.rollback()
+
+
+def legacy_validate(invoice):
+	"""Price map construction as done before the cached index was introduced"""
+	tender = frappe.get_doc("Tenders", invoice.custom_tender_ref)
+	tender_prices = {}
+	for row in tender.item_tender or []:
+		if row.item_code:
+			tender_prices[row.item_code] = row.tender_price
+
+	for item in invoice.items:
+		if item.item_code in tender_prices and item.rate < tender_prices[item.item_code]:
+			frappe.throw("Unexpected price deviation in benchmark data")
+
+
+def timeit(fn, runs):
+	start = time.perf_counter()
+	for _ in range(runs):
+		fn()
+	return (time.perf_counter() - start) / runs
+
+
+def make_tender(lines):
+	"""Insert a throwaway Awarded Tender with `lines` Item Tender rows"""
+	tender = frappe.get_doc({
+		"doctype": "Tenders",
+		"naming_series": "TNDR-AWR-UPA-.YYYY.-.{tender_number}.",
+		"tender_type": "Awarded Tenders",
+		"category": "UPA Tender",
+		"tender_number": f"BENCH-{frappe.generate_hash(length=6)}",
+		"item_tender": [
+			{"item_code": f"BENCH-ITEM-{i:04d}", "item_name": f"Bench Item {i}", "tender_qty": 10, "tender_price": 100}
+			for i in range(lines)
+		]
+	})
+	tender.flags.ignore_links = True
+	tender.flags.ignore_mandatory = True
+	tender.flags.ignore_validate = True
+	tender.insert(ignore_permissions=True)
+	return tender.name
+
+
+def make_invoice(tender, lines):
+	"""Build an unsaved Sales Invoice-like document priced at the tender price"""
+	return frappe._dict({
+		"name": "BENCH-SINV",
+		"custom_tender_ref": tender,
+		"items": [
+			frappe._dict({"idx": i + 1, "item_code": f"BENCH-ITEM-{i:04d}", "rate": 100, "qty": 1})
+			for i in range(lines)
+		]
+	})
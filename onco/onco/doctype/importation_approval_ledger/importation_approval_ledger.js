@@ -0,0 +1,7 @@
+// Copyright (c) 2026, Onco and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on('Importation Approval Ledger', {
+    // refresh(frm) {
+    // }
+});
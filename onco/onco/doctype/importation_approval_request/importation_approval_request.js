@@ -4,6 +4,15 @@
 // List View Settings
 frappe.listview_settings['Importation Approval Request'] = {
     add_fields: ["request_type", "status", "date", "docstatus"],
+    onload: function (listview) {
+        // Approve or refuse every selected request in one server call
+        listview.page.add_actions_menu_item(__('Approve Selected Requests'), function () {
+            decide_selected_requests(listview, "Totally Approved");
+        }, false);
+        listview.page.add_actions_menu_item(__('Refuse Selected Requests'), function () {
+            decide_selected_requests(listview, "Refused");
+        }, false);
+    },
     get_indicator: function (doc) {
         if (doc.status === "Totally Approved") {
             return [__("Totally Approved"), "green", "status,=,Totally Approved"];
@@ -23,6 +32,36 @@ frappe.listview_settings['Importation Approval Request'] = {
     }
 };
 
+function decide_selected_requests(listview, approval_type) {
+    let docnames = listview.get_checked_items(true);
+    if (!docnames.length) {
+        frappe.msgprint(__('Please select at least one request'));
+        return;
+    }
+
+    frappe.confirm(
+        __('Mark {0} request(s) as {1}?', [docnames.length, __(approval_type)]),
+        function () {
+            frappe.call({
+                method: "onco.onco.doctype.importation_approval_request.importation_approval_request.approve_requests",
+                args: {
+                    docnames: docnames,
+                    approval_type: approval_type
+                },
+                freeze: true,
+                callback: function (r) {
+                    frappe.show_alert({
+                        message: __('{0} request(s) marked as {1}', [r.message.length, __(approval_type)]),
+                        indicator: approval_type === "Refused" ? "red" : "green"
+                    });
+                    listview.clear_checked_items();
+                    listview.refresh();
+                }
+            });
+        }
+    );
+}
+
 frappe.ui.form.on('Importation Approval Request', {
     refresh: function (frm) {
         // Add custom buttons based on document status
@@ -168,10 +207,10 @@ frappe.ui.form.on('Importation Approval Request Item', {
         if (row.item_code) {
             // Validate pharmaceutical item requirements
             frappe.call({
-                method: 'frappe.client.get',
+                method: 'onco.onco.pharmaceutical_compliance.get_item_compliance',
                 args: {
-                    doctype: 'Item',
-                    name: row.item_code
+                    item_code: row.item_code,
+                    context: 'request'
                 },
                 callback: function (r) {
                     if (r.message) {
@@ -330,6 +369,13 @@ function create_modification(frm) {
                 reqd: 1,
                 description: 'Describe what needs to be modified'
             },
+            {
+                label: 'Store Changed Items Only',
+                fieldname: 'compact',
+                fieldtype: 'Check',
+                default: 0,
+                description: 'Keep only the items whose quantities change; the full list is rebuilt from the original document when opened or printed'
+            },
             {
                 label: 'Modify Item Quantities',
                 fieldname: 'items_section',
@@ -353,7 +399,8 @@ function create_modification(frm) {
                     source_name: frm.doc.name,
                     modification_reason: values.modification_reason,
                     requested_modification: values.requested_modification,
-                    items_to_modify: JSON.stringify(items_to_modify)
+                    items_to_modify: JSON.stringify(items_to_modify),
+                    compact: values.compact
                 },
                 callback: function (r) {
                     if (r.message) {
@@ -400,6 +447,13 @@ function create_extension(frm) {
                 fieldtype: 'Date',
                 description: 'Optional: Set new validation date'
             },
+            {
+                label: 'Store Changed Items Only',
+                fieldname: 'compact',
+                fieldtype: 'Check',
+                default: 0,
+                description: 'Keep only the items whose quantities change; the full list is rebuilt from the original document when opened or printed'
+            },
             {
                 label: 'Add Additional Quantities',
                 fieldname: 'items_section',
@@ -426,7 +480,8 @@ function create_extension(frm) {
                     extension_reason: values.extension_reason,
                     extension_details: values.extension_details,
                     new_validation_date: values.new_validation_date,
-                    additional_qty: JSON.stringify(additional_qty)
+                    additional_qty: JSON.stringify(additional_qty),
+                    compact: values.compact
                 },
                 callback: function (r) {
                     if (r.message) {
@@ -3,15 +3,50 @@
 
 import frappe
 from frappe.model.document import Document
+from frappe.utils import flt
+
+from onco.onco.importation_lineage import add_lineage_index, set_lineage
+from onco.onco.importation_naming import allocate_revision_name
+from onco.onco.importation_revisions import compress, expand_revisions, materialize
+from onco.onco.pharmaceutical_compliance import validate_compliance
 
 class ImportationApprovalRequest(Document):
+    def load_from_db(self):
+        super().load_from_db()
+        # Compact revisions store only changed rows; rebuild the full item list on load
+        materialize(self)
+    
     def validate(self):
+        set_lineage(self)
         self.calculate_totals()
         self.validate_approval_quantities()
+        validate_compliance(self, "request")
         
         # "After Saving Status Pending" - Auto-set status to Pending on save if not set
         if not self.status or self.status == "":
             self.status = "Pending"
+        
+        # Totals above are computed on the full item list; only the delta is stored
+        compress(self)
+    
+    def on_update(self):
+        materialize(self)
+    
+    # Cancel, update after submit and delete skip validate but still write item rows
+    def before_cancel(self):
+        compress(self)
+    
+    def on_cancel(self):
+        materialize(self)
+    
+    def before_update_after_submit(self):
+        compress(self)
+    
+    def on_update_after_submit(self):
+        materialize(self)
+    
+    def on_trash(self):
+        compress(self)
     
     def calculate_totals(self):
         """Calculate total requested and approved quantities"""
@@ -37,6 +72,9 @@ class ImportationApprovalRequest(Document):
         # Use the "Approve Request" or "Refuse Request" buttons to change status
         pass
 
+def on_doctype_update():
+    add_lineage_index("Importation Approval Request")
+
 # Whitelisted methods must be at module level (not inside class)
 @frappe.whitelist()
 def approve_request(docname, approval_type="Totally Approved", items_data=None):
@@ -48,10 +86,6 @@ def approve_request(docname, approval_type="Totally Approved", items_data=None):
         items_data: JSON string of item codes and their approved quantities (for reuse in Partial Approval)
     """
     import json
-    doc = frappe.get_doc("Importation Approval Request", docname)
-    
-    if doc.docstatus != 1:
-        frappe.throw("Document must be submitted before approval")
     
     # Parse items_data if provided
     approved_quantities = {}
@@ -60,54 +94,118 @@ def approve_request(docname, approval_type="Totally Approved", items_data=None):
             approved_quantities = json.loads(items_data)
         else:
             approved_quantities = items_data
+    
+    apply_approval_decisions([docname], approval_type, {docname: approved_quantities})
+    
+    frappe.msgprint(f"Request has been marked as {approval_type}")
+    
+    return docname
 
-    # Set approval status and date
-    doc.db_set('approval_status', approval_type, update_modified=False)
-    doc.db_set('approval_date', frappe.utils.today(), update_modified=False)
-    doc.db_set('status', approval_type, update_modified=False)
+@frappe.whitelist()
+def approve_requests(docnames, approval_type="Totally Approved", items_data=None):
+    """Approve or refuse many importation approval requests in one call
     
-    total_approved = 0
+    Args:
+        docnames: JSON list of Importation Approval Request names
+        approval_type: Type of approval applied to all of them
+        items_data: optional JSON of {docname: {item_code: approved_qty}} for Partial Approval
+    """
+    import json
     
-    # Update item statuses based on quantities
-    for item in doc.items:
-        # Determine approved qty based on type
-        new_approved_qty = 0
+    frappe.has_permission("Importation Approval Request", "write", throw=True)
+    
+    if isinstance(docnames, str):
+        docnames = json.loads(docnames)
+    if isinstance(items_data, str):
+        items_data = json.loads(items_data)
+    
+    docnames = list(dict.fromkeys(docnames or []))
+    if not docnames:
+        frappe.throw("Please select at least one Importation Approval Request")
+    
+    apply_approval_decisions(docnames, approval_type, items_data or {})
+    
+    return docnames
+
+def apply_approval_decisions(docnames, approval_type, approved_quantities=None):
+    """Write an approval decision for every request in `docnames`
+    
+    Item quantities and statuses are computed in memory and written with one
+    CASE-based UPDATE for all item rows plus one UPDATE for the parents, so a
+    failure leaves no request half-approved.
+    """
+    if approval_type not in ("Totally Approved", "Partially Approved", "Refused"):
+        frappe.throw(f"Invalid approval type: {approval_type}")
+    
+    approved_quantities = approved_quantities or {}
+    
+    not_submitted = frappe.get_all("Importation Approval Request",
+        filters={"name": ["in", docnames], "docstatus": ["!=", 1]}, pluck="name")
+    missing = set(docnames) - set(frappe.get_all("Importation Approval Request",
+        filters={"name": ["in", docnames]}, pluck="name"))
+    if not_submitted or missing:
+        frappe.throw(f"Document must be submitted before approval: {', '.join(sorted(set(not_submitted) | missing))}")
+    
+    # Approval decisions are stored per item row, so compact revisions get all their rows first
+    expand_revisions(docnames)
+    
+    items = frappe.get_all("Importation Approval Request Item",
+        filters={"parent": ["in", docnames], "parenttype": "Importation Approval Request"},
+        fields=["name", "parent", "item_code", "requested_qty"])
+    
+    item_updates = []
+    totals = dict.fromkeys(docnames, 0)
+    
+    for item in items:
+        requested_qty = flt(item.requested_qty)
         
-        if approval_type == 'Refused':
-            new_approved_qty = 0
-        elif approval_type == 'Totally Approved':
-            new_approved_qty = item.requested_qty
+        # Determine approved qty based on type
+        if approval_type == 'Totally Approved':
+            new_approved_qty = requested_qty
         elif approval_type == 'Partially Approved':
-            # Use provided data or fall back to existing/0
-            if item.item_code in approved_quantities:
-                new_approved_qty = approved_quantities[item.item_code]
-            else:
-                # If not in data, assume 0 for partial approval safety? 
-                # Or keep existing? Let's assume 0 if not explicitly approved in the dialog.
-                new_approved_qty = 0
-        
-        # Update the item's approved quantity in DB
-        frappe.db.set_value('Importation Approval Request Item', item.name, 'approved_qty', new_approved_qty, update_modified=False)
+            # Items not explicitly approved in the dialog are treated as refused
+            new_approved_qty = flt((approved_quantities.get(item.parent) or {}).get(item.item_code, 0))
+        else:
+            new_approved_qty = 0
         
-        # Update item status
-        item_status = ''
         if new_approved_qty == 0:
             item_status = 'Refused'
-        elif new_approved_qty == item.requested_qty:
+        elif new_approved_qty == requested_qty:
             item_status = 'Totally Approved'
         else:
             item_status = 'Partially Approved'
-            
-        frappe.db.set_value('Importation Approval Request Item', item.name, 'status', item_status, update_modified=False)
         
-        total_approved += new_approved_qty
-
-    # Update total approved qty on parent
-    doc.db_set('total_approved_qty', total_approved, update_modified=False)
-    
-    frappe.msgprint(f"Request has been marked as {approval_type}")
-    
-    return doc.name
+        item_updates.append((item.name, new_approved_qty, item_status))
+        totals[item.parent] += new_approved_qty
+    
+    if item_updates:
+        qty_cases = " ".join(["WHEN %s THEN %s"] * len(item_updates))
+        status_cases = " ".join(["WHEN %s THEN %s"] * len(item_updates))
+        values = [value for name, qty, _ in item_updates for value in (name, qty)]
+        values += [value for name, _, status in item_updates for value in (name, status)]
+        values += [name for name, _, _ in item_updates]
+        frappe.db.sql(f"""
+            UPDATE `tabImportation Approval Request Item`
+            SET approved_qty = CASE name {qty_cases} END,
+                status = CASE name {status_cases} END
+            WHERE name IN ({", ".join(["%s"] * len(item_updates))})
+        """, values)
+    
+    total_cases = " ".join(["WHEN %s THEN %s"] * len(docnames))
+    values = [approval_type, frappe.utils.today(), approval_type]
+    values += [value for name in docnames for value in (name, totals[name])]
+    values += docnames
+    frappe.db.sql(f"""
+        UPDATE `tabImportation Approval Request`
+        SET approval_status = %s,
+            approval_date = %s,
+            status = %s,
+            total_approved_qty = CASE name {total_cases} END
+        WHERE name IN ({", ".join(["%s"] * len(docnames))})
+    """, values)
+    
+    for docname in docnames:
+        frappe.clear_document_cache("Importation Approval Request", docname)
 
 @frappe.whitelist()
 def make_importation_approval(source_name, target_doc=None):
@@ -208,7 +306,7 @@ def make_purchase_order(source_name, target_doc=None):
     return doclist
 
 @frappe.whitelist()
-def create_modification(source_name, modification_reason, requested_modification, items_to_modify=None):
+def create_modification(source_name, modification_reason, requested_modification, items_to_modify=None, compact=0):
     """Create modification of Importation Approval Request"""
     import json
     
@@ -230,48 +328,13 @@ def create_modification(source_name, modification_reason, requested_modification
         
     new_doc.naming_series = new_series
     
-    # Custom Naming Logic to preserve sequence number
-    # Extract year and sequence from source name or series
-    # Expected formats: EDA-SPIMR-2026-00004 or EDA-SPIMR-MD-2026-00004
-    
-    parts = source_name.split('-')
-    # Try to find the numeric part at the end
-    seq_number = parts[-1]
-    
-    # Handle existing suffixes (remove them to get base number)
-    if not seq_number.isdigit():
-        # Maybe it has a suffix like 00004-1?
-        # But split('-') splits 00004 and 1.
-        # Let's assume standard format ends with sequence number or sequence-suffix
-        if parts[-1].isdigit():
-             seq_number = parts[-1]
-        elif parts[-2].isdigit():
-             seq_number = parts[-2]
-    
-    # Reconstruct name: PREFIX-YEAR-SEQ
-    # We need the Year. Let's assume current year or source year?
-    # Usually we want the year from the source series.
-    year = frappe.utils.today().split('-')[0]
-    # Ideally reuse source year if present in name
-    for part in parts:
-        if len(part) == 4 and part.isdigit() and part.startswith('20'):
-            year = part
-            break
-            
-    base_name = f"{target_prefix}-{year}-{seq_number}"
-    
-    # Check for availability
-    candidate_name = base_name
-    suffix = 0
-    
-    while frappe.db.exists("Importation Approval Request", candidate_name):
-        suffix += 1
-        candidate_name = f"{base_name}-{suffix}"
-        
-    new_doc.name = candidate_name
+    # Keep the sequence number of the source: EDA-SPIMR-2026-00004 -> EDA-SPIMR-MD-2026-00004[-N]
+    new_doc.name = allocate_revision_name("Importation Approval Request", source_name, target_prefix)
     
     # Add modification details
     new_doc.is_modification = 1
+    # Compact: store only the items whose quantities change
+    new_doc.compact_revision = frappe.utils.cint(compact)
     new_doc.modification_reason = modification_reason
     new_doc.original_document = source_name
     new_doc.status = "Pending"
@@ -294,7 +357,8 @@ def create_modification(source_name, modification_reason, requested_modification
             item.approved_qty = 0
             item.status = "Pending"
     
-    new_doc.insert()
+    # set_name: a naming_series doctype would otherwise discard the allocated name
+    new_doc.insert(set_name=new_doc.name)
     
     # Close original document
     source_doc.db_set('status', 'Closed - Modified')
@@ -302,7 +366,7 @@ def create_modification(source_name, modification_reason, requested_modification
     return new_doc.name
 
 @frappe.whitelist()
-def create_extension(source_name, extension_reason, extension_details, new_validation_date=None, additional_qty=None):
+def create_extension(source_name, extension_reason, extension_details, new_validation_date=None, additional_qty=None, compact=0):
     """Create extension of Importation Approval Request"""
     import json
     
@@ -324,30 +388,13 @@ def create_extension(source_name, extension_reason, extension_details, new_valid
 
     new_doc.naming_series = new_series
     
-    # Custom Naming Logic
-    parts = source_name.split('-')
-    seq_number = parts[-1]
-    if not seq_number.isdigit() and len(parts) > 1 and parts[-2].isdigit():
-        seq_number = parts[-2] # Handle suffix case
-        
-    year = frappe.utils.today().split('-')[0]
-    for part in parts:
-        if len(part) == 4 and part.isdigit() and part.startswith('20'):
-            year = part
-            break
-            
-    base_name = f"{target_prefix}-{year}-{seq_number}"
-    
-    candidate_name = base_name
-    suffix = 0
-    while frappe.db.exists("Importation Approval Request", candidate_name):
-        suffix += 1
-        candidate_name = f"{base_name}-{suffix}"
-    
-    new_doc.name = candidate_name
+    # Keep the sequence number of the source: EDA-SPIMR-2026-00004 -> EDA-SPIMR-EX-2026-00004[-N]
+    new_doc.name = allocate_revision_name("Importation Approval Request", source_name, target_prefix)
     
     # Add extension details
     new_doc.is_extension = 1
+    # Compact: store only the items whose quantities change
+    new_doc.compact_revision = frappe.utils.cint(compact)
     new_doc.extension_reason = extension_reason
     new_doc.original_document = source_name
     new_doc.status = "Pending"
@@ -370,7 +417,8 @@ def create_extension(source_name, extension_reason, extension_details, new_valid
             item.approved_qty = 0
             item.status = "Pending"
     
-    new_doc.insert()
+    # set_name: a naming_series doctype would otherwise discard the allocated name
+    new_doc.insert(set_name=new_doc.name)
     
     # Close original document
     source_doc.db_set('status', 'Closed - Extended')
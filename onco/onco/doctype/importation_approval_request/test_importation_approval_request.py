@@ -0,0 +1,64 @@
+# Copyright (c) 2026, Onco and Contributors
+# See license.txt
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from onco.onco.importation_naming import allocate_revision_name
+
+DOCTYPE = "Importation Approval Request"
+SOURCE_NAME = "EDA-SPIMR-2099-99901"
+TARGET_PREFIX = "EDA-SPIMR-MD"
+WORKERS = 2
+
+
+def _allocate_revision(site, barrier):
+	"""Worker: allocate and store one revision name on its own connection"""
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		# Take the read snapshot before the other worker commits its revision
+		frappe.db.get_value(DOCTYPE, SOURCE_NAME, "name")
+		barrier.wait()
+
+		name = allocate_revision_name(DOCTYPE, SOURCE_NAME, TARGET_PREFIX)
+		revision = frappe.new_doc(DOCTYPE)
+		revision.name = name
+		revision.lineage_root = SOURCE_NAME
+		revision.original_document = SOURCE_NAME
+		revision.db_insert()
+		frappe.db.commit()
+		return name
+	finally:
+		frappe.destroy()
+
+
+class TestImportationApprovalRequest(FrappeTestCase):
+	"""Test Importation Approval Request revision naming"""
+
+	def setUp(self):
+		self._clear_requests()
+		source = frappe.new_doc(DOCTYPE)
+		source.name = SOURCE_NAME
+		source.lineage_root = SOURCE_NAME
+		source.db_insert()
+		frappe.db.commit()
+
+	def tearDown(self):
+		self._clear_requests()
+
+	def _clear_requests(self):
+		frappe.db.delete(DOCTYPE, {"name": ("like", "EDA-SPIMR-%2099-99901%")})
+		frappe.db.commit()
+
+	def test_parallel_revisions_get_unique_names(self):
+		"""Two users revising the same request at once must get different -N names"""
+		site = frappe.local.site
+		barrier = threading.Barrier(WORKERS)
+		with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+			names = list(executor.map(_allocate_revision, [site] * WORKERS, [barrier] * WORKERS))
+
+		self.assertEqual(sorted(names), [f"{TARGET_PREFIX}-2099-99901", f"{TARGET_PREFIX}-2099-99901-1"])
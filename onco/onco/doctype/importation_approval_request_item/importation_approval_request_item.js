@@ -36,10 +36,10 @@ frappe.ui.form.on('Importation Approval Request Item', {
         if (row.item_code) {
             // Validate item compatibility with request type
             frappe.call({
-                method: 'frappe.client.get',
+                method: 'onco.onco.pharmaceutical_compliance.get_item_compliance',
                 args: {
-                    doctype: 'Item',
-                    name: row.item_code
+                    item_code: row.item_code,
+                    context: 'request'
                 },
                 callback: function(r) {
                     if (r.message) {
@@ -23,6 +23,10 @@ frappe.ui.form.on('Importation Approvals', {
                 create_purchase_order(frm);
             }, __('Create'));
             
+            frm.add_custom_button(__('Purchase Orders (One per Item)'), function() {
+                create_purchase_orders(frm);
+            }, __('Create'));
+            
             frm.add_custom_button(__('Create Modification'), function() {
                 create_modification(frm);
             }, __('Create'));
@@ -302,17 +306,13 @@ function create_purchase_order(frm) {
     
     // Check if this document has been superseded by a newer version
     frappe.call({
-        method: 'frappe.client.get_list',
+        method: 'onco.onco.importation_lineage.is_superseded',
         args: {
             doctype: 'Importation Approvals',
-            filters: {
-                'original_document': frm.doc.name,
-                'docstatus': ['!=', 2]
-            },
-            fields: ['name', 'creation']
+            name: frm.doc.name
         },
         callback: function(r) {
-            if (r.message && r.message.length > 0) {
+            if (r.message) {
                 frappe.throw(__('Cannot create Purchase Order. This document has been superseded by newer versions. Please use the latest version.'));
                 return;
             }
@@ -326,6 +326,48 @@ function create_purchase_order(frm) {
     });
 }
 
+function create_purchase_orders(frm) {
+    frappe.confirm(__('Create one Purchase Order for every approved item of {0}?', [frm.doc.name]), function() {
+        frappe.call({
+            method: "onco.onco.doctype.importation_approvals.importation_approvals.create_purchase_orders",
+            args: {
+                source_name: frm.doc.name
+            },
+            callback: function() {
+                listen_for_purchase_orders(frm);
+                frappe.show_alert({
+                    message: __('Purchase Orders are being created in the background'),
+                    indicator: 'blue'
+                });
+            }
+        });
+    });
+}
+
+function listen_for_purchase_orders(frm) {
+    // Creation runs as a background job; show its per-PO report when done
+    frappe.realtime.off('importation_purchase_orders_created');
+    frappe.realtime.on('importation_purchase_orders_created', function(data) {
+        if (data.importation_approval !== frm.doc.name) {
+            return;
+        }
+        frappe.realtime.off('importation_purchase_orders_created');
+        
+        let rows = data.report.map(function(row) {
+            let po = row.status === 'Created'
+                ? `<a href="/app/purchase-order/${encodeURIComponent(row.purchase_order)}">${row.purchase_order}</a>`
+                : (row.purchase_order || '');
+            return `<tr><td>${row.item_code}</td><td>${po}</td><td>${row.status}</td><td>${frappe.utils.escape_html(row.message || '')}</td></tr>`;
+        }).join('');
+        
+        frappe.msgprint({
+            title: __('Purchase Order Creation'),
+            message: `<table class="table table-bordered"><thead><tr><th>${__('Item')}</th><th>${__('Purchase Order')}</th><th>${__('Status')}</th><th>${__('Message')}</th></tr></thead><tbody>${rows}</tbody></table>`,
+            wide: true
+        });
+    });
+}
+
 function create_modification(frm) {
     frappe.prompt([
         {
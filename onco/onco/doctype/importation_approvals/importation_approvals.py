@@ -3,11 +3,28 @@
 
 import frappe
 from frappe.model.document import Document
+from frappe.utils import flt
+
+from onco.onco.importation_consumption import carry_forward_consumption
+from onco.onco.importation_lineage import add_lineage_index, is_superseded, set_lineage
+from onco.onco.importation_mapping import (
+    get_conversion_rate,
+    get_item_rate,
+    get_item_tax_template,
+    get_mapping_context,
+    get_supplier_currency,
+)
+from onco.onco.pharmaceutical_compliance import validate_compliance
 
 class ImportationApprovals(Document):
     def validate(self):
+        # Request items are loaded once per validate and shared by the checks below
+        self._request_items = None
+        set_lineage(self)
         self.validate_items_table()
         self.validate_approval_quantities()
+        validate_compliance(self, "approval")
+        self.set_remaining_quantities()
     
     def validate_items_table(self):
         """Ensure items table is not empty and populated from request if needed"""
@@ -21,20 +38,26 @@ class ImportationApprovals(Document):
             else:
                 frappe.throw("Items table cannot be empty. Please link an Importation Approval Request.")
     
+    def get_request_items(self):
+        """Item rows of the linked request, fetched once per validate"""
+        if getattr(self, "_request_items", None) is None:
+            self._request_items = get_request_items(self.importation_approval_request)
+        return self._request_items
+    
     def fetch_request_data(self):
         """Fetch data from linked Importation Approval Request"""
         if not self.importation_approval_request:
             return
-            
-        request_doc = frappe.get_doc("Importation Approval Request", self.importation_approval_request)
         
-        if not request_doc.items:
+        request_items = self.get_request_items()
+        
+        if not request_items:
             return
         
         # Clear existing items and add all items from request
         self.items = []
         
-        for request_item in request_doc.items:
+        for request_item in request_items:
             self.append("items", {
                 "item_code": request_item.item_code,
                 "item_name": request_item.item_name,
@@ -49,23 +72,31 @@ class ImportationApprovals(Document):
         """Validate that approval quantities match the request"""
         if not self.importation_approval_request:
             return
-            
-        request_doc = frappe.get_doc("Importation Approval Request", self.importation_approval_request)
+        
+        # First request row wins for duplicated item codes, as before
+        requested_qty_by_item = {}
+        for request_item in self.get_request_items():
+            requested_qty_by_item.setdefault(request_item.item_code, request_item.requested_qty)
         
         for item in self.items:
-            # Find corresponding item in request
-            request_item = None
-            for req_item in request_doc.items:
-                if req_item.item_code == item.item_code:
-                    request_item = req_item
-                    break
-            
-            if not request_item:
+            if item.item_code not in requested_qty_by_item:
                 frappe.throw(f"Item {item.item_code} not found in the original request")
             
-            if item.approved_qty > request_item.requested_qty:
+            if item.approved_qty > requested_qty_by_item[item.item_code]:
                 frappe.throw(f"Approved quantity for {item.item_code} cannot exceed requested quantity")
     
+    def set_remaining_quantities(self):
+        """Consumption is posted by Purchase Orders through onco.onco.importation_consumption"""
+        for item in self.items:
+            if self.is_new():
+                # Rows copied by copy_doc start empty; after_insert carries the ledger forward
+                item.consumed_qty = 0
+            item.remaining_qty = flt(item.approved_qty) - flt(item.consumed_qty)
+    
+    def after_insert(self):
+        # A modification/extension keeps what earlier versions already consumed
+        carry_forward_consumption(self)
+    
     def on_submit(self):
         """Create approval record and enable further actions"""
         # Check if this is an extension/modification of a closed document
@@ -79,16 +110,8 @@ class ImportationApprovals(Document):
     def before_submit(self):
         """Validate before submission"""
         # Prevent submission if this is not the latest version
-        if self.original_document:
-            # Check if there are newer versions
-            newer_versions = frappe.get_all("Importation Approvals", 
-                filters={
-                    "original_document": self.original_document,
-                    "creation": [">", self.creation],
-                    "docstatus": ["!=", 2]
-                })
-            if newer_versions:
-                frappe.throw("Cannot submit - newer version exists. Please use the latest version.")
+        if self.original_document and is_superseded(self.doctype, self.name):
+            frappe.throw("Cannot submit - newer version exists. Please use the latest version.")
     
     def validate_purchase_order_creation(self):
         """Validate if Purchase Order can be created from this document"""
@@ -100,27 +123,23 @@ class ImportationApprovals(Document):
             frappe.throw("Cannot create Purchase Order from closed document. Use the latest version.")
         
         return True
+
+def on_doctype_update():
+    add_lineage_index("Importation Approvals")
+
+def get_request_items(request_name):
+    """Item columns of an Importation Approval Request in one query"""
+    if not request_name:
+        return []
     
-    def validate_approval_quantities(self):
-        """Validate that approval quantities match the request"""
-        if not self.importation_approval_request:
-            return
-            
-        request_doc = frappe.get_doc("Importation Approval Request", self.importation_approval_request)
-        
-        for item in self.items:
-            # Find corresponding item in request
-            request_item = None
-            for req_item in request_doc.items:
-                if req_item.item_code == item.item_code:
-                    request_item = req_item
-                    break
-            
-            if not request_item:
-                frappe.throw(f"Item {item.item_code} not found in the original request")
-            
-            if item.approved_qty > request_item.requested_qty:
-                frappe.throw(f"Approved quantity for {item.item_code} cannot exceed requested quantity")
+    if frappe.db.get_value("Importation Approval Request", request_name, "compact_revision"):
+        # Compact revisions only store changed rows; load the materialized document
+        return frappe.get_doc("Importation Approval Request", request_name).items
+    
+    return frappe.get_all("Importation Approval Request Item",
+        filters={"parent": request_name, "parenttype": "Importation Approval Request"},
+        fields=["item_code", "item_name", "supplier", "requested_qty", "approved_qty"],
+        order_by="idx asc")
 
 @frappe.whitelist()
 def make_purchase_order(source_name, target_doc=None):
@@ -131,88 +150,57 @@ def make_purchase_order(source_name, target_doc=None):
     source_doc = frappe.get_doc("Importation Approvals", source_name)
     source_doc.validate_purchase_order_creation()
     
+    # Company, currencies, rates, warehouse and item details are the same for every row
+    context = get_mapping_context(source_doc)
+    
     def set_missing_values(source, target):
         target.custom_importation_approval = source.name  # Fixed: use correct field name
+        # Kept for callers that re-split the mapped lines (make_purchase_orders)
+        target.flags.mapping_context = context
         
         # Ensure company is set (required for currency/pricing)
         if not target.company:
-            target.company = frappe.db.get_default("company") or "ONCOPHARM EGYPT S.A.E"
+            target.company = context.company
             
         # Set supplier and currency
         if source.items:
             target.supplier = source.items[0].supplier
             if target.supplier:
-                target.currency = frappe.db.get_value("Supplier", target.supplier, "default_currency")
+                target.currency = (context.supplier_details.get(target.supplier) or {}).get("default_currency")
         
         if not target.currency:
-            target.currency = frappe.db.get_value("Company", target.company, "default_currency") or "EGP"
+            target.currency = context.company_currency
         
         # Set conversion rate (1.0 if same currency, otherwise fetch from exchange rate)
-        company_currency = frappe.db.get_value("Company", target.company, "default_currency") or "EGP"
-        if target.currency == company_currency:
-            target.conversion_rate = 1.0
-        else:
-            # Try to get exchange rate
-            from erpnext.setup.utils import get_exchange_rate
-            target.conversion_rate = get_exchange_rate(target.currency, company_currency, target.transaction_date or frappe.utils.nowdate())
+        target.conversion_rate = get_conversion_rate(context, target.currency)
             
-        target.transaction_date = frappe.utils.nowdate()
+        target.transaction_date = context.transaction_date
         
-        # Send email notification to supplier if enabled
-        if source.send_email_notification and target.supplier:
-            custom_email = source.supplier_email if source.supplier_email else None
-            send_supplier_notification(target.supplier, source.name, custom_email)
+        # Supplier email notification is queued when the Purchase Order is submitted
+        # (onco.onco.supplier_notifications), not while mapping
     
     def update_item(source, target, source_parent):
+        target.custom_importation_approvals_item = source.name
         target.item_code = source.item_code
         target.qty = source.approved_qty
         
-        # Fetch item details to avoid 'Infinity' and bad tax templates
-        from erpnext.stock.get_item_details import get_item_details
-        # Try to find company from parent or defaults
-        company = frappe.db.get_default("company") or "ONCOPHARM EGYPT S.A.E"
-        
         # Get supplier and currency
         supplier = source.supplier or (source_parent.supplier if hasattr(source_parent, "supplier") else None)
-        currency = None
-        if supplier:
-            currency = frappe.db.get_value("Supplier", supplier, "default_currency")
-        if not currency:
-            currency = frappe.db.get_value("Company", company, "default_currency") or "EGP"
-        
-        # Calculate conversion rate
-        company_currency = frappe.db.get_value("Company", company, "default_currency") or "EGP"
-        conversion_rate = 1.0
-        if currency != company_currency:
-            from erpnext.setup.utils import get_exchange_rate
-            conversion_rate = get_exchange_rate(currency, company_currency, frappe.utils.nowdate()) or 1.0
-        
-        # Get a valid warehouse for the company (optional - can be set later)
-        warehouse = frappe.db.get_value("Warehouse", {"company": company, "is_group": 0}, "name")
+        currency = get_supplier_currency(context, supplier)
         
-        args = frappe._dict({
-            "item_code": source.item_code,
-            "company": company,
-            "qty": target.qty,
-            "transaction_date": frappe.utils.nowdate(),
-            "doctype": "Purchase Order",
-            "supplier": supplier,
-            "currency": currency,
-            "conversion_rate": conversion_rate,
-            "warehouse": warehouse  # Pass valid warehouse or None
-        })
-        item_details = get_item_details(args)
+        # Item details were fetched for all rows at once to avoid 'Infinity' and bad tax templates
+        item_details = context.item_details.get(source.item_code) or frappe._dict()
         
         target.uom = item_details.get("uom")
         target.stock_uom = item_details.get("stock_uom")
         target.conversion_factor = item_details.get("conversion_factor") or 1.0
-        target.item_tax_template = item_details.get("item_tax_template")
-        target.rate = item_details.get("price_list_rate") or item_details.get("last_purchase_rate") or 0
-        target.schedule_date = frappe.utils.nowdate()
+        target.item_tax_template = get_item_tax_template(context, source.item_code, supplier)
+        target.rate = get_item_rate(context, source.item_code, supplier, currency, source.approved_qty)
+        target.schedule_date = context.transaction_date
         
-        # Set warehouse from item details if available, otherwise leave empty for user to set
-        if item_details.get("warehouse"):
-            target.warehouse = item_details.get("warehouse")
+        # Item default warehouse, then the company's first warehouse; otherwise left for the user to set
+        if item_details.get("warehouse") or context.warehouse:
+            target.warehouse = item_details.get("warehouse") or context.warehouse
     
     doclist = get_mapped_doc("Importation Approvals", source_name, {
         "Importation Approvals": {
@@ -229,34 +217,81 @@ def make_purchase_order(source_name, target_doc=None):
     
     return doclist
 
-def send_supplier_notification(supplier, approval_reference, custom_email=None):
-    """Send email notification to supplier about Purchase Order creation"""
-    try:
-        supplier_doc = frappe.get_doc("Supplier", supplier)
-        email_to_send = custom_email or supplier_doc.email_id
-        
-        if email_to_send:
-            frappe.sendmail(
-                recipients=[email_to_send],
-                subject=f"Purchase Order Created - Reference: {approval_reference}",
-                message=f"""
-                Dear {supplier_doc.supplier_name},
-                
-                A Purchase Order has been created based on Importation Approval: {approval_reference}
-                
-                Please check your portal for details.
-                
-                Best regards,
-                Onco Pharma Team
-                """,
-                header="Purchase Order Notification"
-            )
-            frappe.msgprint(f"Email notification sent to {email_to_send}")
-        else:
-            frappe.msgprint("No email address found for supplier notification")
-    except Exception as e:
-        frappe.log_error(f"Failed to send supplier notification: {str(e)}")
-        # Don't fail the PO creation if email fails
+@frappe.whitelist()
+def create_purchase_orders(source_name):
+    """Queue creation of one single-item Purchase Order per approved line"""
+    frappe.has_permission("Purchase Order", "create", throw=True)
+
+    source_doc = frappe.get_doc("Importation Approvals", source_name)
+    source_doc.validate_purchase_order_creation()
+
+    frappe.enqueue(
+        "onco.onco.doctype.importation_approvals.importation_approvals.make_purchase_orders",
+        queue="long",
+        timeout=3600,
+        source_name=source_name,
+        user=frappe.session.user
+    )
+
+def make_purchase_orders(source_name, user=None):
+    """Create the single-item Purchase Orders of an approval (background job)
+
+    The approval is mapped once, PO names for every line are reserved in one
+    transaction, and each PO is then inserted and committed on its own so one
+    failing line does not undo the others. Publishes a per-PO report to the
+    requesting user and returns it.
+    """
+    from onco.onco.purchase_order import reserve_po_names
+
+    source_doc = frappe.get_doc("Importation Approvals", source_name)
+    mapped = make_purchase_order(source_name)
+    header = mapped.as_dict(no_default_fields=True)
+    header.pop("items", None)
+
+    context = mapped.flags.mapping_context
+    # Match mapped lines to their approval rows by row name, not by position
+    po_items = {po_item.custom_importation_approvals_item: po_item for po_item in mapped.items}
+
+    report = []
+    lines = []
+    for source_item in source_doc.items:
+        po_item = po_items.get(source_item.name)
+        if not po_item:
+            report.append({"item_code": source_item.item_code, "status": "Skipped",
+                "message": "Row was not mapped to the Purchase Order"})
+            continue
+        if flt(source_item.approved_qty) <= 0:
+            report.append({"item_code": source_item.item_code, "status": "Skipped",
+                "message": "Nothing approved for this item"})
+            continue
+        lines.append((source_item, po_item))
+
+    names = reserve_po_names(mapped.transaction_date, [po_item.item_code for _, po_item in lines])
+    frappe.db.commit()
+
+    for name, (source_item, po_item) in zip(names, lines):
+        try:
+            po = frappe.get_doc(dict(header, doctype="Purchase Order",
+                items=[po_item.as_dict(no_default_fields=True)]))
+            if source_item.supplier and source_item.supplier != po.supplier:
+                # Header was mapped for the first line's supplier; the line rate is
+                # already in this supplier's currency, so the header follows it
+                po.supplier = source_item.supplier
+                po.currency = get_supplier_currency(context, source_item.supplier)
+                po.conversion_rate = get_conversion_rate(context, po.currency)
+            po.insert(set_name=name)
+            frappe.db.commit()
+            report.append({"item_code": po_item.item_code, "supplier": po.supplier,
+                "purchase_order": po.name, "status": "Created"})
+        except Exception as e:
+            frappe.db.rollback()
+            frappe.log_error(title=f"Purchase Order creation failed for {source_name}", message=frappe.get_traceback())
+            report.append({"item_code": po_item.item_code, "supplier": source_item.supplier,
+                "purchase_order": name, "status": "Failed", "message": str(e)})
+
+    frappe.publish_realtime("importation_purchase_orders_created",
+        {"importation_approval": source_name, "report": report}, user=user)
+    return report
 
 @frappe.whitelist()
 def create_modification(source_name, modification_reason, requested_modification, new_conditions):
@@ -0,0 +1,145 @@
+# Copyright (c) 2026, Onco and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from onco.tests.utils import count_queries
+
+
+class TestImportationApprovals(FrappeTestCase):
+	"""Test Importation Approvals validation"""
+
+	def create_test_request(self, line_count):
+		"""Helper to insert a submitted-like request with `line_count` item rows"""
+		request = frappe.get_doc({
+			"doctype": "Importation Approval Request",
+			"naming_series": "EDA-SPIMR-.YYYY.-.#####",
+			"request_type": "Special Importation (SPIMR)",
+			"items": [
+				{"item_code": f"TEST-IMP-ITEM-{i:04d}", "item_name": f"Test Item {i}", "requested_qty": 100}
+				for i in range(line_count)
+			]
+		})
+		request.flags.ignore_links = True
+		request.insert(ignore_permissions=True, ignore_mandatory=True)
+		return request
+
+	def create_test_approval(self, request, approved_qty=50):
+		"""Helper to build (not insert) an approval covering every request line"""
+		return frappe.get_doc({
+			"doctype": "Importation Approvals",
+			"importation_approval_request": request.name,
+			"approval_type": "Special Importation (SPIMA)",
+			"items": [
+				{"item_code": item.item_code, "requested_qty": item.requested_qty, "approved_qty": approved_qty}
+				for item in request.items
+			]
+		})
+
+	def test_validation_query_count_does_not_scale_with_lines(self):
+		"""Test that request quantities are checked with the same queries for 10 or 1,000 lines"""
+		def queries_for(line_count):
+			approval = self.create_test_approval(self.create_test_request(line_count))
+			with count_queries() as queries:
+				approval.validate_approval_quantities()
+			return queries.call_count
+
+		small_approval_queries = queries_for(10)
+		large_approval_queries = queries_for(1000)
+
+		self.assertEqual(small_approval_queries, large_approval_queries)
+		self.assertLessEqual(large_approval_queries, 2)
+
+	def test_approved_qty_above_requested_qty_is_rejected(self):
+		"""Test that the dict-keyed check still rejects over-approval on a large approval"""
+		approval = self.create_test_approval(self.create_test_request(1000))
+		approval.items[-1].approved_qty = 101
+
+		self.assertRaises(frappe.ValidationError, approval.validate_approval_quantities)
+
+	def test_item_missing_from_request_is_rejected(self):
+		"""Test that items not present in the request are rejected"""
+		approval = self.create_test_approval(self.create_test_request(5))
+		approval.append("items", {"item_code": "TEST-IMP-ITEM-MISSING", "requested_qty": 1, "approved_qty": 1})
+
+		self.assertRaises(frappe.ValidationError, approval.validate_approval_quantities)
+
+	def test_purchase_order_above_remaining_qty_is_rejected(self):
+		"""Test that Purchase Orders cannot order more than remains on the approval"""
+		approval = self.insert_consumption_approval(approved_qty=50)
+
+		self.assertRaises(frappe.ValidationError, self.create_approval_purchase_order(approval, 60).insert)
+
+		self.create_approval_purchase_order(approval, 30).submit()
+		self.assertRaises(frappe.ValidationError, self.create_approval_purchase_order(approval, 30).insert)
+
+	def test_cancelled_purchase_order_returns_quantity(self):
+		"""Test that cancelling a Purchase Order gives its quantity back to the approval row"""
+		approval = self.insert_consumption_approval(approved_qty=50)
+		purchase_order = self.create_approval_purchase_order(approval, 30)
+		purchase_order.submit()
+
+		self.assertRowQuantities(approval.items[0].name, consumed=30, remaining=20)
+
+		purchase_order.cancel()
+
+		self.assertRowQuantities(approval.items[0].name, consumed=0, remaining=50)
+		ledger = frappe.get_all("Importation Approval Ledger",
+			filters={"purchase_order": purchase_order.name},
+			pluck="qty",
+			order_by="creation asc")
+		self.assertEqual(ledger, [30, -30])
+
+	def test_modification_inherits_consumption(self):
+		"""Test that a modification carries forward what the earlier version consumed"""
+		approval = self.insert_consumption_approval(approved_qty=50)
+		purchase_order = self.create_approval_purchase_order(approval, 30)
+		purchase_order.submit()
+
+		# Same steps as create_modification, without its commit
+		modification = frappe.copy_doc(approval)
+		modification.is_modification = 1
+		modification.original_document = approval.name
+		modification.flags.ignore_links = True
+		modification.insert(ignore_permissions=True, ignore_mandatory=True)
+
+		self.assertRowQuantities(modification.items[0].name, consumed=30, remaining=20)
+		carried = frappe.get_all("Importation Approval Ledger",
+			filters={"importation_approval": modification.name},
+			fields=["importation_approvals_item", "purchase_order", "carried_from", "qty"])
+		self.assertEqual(len(carried), 1)
+		self.assertEqual(carried[0].importation_approvals_item, modification.items[0].name)
+		self.assertEqual(carried[0].purchase_order, purchase_order.name)
+		self.assertEqual(carried[0].carried_from, approval.name)
+		self.assertEqual(carried[0].qty, 30)
+
+		# Cancelling the Purchase Order also releases the carried quantity
+		purchase_order.cancel()
+		self.assertRowQuantities(modification.items[0].name, consumed=0, remaining=50)
+
+	def insert_consumption_approval(self, approved_qty):
+		"""Helper to insert an approval of one real stock item"""
+		from erpnext.stock.doctype.item.test_item import make_item
+
+		request = self.create_test_request(1)
+		make_item(request.items[0].item_code, {"is_stock_item": 1})
+
+		approval = self.create_test_approval(request, approved_qty)
+		approval.flags.ignore_links = True
+		approval.insert(ignore_permissions=True, ignore_mandatory=True)
+		return approval
+
+	def create_approval_purchase_order(self, approval, qty):
+		"""Helper to build a draft Purchase Order against the approval's first item"""
+		from erpnext.buying.doctype.purchase_order.test_purchase_order import create_purchase_order
+
+		purchase_order = create_purchase_order(item_code=approval.items[0].item_code, qty=qty, do_not_save=True)
+		purchase_order.custom_importation_approval = approval.name
+		return purchase_order
+
+	def assertRowQuantities(self, row_name, consumed, remaining):
+		"""Assert consumed and remaining quantity of an approval item row"""
+		row = frappe.db.get_value("Importation Approvals Item", row_name,
+			["consumed_qty", "remaining_qty"], as_dict=True)
+		self.assertEqual(row.consumed_qty, consumed)
+		self.assertEqual(row.remaining_qty, remaining)
@@ -41,10 +41,10 @@ frappe.ui.form.on('Importation Approvals Item', {
         if (row.item_code) {
             // Validate item compatibility with approval type
             frappe.call({
-                method: 'frappe.client.get',
+                method: 'onco.onco.pharmaceutical_compliance.get_item_compliance',
                 args: {
-                    doctype: 'Item',
-                    name: row.item_code
+                    item_code: row.item_code,
+                    context: 'approval'
                 },
                 callback: function(r) {
                     if (r.message) {
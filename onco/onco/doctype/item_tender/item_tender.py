@@ -1,9 +1,14 @@
 # Copyright (c) 2025, ds and contributors
 # For license information, please see license.txt
 
-# import frappe
+import frappe
 from frappe.model.document import Document
 
 
 class ItemTender(Document):
 	pass
+
+
+def on_doctype_update():
+	# Reverse index: which tenders reference an item
+	frappe.db.add_index("Item Tender", ["item_code", "parent"])
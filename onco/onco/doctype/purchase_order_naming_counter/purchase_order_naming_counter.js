@@ -0,0 +1,7 @@
+// Copyright (c) 2026, ds and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on('Purchase Order Naming Counter', {
+    // refresh(frm) {
+    // }
+});
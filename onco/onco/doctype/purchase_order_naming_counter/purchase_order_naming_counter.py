@@ -0,0 +1,14 @@
+# Copyright (c) 2026, ds and contributors
+# For license information, please see license.txt
+
+from frappe.model.document import Document
+
+
+class PurchaseOrderNamingCounter(Document):
+	"""Sequence counters behind CustomPurchaseOrder.autoname
+
+	Named YEAR-<YYYY> for the yearly XXXX sequence and ITEM-<item_code> for the
+	per-item ZZZ sequence. Incremented only through
+	onco.onco.purchase_order.get_next_po_counter.
+	"""
+	pass
@@ -0,0 +1,65 @@
+# Copyright (c) 2026, ds and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from concurrent.futures import ThreadPoolExecutor
+
+from onco.onco.purchase_order import CustomPurchaseOrder
+
+TEST_YEAR = "2099"
+TEST_ITEM = "_Test PO Naming Counter Item"
+WORKERS = 8
+NAMES_PER_WORKER = 5
+
+
+def _name_purchase_orders(site, count):
+	"""Worker: name `count` Purchase Orders on its own connection, one transaction each"""
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		names = []
+		for _ in range(count):
+			po = frappe.new_doc("Purchase Order")
+			po.transaction_date = f"{TEST_YEAR}-01-01"
+			po.append("items", {"item_code": TEST_ITEM})
+			CustomPurchaseOrder.autoname(po)
+			frappe.db.commit()
+			names.append(po.name)
+		return names
+	finally:
+		frappe.destroy()
+
+
+class TestPurchaseOrderNamingCounter(FrappeTestCase):
+	"""Test atomic Purchase Order naming counters"""
+
+	def setUp(self):
+		"""Start from empty counters for the test year and item"""
+		self._clear_counters()
+
+	def tearDown(self):
+		"""Remove the counters created by the test"""
+		self._clear_counters()
+
+	def _clear_counters(self):
+		frappe.db.delete("Purchase Order Naming Counter", {"name": ("in", [f"YEAR-{TEST_YEAR}", f"ITEM-{TEST_ITEM}"])})
+		frappe.db.commit()
+
+	def test_parallel_workers_get_unique_names(self):
+		"""Parallel autoname calls must never hand out the same XXXX or ZZZ"""
+		site = frappe.local.site
+		with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+			results = executor.map(_name_purchase_orders, [site] * WORKERS, [NAMES_PER_WORKER] * WORKERS)
+			names = [name for worker_names in results for name in worker_names]
+
+		total = WORKERS * NAMES_PER_WORKER
+		self.assertEqual(len(set(names)), total)
+
+		sequences = sorted(int(name.split("-")[2]) for name in names)
+		self.assertEqual(sequences, list(range(1, total + 1)))
+
+		item_sequences = sorted(int(name.split("-")[3]) for name in names)
+		self.assertEqual(item_sequences, list(range(1, total + 1)))
+
+		self.assertEqual(frappe.db.get_value("Purchase Order Naming Counter", f"YEAR-{TEST_YEAR}", "current"), total)
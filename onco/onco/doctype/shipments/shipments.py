@@ -139,26 +139,34 @@ def make_purchase_receipt(source_name, target_doc=None):
 	# Clear the items and rebuild from our child table data
 	target_doc.items = []
 	
+	# Fetch the invoice items of all invoices at once, keyed by (invoice, item_code).
+	# get_all uses the same default ordering as get_value, so the first row per key is kept
+	pi_items = {}
+	for pi_item in frappe.get_all("Purchase Invoice Item",
+		filters={
+			"parent": ["in", invoices],
+			"parenttype": "Purchase Invoice",
+			"item_code": ["in", list({row.item_code for row in doc.custom_invoices if row.item_code})]
+		},
+		fields=["parent", "name", "item_code", "item_name", "description", "qty", "uom",
+				"stock_uom", "conversion_factor", "rate", "purchase_order",
+				"warehouse", "expense_account", "cost_center", "project"]
+	):
+		pi_items.setdefault((pi_item.parent, pi_item.item_code), pi_item)
+	
+	# Check which items have batch tracking enabled
+	batch_items = set(frappe.get_all("Item",
+		filters={"name": ["in", list({pi_item.item_code for pi_item in pi_items.values()})], "has_batch_no": 1},
+		pluck="name"
+	)) if pi_items else set()
+	
 	# Add all items from all invoices based on the child table
 	for inv_name in invoices:
 		items_for_invoice = invoices_dict[inv_name]
 		for item_row in items_for_invoice:
-			# Fetch the actual item from Purchase Invoice to get all details
-			pi_item = frappe.db.get_value("Purchase Invoice Item", 
-				filters={
-					"parent": inv_name,
-					"item_code": item_row.item_code
-				},
-				fieldname=["name", "item_code", "item_name", "description", "qty", "uom", 
-						   "stock_uom", "conversion_factor", "rate", "purchase_order", 
-						   "warehouse", "expense_account", "cost_center", "project"],
-				as_dict=True
-			)
+			pi_item = pi_items.get((inv_name, item_row.item_code))
 			
 			if pi_item:
-				# Check if item has batch tracking enabled
-				item_doc = frappe.get_doc("Item", pi_item.item_code)
-				
 				pr_item = {
 					"item_code": pi_item.item_code,
 					"item_name": pi_item.item_name,
@@ -178,7 +186,7 @@ def make_purchase_receipt(source_name, target_doc=None):
 				}
 				
 				# Only add batch_no if item has batch tracking and batch is provided
-				if item_doc.has_batch_no and item_row.batch_no:
+				if pi_item.item_code in batch_items and item_row.batch_no:
 					pr_item["batch_no"] = item_row.batch_no
 					pr_item["use_serial_batch_fields"] = 1  # Use legacy batch fields for ERPNext v15
 				
@@ -0,0 +1,11 @@
+# Copyright (c) 2026, Onco and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+class SupplierNotificationOutbox(Document):
+    pass
+
+def on_doctype_update():
+    frappe.db.add_index("Supplier Notification Outbox", ["status", "supplier"])
@@ -0,0 +1,13 @@
+# Copyright (c) 2026, ds and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class TenderFulfillmentLedger(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Tender Fulfillment Ledger", ["tender", "item_code"])
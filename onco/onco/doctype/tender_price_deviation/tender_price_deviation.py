@@ -1,8 +1,13 @@
 # Copyright (c) 2026, ds and contributors
 # For license information, please see license.txt
 
+import frappe
 from frappe.model.document import Document
 
 
 class TenderPriceDeviation(Document):
 	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Tender Price Deviation", ["item", "parent"])
@@ -181,26 +181,18 @@ function approve_all_deviations(frm) {
 	frappe.confirm(
 		__("Are you sure you want to approve all price deviations?"),
 		function () {
-			// Mark all deviations as approved
-			frm.doc.tender_price_deviation.forEach(row => {
-				row.deviation_status = "Approved";
-			});
-			frm.refresh_field("tender_price_deviation");
 			frappe.call({
-				method: 'frappe.client.set_value',
+				method: 'onco.onco.doctype.tenders.tenders.set_price_deviation_status',
 				args: {
-					doctype: 'Tenders',
-					name: frm.doc.name,
-					fieldname: {
-						tender_price_deviation: frm.doc.tender_price_deviation
-					}
+					tenders: frm.doc.name,
+					deviation_status: "Approved"
 				},
 				callback: function () {
 					frappe.show_alert({
 						message: __("All price deviations marked as Approved"),
 						indicator: "green"
 					});
-					frm.refresh();
+					frm.reload_doc();
 				}
 			});
 		}
@@ -208,46 +200,16 @@ function approve_all_deviations(frm) {
 }
 
 function update_status_from_invoices(frm) {
+	// Supplied quantities are posted server-side on Sales Invoice submit/cancel;
+	// this only rebuilds the tender status from that ledger.
 	frappe.call({
-		method: 'frappe.client.get_list',
+		method: 'onco.onco.tender_fulfillment.rebuild_tender_fulfillment',
 		args: {
-			doctype: 'Sales Invoice',
-			filters: { 'tender_reference': frm.doc.name, 'docstatus': 1 },
-			fields: ['name', 'posting_date', 'items']
+			tender: frm.doc.name
 		},
-		callback: function (r) {
-			if (r.message && r.message.length > 0) {
-				// Update supplied quantities from invoices
-				let updated = false;
-				r.message.forEach(invoice => {
-					// Get invoice items
-					frappe.call({
-						method: 'frappe.client.get',
-						args: {
-							doctype: 'Sales Invoice',
-							name: invoice.name
-						},
-						callback: function (inv_response) {
-							inv_response.message.items.forEach(item => {
-								frm.doc.tender_status.forEach(status_row => {
-									if (status_row.item_name === item.item_code) {
-										status_row.supplied_quantity = (status_row.supplied_quantity || 0) + item.qty;
-										status_row.remaining_quantity = status_row.tender_quantity - status_row.supplied_quantity;
-										status_row.fulfillment_percent = (status_row.supplied_quantity / status_row.tender_quantity) * 100;
-										updated = true;
-									}
-								});
-							});
-							if (updated) {
-								frm.refresh_field("tender_status");
-								frappe.show_alert({ message: __("Tender status updated"), indicator: "green" });
-							}
-						}
-					});
-				});
-			} else {
-				frappe.msgprint(__("No sales invoices found for this tender"));
-			}
+		freeze: true,
+		callback: function () {
+			frm.reload_doc();
 		}
 	});
 }
@@ -342,8 +304,23 @@ function upload_fmd_data(frm) {
 			parent: frm.doc.name
 		},
 		on_success: (file) => {
-			frm.reload_doc();
-			frappe.show_alert({ message: __("Items uploaded successfully"), indicator: "green" });
+			frappe.show_alert({ message: __("FMD import started, progress will be shown here"), indicator: "blue" });
+			listen_for_fmd_import(frm);
+		}
+	});
+}
+
+function listen_for_fmd_import(frm) {
+	// Import runs as a background job; reload once it reports completion
+	frappe.realtime.off("fmd_import_complete");
+	frappe.realtime.on("fmd_import_complete", (data) => {
+		frappe.realtime.off("fmd_import_complete");
+		frappe.hide_progress();
+		if (data.error) {
+			frappe.msgprint({ title: __("FMD Upload Error"), message: data.error, indicator: "red" });
+		} else {
+			frappe.show_alert({ message: __("{0} items uploaded successfully", [data.imported]), indicator: "green" });
 		}
+		frm.reload_doc();
 	});
 }
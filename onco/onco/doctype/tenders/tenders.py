@@ -2,21 +2,52 @@
 # For license information, please see license.txt
 
 from datetime import datetime, timedelta
+import json
 import frappe
+from frappe import _
 from frappe.model.document import Document
+from frappe.utils import flt
+from onco.onco.tender_kernel import (
+	apply_extra_qty,
+	deviation_summary,
+	fulfillment_percent,
+	fulfillment_ratio,
+	price_deviations,
+	status_figures,
+)
+from onco.onco.tender_fulfillment import get_supplied_quantities
+from onco.onco.tender_profiling import TenderValidateProfiler
+from onco.onco.tender_validation import clear_tender_price_index
 
 
 class Tenders(Document):
 	def validate(self):
 		"""Validate tender rules and calculate price deviations"""
-		self.apply_tender_rules()
-		self.calculate_price_deviations()
-		self.populate_tender_status()
-		self.validate_tender_dates()
-		self.check_tender_rule_change_permission()
-		
-		if self.tender_type == "Accepted Tenders":
-			self.populate_tender_price_deviation_details()
+		# Item pricing is fetched once per validate and shared by every step
+		self._item_pricing = None
+
+		with TenderValidateProfiler(self) as profiler:
+			profiler.run(self.apply_tender_rules)
+			profiler.run(self.calculate_price_deviations)
+			profiler.run(self.populate_tender_status)
+			profiler.run(self.validate_tender_dates)
+			profiler.run(self.check_tender_rule_change_permission)
+
+			if self.tender_type == "Accepted Tenders":
+				profiler.run(self.populate_tender_price_deviation_details)
+
+	def on_update(self):
+		"""Drop the cached price index so invoice validation sees the new prices"""
+		clear_tender_price_index(self.name)
+
+	def on_update_after_submit(self):
+		clear_tender_price_index(self.name)
+
+	def on_cancel(self):
+		clear_tender_price_index(self.name)
+
+	def on_trash(self):
+		clear_tender_price_index(self.name)
 
 	def on_submit(self):
 		"""Actions to perform on tender submission"""
@@ -51,27 +82,25 @@ class Tenders(Document):
 
 	def _apply_extra_qty_to_items_fmd(self):
 		"""Apply extra quantities to Items FMD table"""
-		for row in self.items_fmd or []:
+		rows = self.items_fmd or []
+		for row in rows:
 			if not hasattr(row, 'original_quantity'):
 				row.original_quantity = row.quantity or 0
 
-			if self.extra_qty_type == "Percent":
-				extra = row.original_quantity * (self.extra_qty_value / 100)
-				row.quantity = row.original_quantity + extra
-			elif self.extra_qty_type == "Quantity":
-				row.quantity = row.original_quantity + self.extra_qty_value
+		quantities = apply_extra_qty([row.original_quantity for row in rows], self.extra_qty_type, self.extra_qty_value)
+		for row, qty in zip(rows, quantities or []):
+			row.quantity = qty
 
 	def _apply_extra_qty_to_item_tender(self):
 		"""Apply extra quantities to Item Tender table"""
-		for row in self.item_tender or []:
+		rows = self.item_tender or []
+		for row in rows:
 			if not hasattr(row, 'original_qty'):
 				row.original_qty = row.tender_qty or 0
 
-			if self.extra_qty_type == "Percent":
-				extra = row.original_qty * (self.extra_qty_value / 100)
-				row.tender_qty = row.original_qty + extra
-			elif self.extra_qty_type == "Quantity":
-				row.tender_qty = row.original_qty + self.extra_qty_value
+		quantities = apply_extra_qty([row.original_qty for row in rows], self.extra_qty_type, self.extra_qty_value)
+		for row, qty in zip(rows, quantities or []):
+			row.tender_qty = qty
 
 	def _apply_extra_qty_to_tender_supplier(self):
 		"""Apply extra quantities to Tender Supplier table"""
@@ -79,14 +108,27 @@ class Tenders(Document):
 			if not hasattr(row, 'original_supply_qty'):
 				row.original_supply_qty = row.supply_qty or 0 if hasattr(row, 'supply_qty') else 0
 
-			if self.extra_qty_type == "Percent" and hasattr(row, 'supply_qty'):
-				extra = row.original_supply_qty * (self.extra_qty_value / 100)
-				row.supply_qty = row.original_supply_qty + extra
-			elif self.extra_qty_type == "Quantity" and hasattr(row, 'supply_qty'):
-				row.supply_qty = row.original_supply_qty + self.extra_qty_value
+		rows = [row for row in self.tender_supplier or [] if hasattr(row, 'supply_qty')]
+		quantities = apply_extra_qty([row.original_supply_qty for row in rows], self.extra_qty_type, self.extra_qty_value)
+		for row, qty in zip(rows, quantities or []):
+			row.supply_qty = qty
+
+	def get_item_pricing_map(self):
+		"""Return item pricing for every item referenced by this tender, cached on the document"""
+		if getattr(self, "_item_pricing", None) is None:
+			item_codes = set()
+			for table in ("item_tender", "tender_supplier"):
+				for row in self.get(table) or []:
+					if row.get("item_code"):
+						item_codes.add(row.item_code)
+			self._item_pricing = get_item_pricing(item_codes)
+		return self._item_pricing
 
 	def calculate_price_deviations(self):
 		"""Calculate price deviations for items in the tender"""
+		# Approvals are written straight to the database, so the open form may not carry them
+		previous = self.get_previous_deviations()
+
 		# Clear existing price deviations
 		self.tender_price_deviation = []
 
@@ -97,37 +139,49 @@ class Tenders(Document):
 		elif self.tender_type in ["Tender Submission", "Accepted Tenders"] and self.tender_supplier:
 			items_to_check = self.tender_supplier
 
-		# Calculate deviations for each item
-		for row in items_to_check:
-			item_code = row.item_code if hasattr(row, 'item_code') else None
-			if not item_code:
+		item_pricing = self.get_item_pricing_map()
+		rows = [row for row in items_to_check if hasattr(row, 'item_code') and row.item_code]
+
+		# Get item cost from the prefetched Item pricing and tender price from the row
+		item_costs = [
+			(item_pricing[row.item_code].standard_rate or 0) if row.item_code in item_pricing else 0
+			for row in rows
+		]
+		tender_prices = [row.tender_price if hasattr(row, 'tender_price') else 0 for row in rows]
+
+		# Calculate deviation only if tender price is less than cost
+		deviating, amounts, percents = price_deviations(tender_prices, item_costs)
+
+		for i, row in enumerate(rows):
+			if not deviating[i]:
 				continue
 
-			# Get item cost from Item doctype
-			try:
-				item_doc = frappe.get_doc("Item", item_code)
-				item_cost = item_doc.standard_rate or 0
-			except frappe.DoesNotExistError:
-				item_cost = 0
-
-			# Get tender price from the row
-			tender_price = row.tender_price if hasattr(row, 'tender_price') else 0
-
-			# Calculate deviation only if tender price is less than cost
-			if tender_price and tender_price < item_cost:
-				deviation_amount = item_cost - tender_price
-				deviation_percent = (deviation_amount / item_cost * 100) if item_cost > 0 else 0
-
-				# Add to price deviation table
-				deviation_row = self.append("tender_price_deviation", {
-					"item": item_code,
-					"item_name": row.item_name if hasattr(row, 'item_name') else "",
-					"tender_price": tender_price,
-					"item_cost": item_cost,
-					"deviation_amount": deviation_amount,
-					"deviation_percent": round(deviation_percent, 2),
-					"deviation_status": "Pending Approval"
-				})
+			# Keep the decision on a deviation whose item, price and cost are unchanged
+			decision = previous.get((row.item_code, flt(tender_prices[i]), flt(item_costs[i])))
+
+			# Add to price deviation table
+			self.append("tender_price_deviation", {
+				"item": row.item_code,
+				"item_name": row.item_name if hasattr(row, 'item_name') else "",
+				"tender_price": tender_prices[i],
+				"item_cost": item_costs[i],
+				"deviation_amount": amounts[i],
+				"deviation_percent": percents[i],
+				"deviation_status": decision.deviation_status if decision else "Pending Approval",
+				"approved_by": decision.approved_by if decision else None,
+				"approved_on": decision.approved_on if decision else None
+			})
+
+	def get_previous_deviations(self):
+		"""Return the stored price deviations keyed by (item, tender price, item cost)"""
+		if self.is_new():
+			rows = self.tender_price_deviation or []
+		else:
+			rows = frappe.get_all("Tender Price Deviation",
+				filters={"parent": self.name, "parenttype": "Tenders", "parentfield": "tender_price_deviation"},
+				fields=["item", "tender_price", "item_cost", "deviation_status", "approved_by", "approved_on"])
+
+		return {(row.item, flt(row.tender_price), flt(row.item_cost)): row for row in rows}
 
 	def populate_tender_status(self):
 		"""Populate or update tender status from item tables without resetting supplied quantities"""
@@ -138,10 +192,19 @@ class Tenders(Document):
 		elif self.tender_type in ["Awarded Tenders", "Tender Submission", "Accepted Tenders"] and self.item_tender:
 			items_to_track = self.item_tender
 
-		# Map existing status entries by item
-		existing_status = {row.item_name: row for row in self.tender_status or []}
+		# Map existing status entries by item; the first row of an item carries its supplied quantity
+		existing_status = {}
+		for row in self.tender_status or []:
+			if row.item_name in existing_status:
+				row.supplied_quantity = 0
+			else:
+				existing_status[row.item_name] = row
+
+		# Supplied quantities are posted by Sales Invoices straight to the ledger, so re-read
+		# them instead of trusting the values loaded with this (possibly stale) form
+		supplied_quantities = {} if self.is_new() else get_supplied_quantities(self.name)
 		
-		new_status_rows = []
+		updated_status_rows = []
 		seen_items = set()
 
 		for row in items_to_track:
@@ -156,8 +219,8 @@ class Tenders(Document):
 				# Update existing row if quantities changed
 				status_row = existing_status[item_code]
 				status_row.tender_quantity = tender_qty
-				status_row.remaining_quantity = tender_qty - (status_row.supplied_quantity or 0)
-				status_row.fulfillment_percent = (status_row.supplied_quantity / tender_qty * 100) if tender_qty > 0 else 0
+				status_row.supplied_quantity = supplied_quantities.get(item_code, 0)
+				updated_status_rows.append(status_row)
 			else:
 				# Create new status row
 				self.append("tender_status", {
@@ -168,6 +231,14 @@ class Tenders(Document):
 					"fulfillment_percent": 0
 				})
 
+		# Recompute remaining quantity and fulfillment percent of the updated rows
+		remaining, percent = status_figures(
+			[row.tender_quantity for row in updated_status_rows],
+			[row.supplied_quantity for row in updated_status_rows])
+		for status_row, remaining_qty, fulfillment in zip(updated_status_rows, remaining, percent):
+			status_row.remaining_quantity = remaining_qty
+			status_row.fulfillment_percent = fulfillment
+
 	def validate_tender_dates(self):
 		"""Validate that tender start date is before end date"""
 		if self.tender_start_date and self.tender_end_date:
@@ -196,15 +267,14 @@ class Tenders(Document):
 
 			if rules_changed:
 				if self.tender_status:
-					total_tender_qty = sum(row.tender_quantity for row in self.tender_status)
-					total_supplied_qty = sum(row.supplied_quantity for row in self.tender_status)
+					fulfillment = fulfillment_ratio(
+						[row.tender_quantity for row in self.tender_status],
+						[row.supplied_quantity for row in self.tender_status])
 
-					if total_tender_qty > 0:
-						fulfillment_percent = (total_supplied_qty / total_tender_qty)
-						if fulfillment_percent >= 0.8:
-							# Check if user is Tender Manager
-							if "Tender Manager" not in frappe.get_roles(frappe.session.user):
-								frappe.throw(_("Any change in tender rules after date of start can’t be made before selling 80% from total quantities and require permission from only tender manager."))
+					if fulfillment >= 0.8:
+						# Check if user is Tender Manager
+						if "Tender Manager" not in frappe.get_roles(frappe.session.user):
+							frappe.throw(_("Any change in tender rules after date of start can’t be made before selling 80% from total quantities and require permission from only tender manager."))
 
 	def update_tender_end_date_if_extended(self):
 		"""Update tender end date after submission if extended time is applied"""
@@ -216,66 +286,60 @@ class Tenders(Document):
 		if not self.tender_number:
 			return
 
-		# Find awarded tender with same tender number
-		awarded_tenders = frappe.db.get_list("Tenders",
-			filters={
+		# Find awarded tender with same tender number (uses the tender_number index)
+		awarded_tender = frappe.db.get_value("Tenders",
+			{
 				"tender_type": "Awarded Tenders",
 				"tender_number": self.tender_number,
 				"docstatus": 1
 			},
-			fields=["name"])
+			["name", "supplying_by"],
+			as_dict=True,
+			order_by="modified desc")
+
+		if awarded_tender:
+			rows = get_awarded_tender_rows([awarded_tender.name]).get(awarded_tender.name, {})
+			self.copy_from_awarded_tender(awarded_tender, rows)
+
+	def copy_from_awarded_tender(self, awarded_tender, rows):
+		"""Copy item and supplier rows read by get_awarded_tender_rows onto this tender"""
+		# Copy item tenders
+		self.item_tender = []
+		for row in rows.get("item_tender", []):
+			self.append("item_tender", {
+				"item_code": row.item_code,
+				"item_name": row.item_name,
+				"tender_qty": row.tender_qty,
+				"tender_start_date": row.tender_start_date,
+				"tender_end_date": row.tender_end_date
+			})
 
-		if awarded_tenders:
-			awarded_tender = frappe.get_doc("Tenders", awarded_tenders[0].name)
-			
-			# Copy item tenders
-			self.item_tender = []
-			for row in awarded_tender.item_tender or []:
-				self.append("item_tender", {
-					"item_code": row.item_code,
-					"item_name": row.item_name,
-					"tender_qty": row.tender_qty,
-					"tender_start_date": row.tender_start_date,
-					"tender_end_date": row.tender_end_date
+		# Copy suppliers if applicable
+		if awarded_tender.supplying_by and awarded_tender.supplying_by != "Oncopharm":
+			self.tender_supplier = []
+			for row in rows.get("tender_supplier", []):
+				self.append("tender_supplier", {
+					"supplier": row.get("supplier") or "",
+					"supplier_name": row.get("supplier_name") or ""
 				})
 
-			# Copy suppliers if applicable
-			if awarded_tender.supplying_by and awarded_tender.supplying_by != "Oncopharm":
-				self.tender_supplier = []
-				for row in awarded_tender.tender_supplier or []:
-					self.append("tender_supplier", {
-						"supplier": row.supplier if hasattr(row, 'supplier') else "",
-						"supplier_name": row.supplier_name if hasattr(row, 'supplier_name') else ""
-					})
-
 	def get_deviation_summary(self):
 		"""Get summary of price deviations"""
 		if not self.tender_price_deviation:
 			return None
 
-		total_deviation = sum(row.deviation_amount for row in self.tender_price_deviation)
-		total_items_with_deviation = len(self.tender_price_deviation)
-		pending_approval = sum(1 for row in self.tender_price_deviation if row.deviation_status == "Pending Approval")
-		approved_deviations = sum(1 for row in self.tender_price_deviation if row.deviation_status == "Approved")
-
-		return {
-			"total_deviation": total_deviation,
-			"total_items_with_deviation": total_items_with_deviation,
-			"pending_approval": pending_approval,
-			"approved_deviations": approved_deviations
-		}
+		return deviation_summary(
+			[row.deviation_amount for row in self.tender_price_deviation],
+			[row.deviation_status for row in self.tender_price_deviation])
 
 	def get_fulfillment_status(self):
 		"""Calculate overall tender fulfillment status"""
 		if not self.tender_status:
 			return 0
 
-		total_tender_qty = sum(row.tender_quantity for row in self.tender_status)
-		total_supplied_qty = sum(row.supplied_quantity for row in self.tender_status)
-
-		if total_tender_qty > 0:
-			return round((total_supplied_qty / total_tender_qty) * 100, 2)
-		return 0
+		return fulfillment_percent(
+			[row.tender_quantity for row in self.tender_status],
+			[row.supplied_quantity for row in self.tender_status])
 
 	def can_create_sales_invoice(self):
 		"""Check if sales invoice can be created (all deviations must be approved)"""
@@ -288,64 +352,25 @@ class Tenders(Document):
 
 		return True
 
-	def update_deviation_details(self, invoice_no, items_list):
-		"""Update tender price deviation details from sales invoice"""
-		self.tender_price_deviation_details = []
-
-		for item in items_list:
-			item_code = item.get("item_code")
-			qty = item.get("qty")
-			rate = item.get("rate")
-
-			# Find matching tender item
-			tender_price = None
-			for dev_row in self.tender_price_deviation:
-				if dev_row.item == item_code:
-					tender_price = dev_row.tender_price
-					break
-
-			if tender_price and rate < tender_price:
-				# Use valuation rate as cost if available
-				item_cost = frappe.db.get_value("Item", item_code, "valuation_rate") or 0
-				
-				# Losses = (Cost - Rate) * Qty if rate < cost
-				losses = 0
-				if rate < item_cost:
-					losses = (item_cost - rate) * qty
-
-				detail_row = self.append("tender_price_deviation_details", {
-					"item_name": item_code,
-					"invoice_no": invoice_no,
-					"tender_price": tender_price,
-					"item_cost": item_cost,
-					"quantity_with_loss": qty,
-					"losses_value": losses,
-					"approved_status": "Pending",
-					"approved_by": item.get("custom_approved_by") # Optional: fetch from invoice
-				})
-
 	def populate_tender_price_deviation_details(self):
 		"""Fetch historical sales and cost data for Accepted Tenders"""
 		if not self.item_tender:
 			return
 
 		self.tender_price_deviation_details = []
+		item_pricing = self.get_item_pricing_map()
+		last_sales = get_last_sales([item.item_code for item in self.item_tender])
 		for item in self.item_tender:
 			item_code = item.item_code
 			if not item_code: continue
 
 			# 1. Get average purchase price (cost) from valuation rate
-			item_cost = frappe.db.get_value("Item", item_code, "valuation_rate") or 0
+			pricing = item_pricing.get(item_code)
+			item_cost = (pricing.valuation_rate if pricing else 0) or 0
 			
 			# 2. Get latest sales price for this item to show recent market price
-			last_sale = frappe.get_all("Sales Invoice Item", 
-				filters={"item_code": item_code, "docstatus": 1},
-				fields=["parent", "rate"],
-				order_by="creation desc",
-				limit=1
-			)
-			
-			invoice_no = last_sale[0].parent if last_sale else None
+			last_sale = last_sales.get(item_code)
+			invoice_no = last_sale.invoice if last_sale else None
 			
 			# 3. Tender Price is the awarded price
 			tender_price = item.price or 0
@@ -365,51 +390,400 @@ class Tenders(Document):
 				"losses_value": losses
 			})
 
+def on_doctype_update():
+	frappe.db.add_index("Tenders", ["tender_number", "tender_type", "docstatus"])
+
+def get_awarded_tender_rows(awarded_tenders):
+	"""Read the child rows copied to Accepted Tenders, one query per child table
+
+	Returns a dict of awarded tender name -> {"item_tender": [...], "tender_supplier": [...]}
+	holding only the columns that are copied.
+	"""
+	rows = {name: {"item_tender": [], "tender_supplier": []} for name in awarded_tenders}
+	if not rows:
+		return rows
+
+	supplier_fields = [field for field in ("supplier", "supplier_name")
+		if frappe.get_meta("Tender Supplier").has_field(field)]
+	child_tables = (
+		("Item Tender", "item_tender",
+			["item_code", "item_name", "tender_qty", "tender_start_date", "tender_end_date"]),
+		("Tender Supplier", "tender_supplier", supplier_fields),
+	)
+
+	for doctype, parentfield, fields in child_tables:
+		for row in frappe.get_all(doctype,
+			filters={"parenttype": "Tenders", "parentfield": parentfield, "parent": ["in", list(rows)]},
+			fields=["parent"] + fields,
+			order_by="parent asc, idx asc"):
+			rows[row.parent][parentfield].append(row)
+
+	return rows
+
 @frappe.whitelist()
-def upload_fmd_items(parent, file_url):
-    """Parse CSV/Excel file and upload items to Items FMD table"""
-    from frappe.utils.file_manager import get_file_path
-    import pandas as pd
-    
-    file_path = get_file_path(file_url)
-    
-    try:
-        if file_url.endswith('.csv'):
-            df = pd.read_csv(file_path)
-        else:
-            df = pd.read_excel(file_path)
-            
-        doc = frappe.get_doc("Tenders", parent)
-        
-        # Expected columns: Item Name, Quantity, Existing Supplier
-        # Mapping to fieldnames: item, quantity, existing_supplier
-        
-        # Simple mapping heuristic
-        col_map = {
-            "Item Name": "item",
-            "item name": "item",
-            "Item": "item",
-            "Quantity": "quantity",
-            "qty": "quantity",
-            "Qty": "quantity",
-            "Existing Supplier": "existing_supplier",
-            "Supplier": "existing_supplier"
-        }
-        
-        for _, row in df.iterrows():
-            item_data = {}
-            for col, field in col_map.items():
-                if col in df.columns:
-                    item_data[field] = row[col]
-            
-            if item_data.get("item"):
-                doc.append("items_fmd", item_data)
-                
-        doc.save()
-        return True
-        
-    except Exception as e:
-        frappe.log_error(frappe.get_traceback(), "FMD Upload Error")
-        frappe.throw(f"Error parsing file: {str(e)}")
+def create_accepted_tenders(tender_numbers):
+	"""Queue creation of draft Accepted Tenders for a batch of awarded tender numbers"""
+	frappe.has_permission("Tenders", "create", throw=True)
+
+	if isinstance(tender_numbers, str):
+		if tender_numbers.strip().startswith("["):
+			tender_numbers = json.loads(tender_numbers)
+		else:
+			# Comma or newline separated, as typed in the list view prompt
+			tender_numbers = tender_numbers.replace(",", "\n").splitlines()
+	tender_numbers = list(dict.fromkeys(str(number).strip() for number in tender_numbers if str(number).strip()))
+
+	if not tender_numbers:
+		frappe.throw("Please provide at least one tender number")
+
+	frappe.enqueue(
+		"onco.onco.doctype.tenders.tenders.make_accepted_tenders",
+		queue="long",
+		timeout=3600,
+		tender_numbers=tender_numbers,
+		user=frappe.session.user
+	)
+	return len(tender_numbers)
+
+def make_accepted_tenders(tender_numbers, user=None):
+	"""Create draft Accepted Tenders from submitted Awarded Tenders (background job)
+
+	Awarded tenders, existing accepted tenders and the copied child rows are each
+	read with a single query for the whole batch. Publishes a per tender number
+	report to the requesting user and returns it.
+	"""
+	awarded_tenders = {}
+	for tender in frappe.get_all("Tenders",
+		filters={"tender_type": "Awarded Tenders", "tender_number": ["in", tender_numbers], "docstatus": 1},
+		fields=["name", "tender_number", "category", "year_of_tender", "hospitalagent_name",
+			"supplying_by", "tender_start_date", "tender_end_date"],
+		order_by="modified asc"):
+		# Latest awarded tender wins, as in auto_fetch_from_awarded_tender
+		awarded_tenders[tender.tender_number] = tender
+
+	already_accepted = set(frappe.get_all("Tenders",
+		filters={"tender_type": "Accepted Tenders", "tender_number": ["in", tender_numbers], "docstatus": ["<", 2]},
+		pluck="tender_number"))
+
+	child_rows = get_awarded_tender_rows([tender.name for tender in awarded_tenders.values()])
+	report = []
+
+	for tender_number in tender_numbers:
+		awarded_tender = awarded_tenders.get(tender_number)
+		if not awarded_tender:
+			report.append({"tender_number": tender_number, "status": "Failed", "message": "No submitted Awarded Tender found"})
+			continue
+		if tender_number in already_accepted:
+			report.append({"tender_number": tender_number, "status": "Skipped", "message": "Accepted Tender already exists"})
+			continue
+
+		try:
+			category_code = "PRV" if awarded_tender.category == "Private Tender" else "UPA"
+			doc = frappe.get_doc({
+				"doctype": "Tenders",
+				"naming_series": f"TNDR-ACP-{category_code}-.YYYY.-.{{tender_number}}.",
+				"tender_type": "Accepted Tenders",
+				"category": awarded_tender.category,
+				"tender_number": tender_number,
+				"year_of_tender": awarded_tender.year_of_tender,
+				"hospitalagent_name": awarded_tender.hospitalagent_name,
+				"supplying_by": awarded_tender.supplying_by,
+				"date": frappe.utils.today(),
+				"tender_start_date": awarded_tender.tender_start_date,
+				"tender_end_date": awarded_tender.tender_end_date
+			})
+			doc.copy_from_awarded_tender(awarded_tender, child_rows.get(awarded_tender.name, {}))
+			doc.insert()
+			frappe.db.commit()
+			report.append({"tender_number": tender_number, "status": "Created", "tender": doc.name})
+		except Exception as e:
+			frappe.db.rollback()
+			frappe.log_error(frappe.get_traceback(), f"Accepted Tender creation failed: {tender_number}")
+			report.append({"tender_number": tender_number, "status": "Failed", "message": str(e)})
+
+	frappe.publish_realtime("accepted_tenders_created", report, user=user)
+	return report
 
+@frappe.whitelist()
+def set_price_deviation_status(tenders, deviation_status="Approved", rows=None):
+	"""Set the status of Tender Price Deviation rows with a single UPDATE
+
+	Args:
+		tenders: tender name or JSON list of tender names
+		deviation_status: Approved, Rejected or Pending Approval
+		rows: optional JSON list of Tender Price Deviation row names; all rows of
+			the given tenders are updated when omitted
+
+	Records the approver and timestamp on each row. The tenders are not saved,
+	so their validate pipeline does not run.
+	"""
+	if deviation_status not in ("Approved", "Rejected", "Pending Approval"):
+		frappe.throw(f"Invalid deviation status: {deviation_status}")
+
+	tenders = frappe.parse_json(tenders) if isinstance(tenders, str) and tenders.startswith("[") else tenders
+	if isinstance(tenders, str):
+		tenders = [tenders]
+	rows = frappe.parse_json(rows) if isinstance(rows, str) else rows
+
+	if not tenders:
+		frappe.throw("Please select at least one tender")
+
+	# Write access is checked on every tender, not just on the doctype
+	for tender in set(tenders):
+		frappe.has_permission("Tenders", "write", doc=tender, throw=True)
+
+	approved = deviation_status != "Pending Approval"
+	values = {
+		"tenders": tuple(tenders),
+		"rows": tuple(rows or []),
+		"deviation_status": deviation_status,
+		"approved_by": frappe.session.user if approved else None,
+		"approved_on": frappe.utils.now() if approved else None
+	}
+
+	frappe.db.sql(f"""
+		UPDATE `tabTender Price Deviation`
+		SET deviation_status = %(deviation_status)s,
+			approved_by = %(approved_by)s,
+			approved_on = %(approved_on)s
+		WHERE parenttype = 'Tenders' AND parentfield = 'tender_price_deviation'
+		AND parent IN %(tenders)s
+		AND deviation_status != %(deviation_status)s
+		{"AND name IN %(rows)s" if rows else ""}
+	""", values)
+
+	return True
+
+def get_item_pricing(item_codes):
+	"""Fetch standard rate, valuation rate and item name for many items in a single query
+
+	Returns a dict of item_code -> frappe._dict(standard_rate, valuation_rate, item_name).
+	Unknown item codes are simply absent from the result.
+	"""
+	item_codes = list({code for code in item_codes or [] if code})
+	if not item_codes:
+		return {}
+
+	rows = frappe.get_all("Item",
+		filters={"name": ["in", item_codes]},
+		fields=["name", "standard_rate", "valuation_rate", "item_name"])
+
+	return {row.name: row for row in rows}
+
+def get_last_sales(item_codes):
+	"""Resolve the latest submitted sale for many items in a single query
+
+	Returns a dict of item_code -> frappe._dict(invoice, rate, posting_date).
+	The per-item MAX(creation) is read straight from the (item_code, docstatus,
+	creation) index on Sales Invoice Item and joined back to its row.
+	"""
+	item_codes = list({code for code in item_codes or [] if code})
+	if not item_codes:
+		return {}
+
+	rows = frappe.db.sql("""
+		SELECT sii.item_code, sii.parent AS invoice, sii.rate, si.posting_date
+		FROM (
+			SELECT item_code, MAX(creation) AS creation
+			FROM `tabSales Invoice Item`
+			WHERE item_code IN %(item_codes)s
+			AND docstatus = 1
+			GROUP BY item_code
+		) latest_sale
+		INNER JOIN `tabSales Invoice Item` sii
+			ON sii.item_code = latest_sale.item_code
+			AND sii.docstatus = 1
+			AND sii.creation = latest_sale.creation
+		INNER JOIN `tabSales Invoice` si ON si.name = sii.parent
+	""", {"item_codes": tuple(item_codes)}, as_dict=True)
+
+	return {row.item_code: row for row in rows}
+
+# Spreadsheet column -> Items FMD fieldname. When several columns map to the
+# same field, the last one present in the file wins.
+FMD_COLUMN_MAP = {
+	"Item Name": "item",
+	"item name": "item",
+	"Item": "item",
+	"Quantity": "quantity",
+	"qty": "quantity",
+	"Qty": "quantity",
+	"Existing Supplier": "existing_supplier",
+	"Supplier": "existing_supplier"
+}
+
+FMD_IMPORT_CHUNK_SIZE = 5000
+
+@frappe.whitelist()
+def upload_fmd_items(parent, file_url):
+	"""Queue a streaming import of a CSV/Excel file into the Items FMD table"""
+	doc = frappe.get_doc("Tenders", parent)
+	doc.check_permission("write")
+
+	if doc.docstatus != 0:
+		frappe.throw("FMD data can only be uploaded to a draft tender")
+
+	frappe.enqueue(
+		"onco.onco.doctype.tenders.tenders.import_fmd_items",
+		queue="long",
+		timeout=3600,
+		job_id=f"fmd_import::{parent}",
+		deduplicate=True,
+		parent=parent,
+		file_url=file_url,
+		user=frappe.session.user
+	)
+	return True
+
+def import_fmd_items(parent, file_url, user=None):
+	"""Stream a CSV/Excel file into Items FMD rows in chunks (runs on the long queue)
+
+	CSV files are read with pandas in chunks and XLSX files row by row with a
+	read-only openpyxl workbook, so memory stays bounded by the chunk size. Legacy
+	XLS files are read whole with pandas. Rows are bulk-inserted as Items FMD
+	children of the tender and progress is published to the tender form. The
+	import is committed once at the end, so a failed file leaves no rows behind
+	and can simply be uploaded again. Tender rules and status are applied on the
+	next save of the tender.
+	"""
+	from frappe.utils.file_manager import get_file_path
+
+	file_path = get_file_path(file_url)
+	idx = frappe.db.sql("""
+		SELECT IFNULL(MAX(idx), 0) FROM `tabItems FMD`
+		WHERE parent = %s AND parenttype = 'Tenders' AND parentfield = 'items_fmd'
+	""", parent)[0][0]
+	imported = 0
+
+	try:
+		if file_url.lower().endswith('.csv'):
+			chunks, total_rows = _read_csv_chunks(file_path)
+		elif file_url.lower().endswith('.xls'):
+			chunks, total_rows = _read_xls_chunks(file_path)
+		else:
+			chunks, total_rows = _read_xlsx_chunks(file_path)
+
+		for chunk_no, chunk in enumerate(chunks, 1):
+			rows = _map_fmd_columns(chunk)
+			idx = _insert_fmd_rows(parent, rows, idx)
+			imported += len(rows)
+
+			processed = min(chunk_no * FMD_IMPORT_CHUNK_SIZE, total_rows or 0)
+			frappe.publish_progress(
+				(processed / total_rows * 100) if total_rows else 0,
+				title="Importing FMD Data",
+				doctype="Tenders",
+				docname=parent,
+				description=f"{imported} items imported"
+			)
 
+		frappe.db.set_value("Tenders", parent, "modified", frappe.utils.now(), update_modified=False)
+		frappe.db.commit()
+		frappe.publish_realtime("fmd_import_complete",
+			{"imported": imported}, doctype="Tenders", docname=parent, user=user)
+
+	except Exception as e:
+		# Nothing was committed yet, so the whole file is discarded
+		frappe.db.rollback()
+		frappe.log_error(frappe.get_traceback(), "FMD Upload Error")
+		frappe.publish_realtime("fmd_import_complete",
+			{"imported": 0, "error": f"Error parsing file: {str(e)}"},
+			doctype="Tenders", docname=parent, user=user)
+
+def _read_csv_chunks(file_path):
+	"""Return a chunk iterator over a CSV file and its data row count"""
+	import pandas as pd
+
+	with open(file_path, "rb") as f:
+		total_rows = max(sum(1 for _ in f) - 1, 0)
+
+	return pd.read_csv(file_path, chunksize=FMD_IMPORT_CHUNK_SIZE), total_rows
+
+def _read_xls_chunks(file_path):
+	"""Return a chunk iterator over the first sheet of a legacy XLS file and its data row count
+
+	openpyxl cannot read XLS, so the sheet is loaded whole with pandas and sliced.
+	"""
+	import pandas as pd
+
+	df = pd.read_excel(file_path)
+	chunks = (df.iloc[start:start + FMD_IMPORT_CHUNK_SIZE] for start in range(0, len(df), FMD_IMPORT_CHUNK_SIZE))
+	return chunks, len(df)
+
+def _read_xlsx_chunks(file_path):
+	"""Return a chunk iterator over the first sheet of an XLSX file and its data row count"""
+	import pandas as pd
+	from openpyxl import load_workbook
+
+	workbook = load_workbook(file_path, read_only=True, data_only=True)
+	sheet = workbook.worksheets[0]
+	total_rows = max((sheet.max_row or 1) - 1, 0)
+
+	def chunks():
+		try:
+			rows = sheet.iter_rows(values_only=True)
+			header = next(rows, None)
+			if not header:
+				return
+
+			batch = []
+			for row in rows:
+				batch.append(row)
+				if len(batch) >= FMD_IMPORT_CHUNK_SIZE:
+					yield pd.DataFrame(batch, columns=header)
+					batch = []
+			if batch:
+				yield pd.DataFrame(batch, columns=header)
+		finally:
+			workbook.close()
+
+	return chunks(), total_rows
+
+def _map_fmd_columns(df):
+	"""Map a spreadsheet chunk to Items FMD columns, dropping rows without an item"""
+	import pandas as pd
+
+	columns = {}
+	for col, field in FMD_COLUMN_MAP.items():
+		if col in df.columns:
+			columns[field] = col
+
+	if "item" not in columns:
+		return df.iloc[0:0]
+
+	mapped = df[list(columns.values())].set_axis(list(columns.keys()), axis=1)
+	mapped["item"] = mapped["item"].astype("string").str.strip()
+	mapped = mapped[mapped["item"].notna() & (mapped["item"] != "")].copy()
+
+	if "quantity" in mapped.columns:
+		mapped["quantity"] = pd.to_numeric(mapped["quantity"], errors="coerce").fillna(0)
+	if "existing_supplier" in mapped.columns:
+		mapped["existing_supplier"] = mapped["existing_supplier"].astype("string").fillna("")
+
+	return mapped
+
+def _insert_fmd_rows(parent, rows, idx):
+	"""Bulk insert mapped rows as Items FMD children of the tender; returns the last idx"""
+	if rows.empty:
+		return idx
+
+	timestamp = frappe.utils.now()
+	user = frappe.session.user
+	count = len(rows)
+
+	item = rows["item"].tolist()
+	quantity = rows["quantity"].tolist() if "quantity" in rows.columns else [0] * count
+	existing_supplier = rows["existing_supplier"].tolist() if "existing_supplier" in rows.columns else [""] * count
+
+	values = [
+		(frappe.generate_hash(length=10), timestamp, timestamp, user, user, 0,
+			parent, "Tenders", "items_fmd", idx + i + 1, item[i], quantity[i], existing_supplier[i])
+		for i in range(count)
+	]
+
+	frappe.db.bulk_insert("Items FMD",
+		fields=["name", "creation", "modified", "owner", "modified_by", "docstatus",
+			"parent", "parenttype", "parentfield", "idx", "item", "quantity", "existing_supplier"],
+		values=values)
+
+	return idx + count
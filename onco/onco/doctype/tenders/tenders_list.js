@@ -0,0 +1,38 @@
+// Copyright (c) 2026, ds and contributors
+// For license information, please see license.txt
+
+frappe.listview_settings["Tenders"] = {
+	onload(listview) {
+		listview.page.add_inner_button(__("Create Accepted Tenders"), function () {
+			frappe.prompt({
+				fieldtype: "Small Text",
+				fieldname: "tender_numbers",
+				label: __("Awarded Tender Numbers"),
+				description: __("One tender number per line or comma separated"),
+				reqd: 1
+			}, function (values) {
+				frappe.realtime.off("accepted_tenders_created");
+				frappe.realtime.on("accepted_tenders_created", (report) => {
+					frappe.realtime.off("accepted_tenders_created");
+					let rows = report.map(row => {
+						let details = frappe.utils.escape_html(row.tender || row.message || "");
+						return `<tr><td>${frappe.utils.escape_html(row.tender_number || "")}</td><td>${frappe.utils.escape_html(row.status || "")}</td><td>${details}</td></tr>`;
+					}).join("");
+					frappe.msgprint({
+						title: __("Accepted Tenders"),
+						message: `<table class="table table-bordered"><tr><th>${__("Tender Number")}</th><th>${__("Status")}</th><th>${__("Details")}</th></tr>${rows}</table>`
+					});
+					listview.refresh();
+				});
+
+				frappe.call({
+					method: "onco.onco.doctype.tenders.tenders.create_accepted_tenders",
+					args: { tender_numbers: values.tender_numbers },
+					callback: function (r) {
+						frappe.show_alert({ message: __("Creating {0} Accepted Tenders in the background", [r.message]), indicator: "blue" });
+					}
+				});
+			}, __("Create Accepted Tenders from Awarded Tenders"), __("Create"));
+		});
+	}
+};
@@ -4,6 +4,7 @@
 import frappe
 from frappe.tests.utils import FrappeTestCase
 from datetime import datetime, timedelta
+from onco.tests.utils import count_queries
 
 
 class TestTenders(FrappeTestCase):
@@ -237,6 +238,268 @@ class TestTenders(FrappeTestCase):
 		# Should return True with all approved
 		self.assertTrue(self.tender_doc.can_create_sales_invoice())
 
+	def test_price_deviation_query_count_is_constant(self):
+		"""Test that item cost lookups do not grow with the number of tender rows"""
+		def queries_for(row_count):
+			tender = self.create_test_tender()
+			for i in range(row_count):
+				item = self._get_or_create_item(f"TEST-ITEM-QC-{i:03d}")
+				tender.append("item_tender", {
+					"item_code": item.name,
+					"item_name": item.item_name,
+					"tender_price": 80
+				})
+
+			with count_queries() as queries:
+				tender.calculate_price_deviations()
+			return queries.call_count
+
+		small_tender_queries = queries_for(2)
+		large_tender_queries = queries_for(40)
+
+		self.assertEqual(small_tender_queries, large_tender_queries)
+		self.assertLessEqual(large_tender_queries, 1)
+
+	def test_last_sales_for_unsold_items(self):
+		"""Test that the last sale resolver skips items without submitted sales"""
+		from onco.onco.doctype.tenders.tenders import get_last_sales
+
+		item = self._get_or_create_item("TEST-ITEM-NEVER-SOLD")
+		self.assertEqual(get_last_sales([]), {})
+		self.assertNotIn(item.name, get_last_sales([item.name]))
+
+	def test_bulk_deviation_approval(self):
+		"""Test that deviations are approved in place without saving the tender"""
+		from onco.onco.doctype.tenders.tenders import set_price_deviation_status
+
+		item = self._get_or_create_item("TEST-ITEM-BULK-APPROVAL")
+		item.standard_rate = 100
+		item.save()
+
+		self.tender_doc = self.create_test_tender(tender_number="TEST-BULK-APPROVAL")
+		self.tender_doc.append("item_tender", {
+			"item_code": item.name,
+			"item_name": item.item_name,
+			"tender_price": 80
+		})
+		self.tender_doc.insert()
+		modified = frappe.db.get_value("Tenders", self.tender_doc.name, "modified")
+
+		set_price_deviation_status(self.tender_doc.name, "Approved")
+
+		rows = frappe.get_all("Tender Price Deviation",
+			filters={"parent": self.tender_doc.name},
+			fields=["deviation_status", "approved_by", "approved_on"])
+		self.assertTrue(rows)
+		for row in rows:
+			self.assertEqual(row.deviation_status, "Approved")
+			self.assertEqual(row.approved_by, frappe.session.user)
+			self.assertIsNotNone(row.approved_on)
+		self.assertEqual(frappe.db.get_value("Tenders", self.tender_doc.name, "modified"), modified)
+
+	def test_bulk_approval_survives_resave(self):
+		"""Test that saving the tender again keeps approved deviations approved"""
+		from onco.onco.doctype.tenders.tenders import set_price_deviation_status
+
+		item = self._get_or_create_item("TEST-ITEM-APPROVAL-RESAVE")
+		item.standard_rate = 100
+		item.save()
+
+		self.tender_doc = self.create_test_tender(tender_number="TEST-APPROVAL-RESAVE")
+		self.tender_doc.append("item_tender", {
+			"item_code": item.name,
+			"item_name": item.item_name,
+			"tender_price": 80
+		})
+		self.tender_doc.insert()
+
+		set_price_deviation_status(self.tender_doc.name, "Approved")
+
+		# The in-memory document still shows the rows as pending, like an open form
+		self.assertEqual(self.tender_doc.tender_price_deviation[0].deviation_status, "Pending Approval")
+		self.tender_doc.save()
+
+		rows = frappe.get_all("Tender Price Deviation",
+			filters={"parent": self.tender_doc.name},
+			fields=["deviation_status", "approved_by", "approved_on"])
+		self.assertEqual(len(rows), 1)
+		self.assertEqual(rows[0].deviation_status, "Approved")
+		self.assertEqual(rows[0].approved_by, frappe.session.user)
+		self.assertIsNotNone(rows[0].approved_on)
+		self.assertTrue(self.tender_doc.can_create_sales_invoice())
+
+		# A changed tender price is a new deviation and needs approval again
+		self.tender_doc.item_tender[0].tender_price = 70
+		self.tender_doc.save()
+		self.assertEqual(self.tender_doc.tender_price_deviation[0].deviation_status, "Pending Approval")
+		self.assertFalse(self.tender_doc.tender_price_deviation[0].approved_by)
+
+	def test_simulation_matches_awarded_tender_rule(self):
+		"""Test that the what-if simulation projects what the tender rule sets on Item Tender"""
+		self.tender_doc = self.create_test_tender(tender_number="TEST-SIM-AWARDED")
+		for i, qty in enumerate([100, 40]):
+			self.tender_doc.append("item_tender", {
+				"item_code": self._get_or_create_item(f"TEST-ITEM-SIM-{i}").name,
+				"tender_qty": qty
+			})
+		self.tender_doc.insert()
+
+		for scenario in ({"extra_qty_type": "Percent", "extra_qty_value": 10},
+				{"extra_qty_type": "Quantity", "extra_qty_value": 5}):
+			result = self._simulate(scenario)
+			quantities = self._apply_rule(scenario, "item_tender", "tender_qty")
+			self.assertEqual(result["tenders"][0]["projected_qty"], sum(quantities))
+			self.assertEqual(result["total_extra_qty"], sum(quantities) - 140)
+
+	def test_simulation_starts_from_original_quantity(self):
+		"""Test that a scenario is applied to the original quantity, not an already extended one"""
+		self.tender_doc = self.create_test_tender(tender_number="TEST-SIM-ORIGINAL",
+			tender_type="Tenders for market data")
+		self.tender_doc.append("items_fmd", {"item": "Test Market Item", "quantity": 100})
+		self.tender_doc.insert()
+
+		scenario = {"extra_qty_type": "Percent", "extra_qty_value": 10}
+		self._apply_rule(scenario, "items_fmd", "quantity")
+
+		# Applying the rule again starts from original_quantity, so the result does not compound
+		doc = frappe.get_doc("Tenders", self.tender_doc.name)
+		doc.update(scenario)
+		doc.apply_extra_quantity_logic()
+		doc.apply_extra_quantity_logic()
+		self.assertEqual(doc.items_fmd[0].quantity, 110)
+		self.assertEqual(self._simulate(scenario)["total_projected_qty"], 110)
+
+	def test_simulation_skips_tables_the_rule_does_not_change(self):
+		"""Test that Tender Submission and Accepted Tenders project no extra quantity on Item Tender"""
+		item_code = self._get_or_create_item("TEST-ITEM-SIM-SKIP").name
+		for tender_type in ("Tender Submission", "Accepted Tenders"):
+			self.tender_doc = self.create_test_tender(tender_number=f"TEST-SIM-{tender_type[:3].upper()}",
+				tender_type=tender_type)
+			self.tender_doc.append("item_tender", {"item_code": item_code, "tender_qty": 100})
+			self.tender_doc.insert()
+
+			scenario = {"extra_qty_type": "Quantity", "extra_qty_value": 5}
+			result = self._simulate(scenario)
+			self.assertEqual(self._apply_rule(scenario, "item_tender", "tender_qty"), [100])
+			self.assertEqual(result["total_extra_qty"], 0)
+			self.assertEqual(result["affected_rows"], 0)
+
+			frappe.delete_doc("Tenders", self.tender_doc.name, force=True)
+
+	def test_fulfillment_ledger_on_invoice_submit_and_cancel(self):
+		"""Test that tender Sales Invoices post and reverse supplied quantities through the ledger"""
+		item_code = self._get_or_create_item("TEST-ITEM-FULFILLMENT").name
+		self.tender_doc = self.create_test_tender(tender_number="TEST-FULFILLMENT")
+		self.tender_doc.append("item_tender", {"item_code": item_code, "tender_qty": 100})
+		self.tender_doc.insert()
+
+		invoice = self._create_tender_invoice(item_code, qty=30)
+		invoice.submit()
+
+		entries = frappe.get_all("Tender Fulfillment Ledger",
+			filters={"sales_invoice": invoice.name},
+			fields=["tender", "item_code", "qty"])
+		self.assertEqual(len(entries), 1)
+		self.assertEqual(entries[0].tender, self.tender_doc.name)
+		self.assertEqual(entries[0].item_code, item_code)
+		self.assertEqual(entries[0].qty, 30)
+		self.assertStatusQuantities(item_code, supplied=30, remaining=70)
+
+		# Saving the tender again re-reads the ledger instead of resetting the supplied quantity
+		frappe.get_doc("Tenders", self.tender_doc.name).save()
+		self.assertStatusQuantities(item_code, supplied=30, remaining=70)
+
+		invoice.cancel()
+
+		entries = frappe.get_all("Tender Fulfillment Ledger",
+			filters={"sales_invoice": invoice.name},
+			pluck="qty",
+			order_by="creation asc")
+		self.assertEqual(entries, [30, -30])
+		self.assertStatusQuantities(item_code, supplied=0, remaining=100)
+
+	def test_deviation_ledger_written_on_submit_only(self):
+		"""Test that a draft writes no deviation entries and submit writes one per deviating line"""
+		below = self._get_or_create_item("TEST-ITEM-DEV-BELOW").name
+		above = self._get_or_create_item("TEST-ITEM-DEV-ABOVE").name
+		self.tender_doc = self.create_test_tender(tender_number="TEST-DEVIATION-LEDGER")
+		self.tender_doc.insert()
+
+		with self._tender_prices({below: 100, above: 100}):
+			invoice = self._create_tender_invoice(below, qty=5, rate=80)
+			invoice.append("items", {**invoice.items[0].as_dict(no_default_fields=True), "item_code": above, "rate": 120})
+			invoice.append("items", {**invoice.items[0].as_dict(no_default_fields=True), "qty": 2, "rate": 90})
+			invoice.update({
+				"custom_price_deviation_approved": 1,
+				"custom_cause_of_deviation": "Test deviation",
+				"custom_approved_by": frappe.session.user
+			})
+			invoice.insert()
+
+			self.assertFalse(frappe.get_all("Tender Deviation Ledger", filters={"sales_invoice": invoice.name}))
+
+			invoice.submit()
+
+		entries = frappe.get_all("Tender Deviation Ledger",
+			filters={"sales_invoice": invoice.name},
+			fields=["sales_invoice_item", "item_code", "quantity_with_loss", "approved_status"])
+		self.assertEqual(len(entries), 2)
+		self.assertEqual(
+			{entry.sales_invoice_item for entry in entries},
+			{invoice.items[0].name, invoice.items[2].name})
+		for entry in entries:
+			self.assertEqual(entry.item_code, below)
+			self.assertEqual(entry.approved_status, "Approved")
+		self.assertEqual(sorted(entry.quantity_with_loss for entry in entries), [2, 5])
+
+	def test_unapproved_deviation_blocks_invoice(self):
+		"""Test that an invoice sold below the tender price needs an approval"""
+		item_code = self._get_or_create_item("TEST-ITEM-DEV-UNAPPROVED").name
+		self.tender_doc = self.create_test_tender(tender_number="TEST-DEVIATION-BLOCK")
+		self.tender_doc.insert()
+
+		with self._tender_prices({item_code: 100}):
+			invoice = self._create_tender_invoice(item_code, qty=5, rate=80)
+			self.assertRaises(frappe.ValidationError, invoice.insert)
+
+	def _tender_prices(self, prices):
+		"""Serve fixed tender prices; Item Tender has no tender_price column without the customization"""
+		from unittest.mock import patch
+
+		return patch("onco.onco.tender_validation.get_tender_price_index",
+			return_value={"modified": None, "prices": prices})
+
+	def assertStatusQuantities(self, item_code, supplied, remaining):
+		"""Assert the supplied and remaining quantity of an item's Tender Status row"""
+		status = frappe.db.get_value("Tender Status",
+			{"parent": self.tender_doc.name, "parenttype": "Tenders", "item_name": item_code},
+			["supplied_quantity", "remaining_quantity"], as_dict=True)
+		self.assertEqual(status.supplied_quantity, supplied)
+		self.assertEqual(status.remaining_quantity, remaining)
+
+	def _create_tender_invoice(self, item_code, qty, rate=100):
+		"""Build a draft Sales Invoice against the test tender"""
+		from erpnext.accounts.doctype.sales_invoice.test_sales_invoice import create_sales_invoice
+
+		invoice = create_sales_invoice(customer=self._get_or_create_customer(), item_code=item_code,
+			qty=qty, rate=rate, do_not_save=True)
+		invoice.custom_tender_ref = self.tender_doc.name
+		return invoice
+
+	def _simulate(self, scenario):
+		"""Run one scenario of the what-if simulation on the test tender"""
+		from onco.onco.tender_simulation import load_tender_quantities, parse_scenarios, run_scenarios
+
+		tender_names, columns = load_tender_quantities([self.tender_doc.name])
+		return run_scenarios(tender_names, columns, parse_scenarios([scenario]))[0]
+
+	def _apply_rule(self, scenario, table, qty_field):
+		"""Apply the tender's own extra quantity rule to a fresh copy and return the quantities"""
+		doc = frappe.get_doc("Tenders", self.tender_doc.name)
+		doc.update(scenario)
+		doc.apply_extra_quantity_logic()
+		return [row.get(qty_field) for row in doc.get(table)]
+
 	def _get_or_create_item(self, item_code):
 		"""Get or create a test item"""
 		if not frappe.db.exists("Item", item_code):
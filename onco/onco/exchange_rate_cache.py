@@ -0,0 +1,85 @@
+# Copyright (c) 2026, Onco and contributors
+# For license information, please see license.txt
+
+"""Date-bucketed exchange rate cache for Onco mappers
+
+erpnext.setup.utils.get_exchange_rate may read Currency Exchange history or call
+an external provider on every call. Each rate is cached under its own
+(pair, date) key with a Redis TTL, so old days expire on their own. Saving or
+deleting a Currency Exchange record drops the cached rates of its pair (both
+directions). Hits and misses are counted atomically for monitoring.
+"""
+
+import frappe
+from frappe.utils import cint, flt, getdate, nowdate
+
+EXCHANGE_RATE_CACHE_KEY = "onco_exchange_rates"
+EXCHANGE_RATE_STATS_KEY = "onco_exchange_rate_stats"
+EXCHANGE_RATE_CACHE_TTL = 6 * 60 * 60
+
+
+def _pair_key(from_currency, to_currency):
+    return f"{EXCHANGE_RATE_CACHE_KEY}|{from_currency}|{to_currency}|"
+
+
+def _count(outcome):
+    cache = frappe.cache()
+    # Counters are plain Redis integers, not pickled values, so they can be incremented in place
+    cache.hincrby(cache.make_key(EXCHANGE_RATE_STATS_KEY), outcome, 1)
+
+
+def get_cached_exchange_rate(from_currency, to_currency, transaction_date=None):
+    """Exchange rate from `from_currency` to `to_currency` on `transaction_date`, cached per day"""
+    if not from_currency or not to_currency or from_currency == to_currency:
+        return 1.0
+
+    cache = frappe.cache()
+    date_key = str(getdate(transaction_date or nowdate()))
+    key = _pair_key(from_currency, to_currency) + date_key
+
+    rate = cache.get_value(key)
+    if rate is not None:
+        _count("hits")
+        return rate
+
+    _count("misses")
+    from erpnext.setup.utils import get_exchange_rate
+    rate = flt(get_exchange_rate(from_currency, to_currency, date_key))
+
+    # A missing rate is not cached, so a Currency Exchange added later is picked up at once
+    if rate:
+        cache.set_value(key, rate, expires_in_sec=EXCHANGE_RATE_CACHE_TTL)
+    return rate
+
+
+def invalidate_exchange_rates(doc, method=None):
+    """Currency Exchange on_update / on_trash: drop cached rates of the record's pair"""
+    cache = frappe.cache()
+    # get_exchange_rate also reads the inverse record, and an edit may change the pair
+    for record in (doc, doc.get_doc_before_save()):
+        if record:
+            cache.delete_keys(_pair_key(record.from_currency, record.to_currency))
+            cache.delete_keys(_pair_key(record.to_currency, record.from_currency))
+
+
+@frappe.whitelist()
+def get_exchange_rate_cache_stats():
+    """Hit and miss counts of the exchange rate cache since the last reset"""
+    frappe.only_for("System Manager")
+
+    cache = frappe.cache()
+    hits, misses = (cint(count) for count in
+        cache.hmget(cache.make_key(EXCHANGE_RATE_STATS_KEY), ["hits", "misses"]))
+    lookups = hits + misses
+
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / lookups, 4) if lookups else None
+    }
+
+
+@frappe.whitelist()
+def reset_exchange_rate_cache_stats():
+    frappe.only_for("System Manager")
+    frappe.cache().delete_value(EXCHANGE_RATE_STATS_KEY)
@@ -0,0 +1,295 @@
+import frappe
+from frappe import _
+from frappe.utils import flt
+
+
+def on_purchase_order_submit(doc, method):
+    """Post ordered quantities of an approval-linked Purchase Order to the consumption ledger"""
+    if not doc.get("custom_importation_approval"):
+        return
+
+    # A Purchase Order is posted once; its net ledger balance is non-zero until cancelled
+    if get_posted_quantities(doc.name):
+        return
+
+    rows = get_approval_rows(doc.custom_importation_approval, get_item_codes(doc))
+    row_qty = allocate_purchase_order(doc, rows)
+    post_consumption(doc.custom_importation_approval, doc.name, doc.transaction_date, row_qty)
+
+
+def on_purchase_order_cancel(doc, method):
+    """Reverse whatever the Purchase Order posted to the consumption ledger
+
+    This includes the quantities carried forward to later versions of the approval.
+    """
+    if not doc.get("custom_importation_approval"):
+        return
+
+    posted = get_posted_quantities(doc.name)
+    reversals = {}
+    for (importation_approval, row_name, item_code), qty in posted.items():
+        reversals.setdefault(importation_approval, {})[(row_name, item_code)] = -qty
+
+    for importation_approval, row_qty in reversals.items():
+        post_consumption(importation_approval, doc.name, doc.transaction_date, row_qty)
+
+
+def validate_purchase_order(doc, method):
+    """Purchase Order validate: block quantities above what remains on the approval rows"""
+    if not doc.get("custom_importation_approval") or doc.docstatus == 2:
+        return
+
+    item_codes = get_item_codes(doc)
+    # Lock the approval rows while submitting so two Purchase Orders cannot both pass
+    rows = get_approval_rows(doc.custom_importation_approval, item_codes, for_update=doc.docstatus == 1)
+
+    approved_items = {row.item_code for row in rows}
+    for item_code in item_codes:
+        if item_code not in approved_items:
+            frappe.throw(_("Item {0} is not part of Importation Approval {1}").format(
+                item_code, doc.custom_importation_approval))
+
+    ordered = {}
+    for (row_name, item_code), qty in allocate_purchase_order(doc, rows).items():
+        ordered[row_name] = ordered.get(row_name, 0) + qty
+
+    for row in rows:
+        if flt(ordered.get(row.name)) > flt(row.remaining_qty):
+            frappe.throw(_("Quantity {0} for item {1} exceeds the {2} remaining on row {3} of Importation Approval {4}").format(
+                ordered[row.name], row.item_code, flt(row.remaining_qty), row.idx, doc.custom_importation_approval))
+
+
+def get_item_codes(doc):
+    return list({item.item_code for item in doc.items if item.item_code})
+
+
+def get_approval_rows(importation_approval, item_codes=None, for_update=False):
+    """Item rows of an approval with their remaining quantity, in row order"""
+    conditions = ""
+    values = {"approval": importation_approval}
+    if item_codes:
+        conditions = "AND item_code IN %(item_codes)s"
+        values["item_codes"] = tuple(item_codes)
+
+    return frappe.db.sql(f"""
+        SELECT name, idx, item_code, approved_qty,
+            IFNULL(approved_qty, 0) - IFNULL(consumed_qty, 0) AS remaining_qty
+        FROM `tabImportation Approvals Item`
+        WHERE parenttype = 'Importation Approvals' AND parent = %(approval)s {conditions}
+        ORDER BY idx
+        {"FOR UPDATE" if for_update else ""}
+    """, values, as_dict=True)
+
+
+def allocate_purchase_order(doc, rows):
+    """Split Purchase Order line quantities over approval rows
+
+    A line mapped from an approval row (custom_importation_approvals_item) is charged
+    to that row. Other lines are spread over the rows of their item in row order.
+    Returns a dict of (row name, item_code) -> quantity.
+    """
+    rows_by_name = {row.name: row for row in rows}
+    available = {row.name: flt(row.remaining_qty) for row in rows}
+    allocation = {}
+    unassigned = {}
+
+    for item in doc.items:
+        if not item.item_code:
+            continue
+        row = rows_by_name.get(item.get("custom_importation_approvals_item"))
+        if row and row.item_code == item.item_code:
+            key = (row.name, row.item_code)
+            allocation[key] = allocation.get(key, 0) + flt(item.qty)
+            available[row.name] -= flt(item.qty)
+        else:
+            unassigned[item.item_code] = unassigned.get(item.item_code, 0) + flt(item.qty)
+
+    for item_code, qty in unassigned.items():
+        allocate_to_rows([row for row in rows if row.item_code == item_code], qty, available, allocation)
+
+    return allocation
+
+
+def allocate_to_rows(item_rows, qty, available, allocation):
+    """Charge `qty` of one item to `item_rows` in order, overflowing onto the last row"""
+    if not item_rows or not qty:
+        return
+
+    for row in item_rows:
+        take = min(qty, max(available[row.name], 0))
+        if row is item_rows[-1]:
+            take = qty
+        if take:
+            key = (row.name, row.item_code)
+            allocation[key] = allocation.get(key, 0) + take
+            available[row.name] -= take
+            qty -= take
+        if not qty:
+            break
+
+
+def get_posted_quantities(purchase_order):
+    """Net quantity per (approval, approval row, item) currently posted by a Purchase Order
+
+    Covers the approval it was raised against and every later version carrying it forward.
+    """
+    rows = frappe.db.sql("""
+        SELECT importation_approval, importation_approvals_item, item_code, SUM(qty) AS qty
+        FROM `tabImportation Approval Ledger`
+        WHERE purchase_order = %s
+        GROUP BY importation_approval, importation_approvals_item, item_code
+        HAVING SUM(qty) != 0
+    """, purchase_order, as_dict=True)
+
+    return {(row.importation_approval, row.importation_approvals_item, row.item_code): row.qty for row in rows}
+
+
+def get_remaining_quantities(importation_approval, item_codes=None, for_update=False):
+    """Remaining approved quantity per item, summed over the approval rows"""
+    remaining = {}
+    for row in get_approval_rows(importation_approval, item_codes, for_update):
+        remaining[row.item_code] = remaining.get(row.item_code, 0) + flt(row.remaining_qty)
+    return remaining
+
+
+def post_consumption(importation_approval, purchase_order, transaction_date, row_qty, carried_from=None):
+    """Insert signed ledger entries and apply the same deltas to the approval item rows
+
+    Args:
+        importation_approval: Name of the Importation Approvals document
+        purchase_order: Purchase Order posting the movement
+        transaction_date: Transaction date of the Purchase Order
+        row_qty: dict of (approval row name, item_code) -> signed quantity delta
+        carried_from: earlier version of the approval the quantity is carried forward from
+    """
+    row_qty = {key: qty for key, qty in row_qty.items() if qty}
+    if not row_qty:
+        return
+
+    for (row_name, item_code), qty in row_qty.items():
+        frappe.get_doc({
+            "doctype": "Importation Approval Ledger",
+            "importation_approval": importation_approval,
+            "importation_approvals_item": row_name,
+            "item_code": item_code,
+            "qty": qty,
+            "purchase_order": purchase_order,
+            "transaction_date": transaction_date,
+            "carried_from": carried_from
+        }).insert(ignore_permissions=True)
+
+    deltas = {}
+    for (row_name, item_code), qty in row_qty.items():
+        deltas[row_name] = deltas.get(row_name, 0) + qty
+
+    consumed_case = " ".join(["WHEN %s THEN %s"] * len(deltas))
+    case_values = [value for row in deltas.items() for value in row]
+
+    frappe.db.sql(f"""
+        UPDATE `tabImportation Approvals Item`
+        SET consumed_qty = IFNULL(consumed_qty, 0) + CASE name {consumed_case} ELSE 0 END
+        WHERE parenttype = 'Importation Approvals' AND parent = %s AND name IN %s
+    """, (*case_values, importation_approval, tuple(deltas)))
+
+    refresh_remaining_quantities(importation_approval, rows=tuple(deltas))
+
+
+def carry_forward_consumption(doc):
+    """Post the consumption of the version `doc` replaces onto `doc`'s rows
+
+    Called when a modification/extension is inserted. Entries keep their Purchase
+    Order, so cancelling it later also reverses the carried quantity.
+    """
+    if not doc.original_document:
+        return
+
+    balances = frappe.db.sql("""
+        SELECT purchase_order, transaction_date, item_code, SUM(qty) AS qty
+        FROM `tabImportation Approval Ledger`
+        WHERE importation_approval = %s
+        GROUP BY purchase_order, transaction_date, item_code
+        HAVING SUM(qty) != 0
+        ORDER BY MIN(creation)
+    """, doc.original_document, as_dict=True)
+    if not balances:
+        return
+
+    rows = [
+        frappe._dict(name=row.name, item_code=row.item_code,
+            remaining_qty=flt(row.approved_qty) - flt(row.consumed_qty))
+        for row in sorted(doc.items, key=lambda row: row.idx)
+    ]
+    available = {row.name: row.remaining_qty for row in rows}
+
+    for balance in balances:
+        # Items dropped by the new version have nothing left to consume against
+        item_rows = [row for row in rows if row.item_code == balance.item_code]
+        allocation = {}
+        allocate_to_rows(item_rows, flt(balance.qty), available, allocation)
+        post_consumption(doc.name, balance.purchase_order, balance.transaction_date, allocation,
+            carried_from=doc.original_document)
+
+    for row in doc.items:
+        row.consumed_qty = flt(row.approved_qty) - available.get(row.name, flt(row.approved_qty))
+        row.remaining_qty = available.get(row.name, flt(row.approved_qty))
+
+
+def refresh_remaining_quantities(importation_approval=None, rows=None):
+    """Recompute remaining quantity from approved and consumed quantity"""
+    conditions = ["parenttype = 'Importation Approvals'"]
+    values = {}
+    if importation_approval:
+        conditions.append("parent = %(approval)s")
+        values["approval"] = importation_approval
+    if rows:
+        conditions.append("name IN %(rows)s")
+        values["rows"] = tuple(rows)
+
+    frappe.db.sql(f"""
+        UPDATE `tabImportation Approvals Item`
+        SET remaining_qty = IFNULL(approved_qty, 0) - IFNULL(consumed_qty, 0)
+        WHERE {" AND ".join(conditions)}
+    """, values)
+
+
+@frappe.whitelist()
+def get_remaining_approved_qty(importation_approval, item_code=None):
+    """Remaining approved quantity of one item, or of every item as a dict"""
+    frappe.has_permission("Importation Approvals", "read", importation_approval, throw=True)
+
+    if item_code:
+        return get_remaining_quantities(importation_approval, [item_code]).get(item_code, 0)
+    return get_remaining_quantities(importation_approval)
+
+
+@frappe.whitelist()
+def rebuild_importation_consumption(importation_approval=None):
+    """Recompute consumed quantities of approval items from the consumption ledger
+
+    Rebuilds a single approval when `importation_approval` is given, otherwise every
+    approval, using one aggregate query over the ledger. Can also be run from the console:
+        bench --site [site-name] execute onco.onco.importation_consumption.rebuild_importation_consumption
+    """
+    if importation_approval:
+        frappe.has_permission("Importation Approvals", "write", importation_approval, throw=True)
+    else:
+        frappe.only_for("System Manager")
+
+    approval_condition = "AND iai.parent = %(approval)s" if importation_approval else ""
+    ledger_condition = "WHERE importation_approval = %(approval)s" if importation_approval else ""
+
+    frappe.db.sql(f"""
+        UPDATE `tabImportation Approvals Item` iai
+        LEFT JOIN (
+            SELECT importation_approvals_item, SUM(qty) AS qty
+            FROM `tabImportation Approval Ledger`
+            {ledger_condition}
+            GROUP BY importation_approvals_item
+        ) ledger ON ledger.importation_approvals_item = iai.name
+        SET iai.consumed_qty = IFNULL(ledger.qty, 0)
+        WHERE iai.parenttype = 'Importation Approvals' {approval_condition}
+    """, {"approval": importation_approval})
+
+    refresh_remaining_quantities(importation_approval)
+
+    return True
@@ -0,0 +1,98 @@
+# Copyright (c) 2026, Onco and contributors
+# For license information, please see license.txt
+
+"""Lineage index for importation modification/extension chains
+
+Every Importation Approval Request and Importation Approvals document carries
+`lineage_root` (the first document of its chain) and `lineage_version` (0 for
+the root, +1 per modification/extension). Both columns are indexed together,
+so "latest active version", "full chain" and "is superseded" are each a single
+self-join on (lineage_root, lineage_version) instead of hop-by-hop walks over
+`original_document`.
+"""
+
+import frappe
+
+LINEAGE_DOCTYPES = ("Importation Approval Request", "Importation Approvals")
+
+
+def set_lineage(doc):
+    """Fill lineage_root/lineage_version on a new document (or one that predates the index)"""
+    # frappe.copy_doc keeps no_copy fields by default, so new documents are always recomputed
+    if doc.lineage_root and not doc.is_new():
+        return
+
+    if doc.original_document:
+        parent = frappe.db.get_value(doc.doctype, doc.original_document,
+            ["lineage_root", "lineage_version"], as_dict=True)
+        if parent:
+            doc.lineage_root = parent.lineage_root or doc.original_document
+            doc.lineage_version = (parent.lineage_version or 0) + 1
+            return
+
+    doc.lineage_root = doc.name
+    doc.lineage_version = 0
+
+
+def add_lineage_index(doctype):
+    frappe.db.add_index(doctype, ["lineage_root", "lineage_version"])
+
+
+def _active_condition(doctype, alias):
+    """SQL condition for versions that can still be acted upon"""
+    if doctype == "Importation Approval Request":
+        return f"{alias}.docstatus < 2 AND IFNULL({alias}.status, '') NOT LIKE 'Closed%%'"
+    return f"{alias}.docstatus < 2"
+
+
+def _check_doctype(doctype):
+    if doctype not in LINEAGE_DOCTYPES:
+        frappe.throw(f"Lineage is not tracked for {doctype}")
+    frappe.has_permission(doctype, "read", throw=True)
+
+
+@frappe.whitelist()
+def get_latest_version(doctype, name):
+    """Name of the latest active version in the chain of `name` (or None)"""
+    _check_doctype(doctype)
+    result = frappe.db.sql(f"""
+        SELECT l.name
+        FROM `tab{doctype}` d
+        INNER JOIN `tab{doctype}` l ON l.lineage_root = d.lineage_root
+        WHERE d.name = %s
+        AND {_active_condition(doctype, "l")}
+        ORDER BY l.lineage_version DESC, l.creation DESC
+        LIMIT 1
+    """, (name,))
+    return result[0][0] if result else None
+
+
+@frappe.whitelist()
+def get_lineage(doctype, name):
+    """Every version in the chain of `name`, oldest first"""
+    _check_doctype(doctype)
+    return frappe.db.sql(f"""
+        SELECT l.name, l.lineage_version, l.original_document, l.docstatus,
+            l.is_modification, l.is_extension, l.creation
+        FROM `tab{doctype}` d
+        INNER JOIN `tab{doctype}` l ON l.lineage_root = d.lineage_root
+        WHERE d.name = %s
+        ORDER BY l.lineage_version, l.creation
+    """, (name,), as_dict=True)
+
+
+@frappe.whitelist()
+def is_superseded(doctype, name):
+    """True if a newer, non-cancelled version exists in the chain of `name`"""
+    _check_doctype(doctype)
+    return bool(frappe.db.sql(f"""
+        SELECT 1
+        FROM `tab{doctype}` d
+        INNER JOIN `tab{doctype}` l ON l.lineage_root = d.lineage_root
+        WHERE d.name = %s
+        AND l.name != d.name
+        AND l.docstatus != 2
+        AND (l.lineage_version > d.lineage_version
+            OR (l.lineage_version = d.lineage_version AND l.creation > d.creation))
+        LIMIT 1
+    """, (name,)))
@@ -0,0 +1,327 @@
+# Copyright (c) 2026, Onco and contributors
+# For license information, please see license.txt
+
+"""Shared context for mapping importation documents to Purchase Orders
+
+Company, currencies, conversion rates and the default warehouse are the same for
+every row of one approval, so they are resolved once per mapping call. Item
+purchase details (UOM, conversion factor, tax template, default warehouse,
+price list and last purchase rates) are fetched for all rows together, following
+get_item_details: supplier-specific prices first, template item prices for
+variants, and item group tax templates when the item has none. Items covered by
+an active buying Pricing Rule are priced through get_item_details itself.
+"""
+
+import frappe
+from frappe.utils import cstr, flt, getdate, nowdate
+
+from onco.onco.exchange_rate_cache import get_cached_exchange_rate
+
+DEFAULT_COMPANY = "ONCOPHARM EGYPT S.A.E"
+DEFAULT_CURRENCY = "EGP"
+
+
+def get_mapping_context(source):
+    """Resolve everything the Purchase Order mapping needs for `source` once"""
+    company = frappe.db.get_default("company") or DEFAULT_COMPANY
+    company_currency = frappe.get_cached_value("Company", company, "default_currency") or DEFAULT_CURRENCY
+
+    suppliers = list({row.supplier for row in source.items if row.supplier})
+    supplier_details = {
+        supplier.name: supplier
+        for supplier in frappe.get_all("Supplier",
+            filters={"name": ["in", suppliers]},
+            fields=["name", "default_currency", "default_price_list", "tax_category"])
+    } if suppliers else {}
+
+    context = frappe._dict({
+        "company": company,
+        "company_currency": company_currency,
+        "transaction_date": nowdate(),
+        "supplier_details": supplier_details,
+        "buying_price_list": frappe.db.get_single_value("Buying Settings", "buying_price_list"),
+        # Optional - can be set later on the Purchase Order
+        "warehouse": frappe.db.get_value("Warehouse", {"company": company, "is_group": 0}, "name"),
+        "conversion_rates": {},
+        "item_prices": {},
+    })
+
+    context.item_details = get_items_purchase_details(
+        [row.item_code for row in source.items if row.item_code], context)
+    return context
+
+
+def get_supplier_currency(context, supplier):
+    supplier_details = context.supplier_details.get(supplier) or {}
+    return supplier_details.get("default_currency") or context.company_currency
+
+
+def get_conversion_rate(context, currency):
+    """Rate from `currency` to the company currency, resolved once per currency"""
+    if currency == context.company_currency:
+        return 1.0
+
+    if currency not in context.conversion_rates:
+        context.conversion_rates[currency] = get_cached_exchange_rate(
+            currency, context.company_currency, context.transaction_date) or 1.0
+    return context.conversion_rates[currency]
+
+
+def get_items_purchase_details(item_codes, context):
+    """Purchase details of every item in `item_codes`, keyed by item_code, with one query per source table"""
+    item_codes = list(dict.fromkeys(item_codes))
+    if not item_codes:
+        return {}
+
+    items = {
+        item.name: item
+        for item in frappe.get_all("Item",
+            filters={"name": ["in", item_codes]},
+            fields=["name", "stock_uom", "purchase_uom", "last_purchase_rate", "variant_of", "item_group"])
+    }
+
+    conversion_factors = {}
+    for row in frappe.get_all("UOM Conversion Detail",
+        filters={"parent": ["in", item_codes], "parenttype": "Item"},
+        fields=["parent", "uom", "conversion_factor"]):
+        conversion_factors[(row.parent, row.uom)] = flt(row.conversion_factor)
+
+    group_ancestors = get_item_group_ancestors({item.item_group for item in items.values() if item.item_group})
+    context.tax_templates = get_tax_templates(item_codes, group_ancestors)
+
+    default_warehouses = dict(frappe.get_all("Item Default",
+        filters={"parent": ["in", item_codes], "parenttype": "Item", "company": context.company},
+        fields=["parent", "default_warehouse"], as_list=True))
+
+    # Variants without a price of their own use the template item's price
+    price_items = set(item_codes) | {item.variant_of for item in items.values() if item.variant_of}
+    get_item_prices(price_items, context)
+
+    pricing_rule_items = get_pricing_rule_items(items, group_ancestors, context)
+
+    details = {}
+    for item_code in item_codes:
+        item = items.get(item_code)
+        if not item:
+            continue
+
+        uom = item.purchase_uom or item.stock_uom
+        details[item_code] = frappe._dict({
+            "uom": uom,
+            "stock_uom": item.stock_uom,
+            "conversion_factor": 1.0 if uom == item.stock_uom else (conversion_factors.get((item_code, uom)) or 1.0),
+            # Item, then its item groups nearest first; resolved per supplier in get_item_tax_template
+            "tax_parents": [item_code] + group_ancestors.get(item.item_group, []),
+            "warehouse": default_warehouses.get(item_code),
+            "last_purchase_rate": flt(item.last_purchase_rate),
+            "variant_of": item.variant_of,
+            "has_pricing_rule": item_code in pricing_rule_items,
+        })
+
+    return details
+
+
+def get_item_group_ancestors(item_groups):
+    """Each item group with its ancestors, nearest first, in one nested set query"""
+    if not item_groups:
+        return {}
+
+    ancestors = {}
+    for group, ancestor in frappe.db.sql("""
+        SELECT child.name, parent.name
+        FROM `tabItem Group` child
+        INNER JOIN `tabItem Group` parent ON parent.lft <= child.lft AND parent.rgt >= child.rgt
+        WHERE child.name IN %s
+        ORDER BY child.name, parent.lft DESC
+    """, (tuple(item_groups),)):
+        ancestors.setdefault(group, []).append(ancestor)
+    return ancestors
+
+
+def get_tax_templates(item_codes, group_ancestors):
+    """Item Tax rows of every item and item group, with their template's company, keyed by parent"""
+    parents = list(item_codes) + list({group for groups in group_ancestors.values() for group in groups})
+
+    tax_templates = {}
+    for row in frappe.db.sql("""
+        SELECT it.parent, it.item_tax_template, it.tax_category, it.valid_from,
+            it.minimum_net_rate, it.maximum_net_rate, itt.company
+        FROM `tabItem Tax` it
+        INNER JOIN `tabItem Tax Template` itt ON itt.name = it.item_tax_template
+        WHERE it.parent IN %s AND it.parenttype IN ('Item', 'Item Group')
+        ORDER BY it.idx
+    """, (tuple(parents),), as_dict=True):
+        tax_templates.setdefault(row.parent, []).append(row)
+    return tax_templates
+
+
+def get_item_tax_template(context, item_code, supplier):
+    """Item tax template for a Purchase Order line, with the rules of ERPNext's _get_item_tax_template
+
+    Only templates of the PO company count. Dated or ranged templates valid on the
+    transaction date win over undated ones, latest first. The template's tax category
+    must match the supplier's (blank matches blank). The item's own rows are tried
+    first, then those of its item groups, nearest group first.
+    """
+    details = context.item_details.get(item_code)
+    if not details:
+        return None
+
+    tax_category = cstr((context.supplier_details.get(supplier) or {}).get("tax_category"))
+    for parent in details.tax_parents:
+        taxes = context.tax_templates.get(parent)
+        if not taxes:
+            continue
+
+        with_validity, without_validity = [], []
+        for tax in taxes:
+            if tax.company != context.company:
+                continue
+            if tax.valid_from or tax.maximum_net_rate:
+                if getdate(tax.valid_from) <= getdate(context.transaction_date) and is_within_valid_range(tax):
+                    with_validity.append(tax)
+            else:
+                without_validity.append(tax)
+
+        if with_validity:
+            taxes = sorted(with_validity, key=lambda tax: tax.valid_from or tax.maximum_net_rate, reverse=True)
+        else:
+            taxes = without_validity
+
+        for tax in taxes:
+            if cstr(tax.tax_category) == tax_category:
+                return tax.item_tax_template
+
+    return None
+
+
+def is_within_valid_range(tax):
+    # Lines are mapped before any rate is set, so the net rate is 0 as in get_item_details
+    if not flt(tax.maximum_net_rate):
+        return True
+    return flt(tax.minimum_net_rate) <= 0 <= flt(tax.maximum_net_rate)
+
+
+def get_item_prices(item_codes, context):
+    """Load applicable buying prices of `item_codes` into context.item_prices
+
+    Only prices without a supplier or for one of the approval's suppliers are read.
+    """
+    price_lists = {context.buying_price_list} | {
+        supplier.default_price_list for supplier in context.supplier_details.values()
+    }
+    price_lists.discard(None)
+    if not price_lists or not item_codes:
+        return
+
+    for price in frappe.db.sql("""
+        SELECT item_code, price_list, price_list_rate, currency, uom, IFNULL(supplier, '') AS supplier,
+            valid_from, valid_upto
+        FROM `tabItem Price`
+        WHERE item_code IN %(item_codes)s
+        AND price_list IN %(price_lists)s
+        AND buying = 1
+        AND IFNULL(supplier, '') IN %(suppliers)s
+        ORDER BY valid_from DESC
+    """, {
+        "item_codes": tuple(item_codes),
+        "price_lists": tuple(price_lists),
+        "suppliers": tuple([""] + list(context.supplier_details)),
+    }, as_dict=True):
+        if price.valid_from and str(price.valid_from) > context.transaction_date:
+            continue
+        if price.valid_upto and str(price.valid_upto) < context.transaction_date:
+            continue
+        context.item_prices.setdefault((price.item_code, price.price_list), []).append(price)
+
+
+def get_pricing_rule_items(items, group_ancestors, context):
+    """Items that an enabled buying Pricing Rule may apply to"""
+    rules = [
+        rule for rule in frappe.get_all("Pricing Rule",
+            filters={"disable": 0, "buying": 1},
+            fields=["name", "apply_on", "valid_from", "valid_upto"])
+        if (not rule.valid_from or str(rule.valid_from) <= context.transaction_date)
+        and (not rule.valid_upto or str(rule.valid_upto) >= context.transaction_date)
+    ]
+    if not rules:
+        return set()
+
+    # Brand and transaction rules are not resolved here; get_item_details handles every item
+    if any(rule.apply_on not in ("Item Code", "Item Group") for rule in rules):
+        return set(items)
+
+    rule_names = [rule.name for rule in rules]
+    rule_items = set(frappe.get_all("Pricing Rule Item Code",
+        filters={"parent": ["in", rule_names]}, pluck="item_code"))
+    rule_groups = set(frappe.get_all("Pricing Rule Item Group",
+        filters={"parent": ["in", rule_names]}, pluck="item_group"))
+
+    return {
+        item_code for item_code, item in items.items()
+        if item_code in rule_items or item.variant_of in rule_items
+        or rule_groups.intersection(group_ancestors.get(item.item_group, []))
+    }
+
+
+def get_item_rate(context, item_code, supplier, currency, qty=None):
+    """Price list rate (supplier price list, then buying price list) or last purchase rate, in `currency`
+
+    Supplier-specific prices win over prices without a supplier, and a variant without
+    prices uses its template's. Items under a Pricing Rule are priced by get_item_details.
+    """
+    details = context.item_details.get(item_code)
+    if not details:
+        return 0
+
+    if details.has_pricing_rule:
+        return get_item_details_rate(context, item_code, supplier, currency, qty)
+
+    supplier_details = context.supplier_details.get(supplier) or {}
+    for price_list in (supplier_details.get("default_price_list"), context.buying_price_list):
+        if not price_list:
+            continue
+        prices = get_supplier_prices(context, item_code, price_list, supplier) or \
+            get_supplier_prices(context, details.variant_of, price_list, supplier)
+        # Stable sort keeps the latest valid_from first within each group
+        prices.sort(key=lambda price: price.supplier != supplier)
+        price = next((price for price in prices if price.uom == details.uom), None) or \
+            next((price for price in prices if price.uom in (details.stock_uom, None, "")), None)
+        if price and price.price_list_rate:
+            rate = flt(price.price_list_rate)
+            if price.uom != details.uom:
+                # Stock UOM price, scaled to the purchase UOM
+                rate *= details.conversion_factor
+            if price.currency and price.currency != currency:
+                # Price list and last purchase rates are converted through the company currency
+                rate = rate * get_conversion_rate(context, price.currency) / get_conversion_rate(context, currency)
+            return rate
+
+    # last_purchase_rate is kept per stock UOM in company currency
+    return details.last_purchase_rate * details.conversion_factor / get_conversion_rate(context, currency)
+
+
+def get_supplier_prices(context, item_code, price_list, supplier):
+    """Prices of an item usable for `supplier`: its own and those without a supplier"""
+    return [
+        price for price in context.item_prices.get((item_code, price_list)) or []
+        if price.supplier in ("", supplier)
+    ]
+
+
+def get_item_details_rate(context, item_code, supplier, currency, qty=None):
+    """Rate of one item through ERPNext's get_item_details, applying pricing rules"""
+    from erpnext.stock.get_item_details import get_item_details
+
+    item_details = get_item_details(frappe._dict({
+        "item_code": item_code,
+        "company": context.company,
+        "qty": qty,
+        "transaction_date": context.transaction_date,
+        "doctype": "Purchase Order",
+        "supplier": supplier,
+        "currency": currency,
+        "conversion_rate": get_conversion_rate(context, currency),
+        "warehouse": context.warehouse
+    }))
+    return item_details.get("price_list_rate") or item_details.get("last_purchase_rate") or 0
@@ -0,0 +1,56 @@
+# Copyright (c) 2026, Onco and contributors
+# For license information, please see license.txt
+
+"""Names for Importation Approval Request modifications and extensions
+
+A revision keeps the sequence number of the request it comes from:
+EDA-SPIMR-2026-00004 -> EDA-SPIMR-MD-2026-00004, then EDA-SPIMR-MD-2026-00004-1, ...
+"""
+
+import re
+
+import frappe
+
+REVISION_NAME_PATTERN = re.compile(r"^(?P<prefix>.+?)-(?P<year>20\d{2})-(?P<sequence>\d+)(?:-(?P<suffix>\d+))?$")
+
+
+def parse_importation_name(name):
+    """Split a request name into (year, sequence), ignoring any -N revision suffix"""
+    match = REVISION_NAME_PATTERN.match(name or "")
+    if not match:
+        frappe.throw(f"Cannot derive a revision name from {name}")
+    return match.group("year"), match.group("sequence")
+
+
+def allocate_revision_name(doctype, source_name, target_prefix):
+    """Return the next free <target_prefix>-<year>-<sequence>[-N] name for a revision of `source_name`
+
+    The lineage root of the source is locked first, so two users revising the same
+    request at the same time are serialised until the first revision is committed.
+    Existing suffixes are then read with a single locking prefix query: a plain
+    SELECT would read the transaction's snapshot and miss a revision committed by
+    the user who held the lock before us.
+    """
+    year, sequence = parse_importation_name(source_name)
+    base_name = f"{target_prefix}-{year}-{sequence}"
+
+    lineage_root = frappe.db.get_value(doctype, source_name, "lineage_root") or source_name
+    frappe.db.sql(f"SELECT name FROM `tab{doctype}` WHERE name = %s FOR UPDATE", (lineage_root,))
+
+    existing = frappe.db.sql_list(f"""
+        SELECT name
+        FROM `tab{doctype}`
+        WHERE name = %s OR name LIKE %s
+        FOR UPDATE
+    """, (base_name, base_name.replace("%", "\\%").replace("_", "\\_") + "-%"))
+
+    if base_name not in existing:
+        return base_name
+
+    suffixes = [0]
+    for name in existing:
+        suffix = name[len(base_name) + 1:]
+        if suffix.isdigit():
+            suffixes.append(int(suffix))
+
+    return f"{base_name}-{max(suffixes) + 1}"
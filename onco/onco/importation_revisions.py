@@ -0,0 +1,171 @@
+# Copyright (c) 2026, Onco and contributors
+# For license information, please see license.txt
+
+"""Compact (delta-only) revisions of Importation Approval Requests
+
+A compact modification/extension stores only the item rows that differ from
+the effective items of the document it revises, plus an `is_removed` tombstone
+row for every inherited item it drops. Every revision starts its approval over,
+so inherited rows are read with REVISION_RESET_VALUES applied.
+
+ImportationApprovalRequest.load_from_db calls `materialize`, so anything that
+loads the document (form, print, mappers) sees the full effective item list.
+Inherited rows get fresh in-memory names, so a write by row name can never
+reach an ancestor's row. `compress` strips the list back to the delta before
+every write (validate, cancel, update after submit, delete). Writers that
+update item rows directly in the database call `expand_revisions` first.
+"""
+
+import frappe
+from frappe.model import no_value_fields
+from frappe.utils import now
+
+REQUEST_DOCTYPE = "Importation Approval Request"
+ITEM_DOCTYPE = "Importation Approval Request Item"
+REVISION_RESET_VALUES = {"approved_qty": 0, "status": "Pending"}
+
+
+def get_revision_path(doc):
+    """Ancestors of `doc` from its nearest full (non-compact) ancestor down to its parent"""
+    if not doc.original_document:
+        return []
+
+    versions = {
+        row.name: row
+        for row in frappe.get_all(REQUEST_DOCTYPE,
+            filters={"lineage_root": doc.lineage_root or doc.original_document},
+            fields=["name", "original_document", "compact_revision"])
+    }
+
+    path = []
+    name = doc.original_document
+    while name in versions and name not in path:
+        path.append(name)
+        if not versions[name].compact_revision:
+            break
+        name = versions[name].original_document
+
+    return list(reversed(path))
+
+
+def get_inherited_items(doc):
+    """Effective item rows `doc` inherits from its ancestors, keyed by item_code"""
+    path = get_revision_path(doc)
+    if not path:
+        return {}
+
+    rows_by_parent = {}
+    for row in frappe.get_all(ITEM_DOCTYPE,
+        filters={"parent": ["in", path], "parenttype": REQUEST_DOCTYPE},
+        fields=["*"], order_by="idx asc"):
+        rows_by_parent.setdefault(row.parent, []).append(row)
+
+    inherited = {}
+    for name in path:
+        for row in rows_by_parent.get(name, []):
+            if row.is_removed:
+                inherited.pop(row.item_code, None)
+            else:
+                inherited[row.item_code] = row
+
+    for row in inherited.values():
+        row.update(REVISION_RESET_VALUES)
+
+    return inherited
+
+
+def _item_fields():
+    return [df.fieldname for df in frappe.get_meta(ITEM_DOCTYPE).fields if df.fieldtype not in no_value_fields]
+
+
+def _differs(row, base, fields):
+    return any((row.get(fieldname) or None) != (base.get(fieldname) or None) for fieldname in fields)
+
+
+def materialize(doc):
+    """Replace the stored delta rows of a compact revision with its full effective item list (in memory)"""
+    if not doc.compact_revision:
+        return
+
+    own_rows = {}
+    removed = set()
+    for row in doc.get("items"):
+        if row.is_removed:
+            removed.add(row.item_code)
+        else:
+            own_rows[row.item_code] = row
+
+    items = []
+    for item_code, row in get_inherited_items(doc).items():
+        if item_code in removed:
+            continue
+        if item_code in own_rows:
+            items.append(own_rows.pop(item_code))
+            continue
+        # Never carry the ancestor's row name: cancel and update after submit write rows by name
+        row = frappe._dict(row, name=frappe.generate_hash(length=10), __islocal=1)
+        items.append(row)
+    items.extend(own_rows.values())
+
+    doc.set("items", [])
+    for idx, row in enumerate(items, 1):
+        child = doc.append("items", row)
+        child.idx = idx
+        child.docstatus = doc.docstatus
+
+
+def compress(doc):
+    """Keep only the rows that differ from the inherited effective rows, plus tombstones for removed items"""
+    if not doc.compact_revision:
+        return
+
+    inherited = get_inherited_items(doc)
+    fields = _item_fields()
+    stored = set() if doc.is_new() else set(frappe.get_all(ITEM_DOCTYPE,
+        filters={"parent": doc.name, "parenttype": REQUEST_DOCTYPE}, pluck="name"))
+
+    delta = []
+    present = set()
+    for row in doc.get("items"):
+        if row.is_removed:
+            # Tombstones are rebuilt below from the items missing in this list
+            continue
+        present.add(row.item_code)
+
+        base = inherited.get(row.item_code)
+        if base and not _differs(row, base, fields):
+            continue
+        if row.name not in stored:
+            # Materialized or new row; store it as a new row of this revision
+            row.name = None
+            row.set("__islocal", 1)
+        delta.append(row)
+
+    for item_code, base in inherited.items():
+        if item_code not in present:
+            delta.append(dict({fieldname: base.get(fieldname) for fieldname in fields}, is_removed=1))
+
+    doc.set("items", [])
+    for idx, row in enumerate(delta, 1):
+        child = doc.append("items", row)
+        child.idx = idx
+        child.docstatus = doc.docstatus
+
+
+def expand_revisions(docnames):
+    """Store the inherited rows of compact revisions so their items can be updated in place"""
+    for name in frappe.get_all(REQUEST_DOCTYPE,
+        filters={"name": ["in", docnames], "compact_revision": 1}, pluck="name"):
+        doc = frappe.get_doc(REQUEST_DOCTYPE, name)
+        stored = set(frappe.get_all(ITEM_DOCTYPE,
+            filters={"parent": name, "parenttype": REQUEST_DOCTYPE}, pluck="name"))
+
+        timestamp = now()
+        for row in doc.items:
+            if row.name not in stored:
+                row.name = None
+                row.creation = row.modified = timestamp
+                row.db_insert()
+
+        frappe.db.delete(ITEM_DOCTYPE, {"parent": name, "parenttype": REQUEST_DOCTYPE, "is_removed": 1})
+        frappe.db.set_value(REQUEST_DOCTYPE, name, "compact_revision", 0, update_modified=False)
@@ -0,0 +1,123 @@
+# Copyright (c) 2026, Onco and contributors
+# For license information, please see license.txt
+
+"""Pharmaceutical compliance checks for importation item rows
+
+Item master columns needed by the checks are read for every row of a document
+with one query. Custom columns that do not exist on the site are treated as
+empty, as the old per-row `hasattr(item_doc, ...)` checks did.
+"""
+
+import frappe
+from frappe.utils import getdate, today
+
+COMPLIANCE_FIELDS = (
+    "item_name",
+    "custom_pharmaceutical_item",
+    "custom_registered",
+    "custom_manufacturing_date",
+    "custom_expiry_date",
+    "custom_batch_no",
+    "strength",
+    "custom_storage_instructions",
+    "default_supplier",
+)
+
+# Fields a registered pharmaceutical item must have, per importation step
+REQUIRED_FIELDS = {
+    "request": (
+        ("custom_manufacturing_date", "Manufacturing Date"),
+        ("custom_expiry_date", "Expiry Date"),
+        ("custom_batch_no", "Batch No"),
+        ("strength", "Strength"),
+    ),
+    # Label verification: product name, strength, batch #, expiry, storage
+    "approval": (
+        ("item_name", "Product Name"),
+        ("strength", "Strength"),
+        ("custom_batch_no", "Batch #"),
+        ("custom_expiry_date", "Expiry Date"),
+        ("custom_storage_instructions", "Storage Instructions"),
+    ),
+}
+
+
+def get_compliance_data(item_codes):
+    """Compliance columns of every item in `item_codes`, keyed by item_code, in one query"""
+    item_codes = list({item_code for item_code in item_codes if item_code})
+    if not item_codes:
+        return {}
+
+    meta = frappe.get_meta("Item")
+    fields = ["name"] + [fieldname for fieldname in COMPLIANCE_FIELDS if meta.has_field(fieldname)]
+
+    data = {}
+    for item in frappe.get_all("Item", filters={"name": ["in", item_codes]}, fields=fields):
+        data[item.name] = frappe._dict({fieldname: item.get(fieldname) for fieldname in COMPLIANCE_FIELDS})
+    return data
+
+
+def get_item_violations(item_code, item, context):
+    """Violation messages of one item for the `request` or `approval` step"""
+    if not item or not item.custom_pharmaceutical_item:
+        return []
+
+    violations = []
+    if item.custom_registered:
+        missing = [label for fieldname, label in REQUIRED_FIELDS[context] if not item.get(fieldname)]
+        if missing:
+            if context == "approval":
+                violations.append(f"Pharmaceutical item {item_code} fails label verification. Missing: {', '.join(missing)}. Required for importation approval.")
+            else:
+                violations.append(f"Pharmaceutical item {item_code} is missing required fields: {', '.join(missing)}. Please update the item master before using in importation cycle.")
+        elif item.custom_expiry_date and getdate(item.custom_expiry_date) <= getdate(today()):
+            if context == "approval":
+                violations.append(f"Cannot approve expired pharmaceutical item {item_code} (Expiry: {item.custom_expiry_date})")
+            else:
+                violations.append(f"Pharmaceutical item {item_code} has expired (Expiry Date: {item.custom_expiry_date}). Cannot be used in importation cycle.")
+
+    if context == "request" and not item.default_supplier:
+        violations.append(f"Pharmaceutical item {item_code} must have a default supplier assigned. Please update the item master.")
+
+    return violations
+
+
+def check_compliance(rows, context):
+    """Per-row violations for item rows of an importation document
+
+    Returns a list of {"idx", "item_code", "violations"} for rows that fail.
+    """
+    data = get_compliance_data(row.item_code for row in rows)
+
+    result = []
+    for row in rows:
+        if not row.item_code:
+            continue
+        violations = get_item_violations(row.item_code, data.get(row.item_code), context)
+        if violations:
+            result.append({"idx": row.idx, "item_code": row.item_code, "violations": violations})
+    return result
+
+
+def validate_compliance(doc, context, table_field="items"):
+    """Throw one message listing every non-compliant row of `doc`"""
+    failures = check_compliance(doc.get(table_field), context)
+    if failures:
+        frappe.throw("<br>".join(
+            f"Row {failure['idx']}: {message}" for failure in failures for message in failure["violations"]
+        ), title="Pharmaceutical Compliance")
+
+
+@frappe.whitelist()
+def get_item_compliance(item_code, context="request"):
+    """Compliance columns and violations of one item, for the importation item forms"""
+    frappe.has_permission("Item", "read", throw=True)
+    if context not in REQUIRED_FIELDS:
+        frappe.throw(f"Unknown compliance context: {context}")
+
+    item = get_compliance_data([item_code]).get(item_code)
+    if not item:
+        return None
+
+    item.violations = get_item_violations(item_code, item, context)
+    return item
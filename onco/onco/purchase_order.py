@@ -1,6 +1,8 @@
 # Copyright (c) 2025, ds and contributors
 # For license information, please see license.txt
 
+from collections import Counter
+
 import frappe
 from frappe.utils import getdate
 from erpnext.buying.doctype.purchase_order.purchase_order import PurchaseOrder
@@ -11,8 +13,8 @@ class CustomPurchaseOrder(PurchaseOrder):
 	Custom Purchase Order class to override autoname method
 	Format: PO-YYYY-XXXX-ZZZ
 	- YYYY: Year from transaction_date
-	- XXXX: Sequential count of POs in that year (4 digits)
-	- ZZZ: Count of how many times this item has appeared in any PO (3 digits)
+	- XXXX: Sequential number of the PO in that year (4 digits)
+	- ZZZ: Sequential number of POs raised for this item (3 digits)
 	
 	Note: Each Purchase Order should contain exactly one item.
 	"""
@@ -42,35 +44,71 @@ class CustomPurchaseOrder(PurchaseOrder):
 		# Format year as YYYY
 		year_str = str(year)
 		
-		# Calculate XXXX: Count of POs created in this year
-		# Query existing POs with names matching PO-YYYY-* pattern
-		# Count all POs (including drafts and submitted) that match the pattern for this year
-		po_count = frappe.db.sql("""
-			SELECT COUNT(*) 
-			FROM `tabPurchase Order`
-			WHERE name LIKE %s
-			AND docstatus < 2
-		""", (f"PO-{year_str}-%",))[0][0] or 0
-		
-		# Increment for this new PO
-		xxxx = po_count + 1
-		xxxx_str = str(xxxx).zfill(4)  # Pad to 4 digits
-		
-		# Calculate ZZZ: Count of how many times this item has appeared in any PO
-		# Query all Purchase Orders (across all years) that have this item
-		# Since autoname is called before save, self.name will be None/empty, so we don't need to exclude it
-		item_count = frappe.db.sql("""
-			SELECT COUNT(DISTINCT poi.parent)
-			FROM `tabPurchase Order Item` poi
-			INNER JOIN `tabPurchase Order` po ON poi.parent = po.name
-			WHERE poi.item_code = %s
-			AND po.docstatus < 2
-		""", (item_code,))[0][0] or 0
-		
-		# Increment for this new PO
-		zzz = item_count + 1
-		zzz_str = str(zzz).zfill(3)  # Pad to 3 digits
+		# XXXX and ZZZ come from row-locked counters so concurrent inserts can
+		# never read the same count; the lock is held until the transaction ends
+		xxxx_str = str(get_next_po_counter(f"YEAR-{year_str}")).zfill(4)
+		zzz_str = str(get_next_po_counter(f"ITEM-{item_code}")).zfill(3)
 		
 		# Set the name
 		self.name = f"PO-{year_str}-{xxxx_str}-{zzz_str}"
 
+
+
+def reserve_po_names(transaction_date, item_codes):
+	"""
+	Reserve one PO-YYYY-XXXX-ZZZ name per entry of `item_codes`, in order, in a single
+	transaction: the year counter is advanced once by the whole block and each item
+	counter once by the number of POs for that item.
+	Insert the Purchase Orders with doc.insert(set_name=...) to use the reserved names.
+	"""
+	if not item_codes:
+		return []
+	if not all(item_codes):
+		frappe.throw("Item code is required in Purchase Order items.")
+	
+	year_str = str(getdate(transaction_date).year)
+	last_xxxx = get_next_po_counter(f"YEAR-{year_str}", len(item_codes))
+	next_xxxx = last_xxxx - len(item_codes) + 1
+	
+	# Lock item counters in a stable order so concurrent reservations cannot deadlock
+	next_zzz = {}
+	for item_code, count in sorted(Counter(item_codes).items()):
+		next_zzz[item_code] = get_next_po_counter(f"ITEM-{item_code}", count) - count + 1
+	
+	names = []
+	for item_code in item_codes:
+		names.append(f"PO-{year_str}-{str(next_xxxx).zfill(4)}-{str(next_zzz[item_code]).zfill(3)}")
+		next_xxxx += 1
+		next_zzz[item_code] += 1
+	
+	return names
+
+
+def get_next_po_counter(key, count=1):
+	"""
+	Atomically advance the Purchase Order Naming Counter `key` by `count` and return
+	the last number issued.
+	The counter row is created on first use and locked with SELECT ... FOR UPDATE,
+	so parallel PO inserts are serialised on the counter instead of racing on COUNT(*).
+	"""
+	now = frappe.utils.now()
+	frappe.db.sql("""
+		INSERT IGNORE INTO `tabPurchase Order Naming Counter`
+			(name, current, creation, modified, owner, modified_by)
+		VALUES (%s, 0, %s, %s, 'Administrator', 'Administrator')
+	""", (key, now, now))
+	
+	current = frappe.db.sql("""
+		SELECT current
+		FROM `tabPurchase Order Naming Counter`
+		WHERE name = %s
+		FOR UPDATE
+	""", (key,))[0][0] or 0
+	
+	frappe.db.sql("""
+		UPDATE `tabPurchase Order Naming Counter`
+		SET current = %s, modified = %s
+		WHERE name = %s
+	""", (current + count, now, key))
+	
+	return current + count
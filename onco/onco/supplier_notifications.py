@@ -0,0 +1,132 @@
+# Copyright (c) 2026, Onco and contributors
+# For license information, please see license.txt
+
+"""Supplier notification outbox for Purchase Orders raised from Importation Approvals
+
+Submitting an approval-linked Purchase Order queues one Supplier Notification
+Outbox message when the approval asks for email notification. A scheduled job
+merges the queued messages of each supplier/recipient into one digest email
+once the oldest of them is NOTIFICATION_DIGEST_WINDOW old, and records the
+delivery status on every message.
+"""
+
+from datetime import timedelta
+
+import frappe
+from frappe.utils import escape_html, get_datetime, now, now_datetime
+
+NOTIFICATION_DIGEST_WINDOW = timedelta(minutes=10)
+
+
+def queue_supplier_notification(doc, method):
+    """Purchase Order on_submit: queue a notification for the approval's supplier"""
+    if not doc.get("custom_importation_approval") or not doc.supplier:
+        return
+
+    approval = frappe.db.get_value("Importation Approvals", doc.custom_importation_approval,
+        ["send_email_notification", "supplier_email"], as_dict=True)
+    if not approval or not approval.send_email_notification:
+        return
+
+    frappe.get_doc({
+        "doctype": "Supplier Notification Outbox",
+        "supplier": doc.supplier,
+        "recipient": approval.supplier_email,
+        "importation_approval": doc.custom_importation_approval,
+        "purchase_order": doc.name,
+        "status": "Queued"
+    }).insert(ignore_permissions=True)
+
+
+def process_supplier_notification_outbox():
+    """Send queued notifications as one digest per supplier and recipient (scheduled job)"""
+    messages = frappe.get_all("Supplier Notification Outbox",
+        filters={"status": "Queued"},
+        fields=["name", "supplier", "recipient", "importation_approval", "purchase_order", "creation"],
+        order_by="creation asc")
+    if not messages:
+        return
+
+    cutoff = now_datetime() - NOTIFICATION_DIGEST_WINDOW
+    suppliers = {
+        supplier.name: supplier
+        for supplier in frappe.get_all("Supplier",
+            filters={"name": ["in", list({message.supplier for message in messages})]},
+            fields=["name", "supplier_name", "email_id"])
+    }
+    submitted_orders = set(frappe.get_all("Purchase Order",
+        filters={"name": ["in", [message.purchase_order for message in messages]], "docstatus": 1},
+        pluck="name"))
+
+    digests = {}
+    for message in messages:
+        if message.purchase_order not in submitted_orders:
+            set_message_status([message.name], "Cancelled")
+            continue
+
+        supplier = suppliers.get(message.supplier) or frappe._dict()
+        recipient = message.recipient or supplier.email_id
+        if not recipient:
+            set_message_status([message.name], "Failed", error="No email address found for supplier notification")
+            continue
+
+        digests.setdefault((message.supplier, recipient), []).append(message)
+
+    for (supplier_name, recipient), digest in digests.items():
+        # Wait until the oldest message has been queued for a full window
+        if get_datetime(digest[0].creation) > cutoff:
+            continue
+        send_digest(suppliers.get(supplier_name) or frappe._dict(name=supplier_name), recipient, digest)
+
+
+def send_digest(supplier, recipient, messages):
+    names = [message.name for message in messages]
+    references = sorted({message.importation_approval for message in messages if message.importation_approval})
+    rows = "".join(
+        f"<li>{escape_html(message.purchase_order)} ({escape_html(message.importation_approval or '')})</li>"
+        for message in messages
+    )
+
+    try:
+        email_queue = frappe.sendmail(
+            recipients=[recipient],
+            subject=f"Purchase Order Created - Reference: {', '.join(references)}",
+            message=f"""
+            <p>Dear {escape_html(supplier.supplier_name or supplier.name)},</p>
+            <p>The following Purchase Orders have been created based on Importation Approval:</p>
+            <ul>{rows}</ul>
+            <p>Please check your portal for details.</p>
+            <p>Best regards,<br>Onco Pharma Team</p>
+            """,
+            header="Purchase Order Notification",
+            reference_doctype="Supplier",
+            reference_name=supplier.name
+        )
+        set_message_status(names, "Sent", email_queue=email_queue.name if email_queue else None)
+    except Exception as e:
+        frappe.log_error(title="Supplier notification digest failed", message=frappe.get_traceback())
+        set_message_status(names, "Failed", error=str(e))
+
+
+def set_message_status(names, status, email_queue=None, error=None):
+    frappe.db.sql(f"""
+        UPDATE `tabSupplier Notification Outbox`
+        SET status = %s, email_queue = %s, error = %s, modified = %s
+            {", sent_on = %s" if status == "Sent" else ""}
+        WHERE name IN ({", ".join(["%s"] * len(names))})
+    """, [status, email_queue, error, now()] + ([now()] if status == "Sent" else []) + list(names))
+
+
+@frappe.whitelist()
+def retry_failed_notifications(names=None):
+    """Queue failed messages again for the next digest run"""
+    frappe.only_for("System Manager")
+
+    filters = {"status": "Failed"}
+    if names:
+        filters["name"] = ["in", frappe.parse_json(names)]
+
+    failed = frappe.get_all("Supplier Notification Outbox", filters=filters, pluck="name")
+    if failed:
+        set_message_status(failed, "Queued")
+    return len(failed)
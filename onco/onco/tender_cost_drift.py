@@ -0,0 +1,150 @@
+"""
+Nightly refresh of tender price deviations after item cost changes
+
+Only items whose `modified` timestamp moved past the stored watermark are
+scanned. Open Awarded Tenders referencing them are found through the
+(item_code, parent) index on Item Tender, and their Tender Price Deviation
+rows are updated in place, without loading or saving the tenders.
+"""
+
+import frappe
+from frappe.utils import flt, now, nowdate
+
+WATERMARK_KEY = "onco_tender_cost_drift_watermark"
+
+
+def refresh_tender_price_deviations():
+	"""Scheduled task: recompute deviation rows for items whose cost may have changed"""
+	try:
+		started_at = now()
+		watermark = frappe.db.get_global(WATERMARK_KEY)
+
+		if not watermark:
+			# First run: tenders were up to date when last saved, start tracking from now
+			frappe.db.set_global(WATERMARK_KEY, started_at)
+			return
+
+		changed_items = {
+			item.name: flt(item.standard_rate)
+			for item in frappe.get_all("Item",
+				filters={"modified": [">", watermark]},
+				fields=["name", "standard_rate"])
+		}
+
+		updated = refresh_deviation_rows(changed_items) if changed_items else 0
+
+		frappe.db.set_global(WATERMARK_KEY, started_at)
+		frappe.logger().info(f"Tender cost drift: {len(changed_items)} items changed, {updated} deviation rows refreshed")
+
+	except Exception:
+		frappe.log_error(
+			message=frappe.get_traceback(),
+			title="Tender Cost Drift Scheduler Error"
+		)
+
+
+def refresh_deviation_rows(item_costs):
+	"""Bring Tender Price Deviation rows of open tenders in line with new item costs
+
+	Args:
+		item_costs: dict of item_code -> current standard_rate
+
+	Returns:
+		Number of deviation rows inserted, updated or deleted.
+	"""
+	# Item Tender has no tender_price column on sites without the customization,
+	# so there is nothing to compare the new costs against
+	if not frappe.get_meta("Item Tender").has_field("tender_price"):
+		return 0
+
+	item_codes = tuple(item_costs)
+
+	# Item Tender rows of open Awarded Tenders referencing the changed items
+	tender_rows = frappe.db.sql("""
+		SELECT it.parent, it.item_code, it.item_name, it.tender_price
+		FROM `tabItem Tender` it
+		INNER JOIN `tabTenders` t ON t.name = it.parent
+		WHERE it.item_code IN %(item_codes)s
+		AND it.parenttype = 'Tenders' AND it.parentfield = 'item_tender'
+		AND t.tender_type = 'Awarded Tenders'
+		AND t.docstatus < 2
+		AND (t.tender_end_date IS NULL OR t.tender_end_date >= %(today)s)
+		ORDER BY it.parent, it.idx
+	""", {"item_codes": item_codes, "today": nowdate()}, as_dict=True)
+
+	if not tender_rows:
+		return 0
+
+	tenders = tuple({row.parent for row in tender_rows})
+	existing_rows = frappe.db.sql("""
+		SELECT name, parent, item, tender_price, item_cost, deviation_amount
+		FROM `tabTender Price Deviation`
+		WHERE item IN %(item_codes)s AND parent IN %(tenders)s
+		AND parenttype = 'Tenders' AND parentfield = 'tender_price_deviation'
+		ORDER BY parent, idx
+	""", {"item_codes": item_codes, "tenders": tenders}, as_dict=True)
+
+	max_idx = dict(frappe.db.sql("""
+		SELECT parent, MAX(idx) FROM `tabTender Price Deviation`
+		WHERE parent IN %(tenders)s AND parenttype = 'Tenders' AND parentfield = 'tender_price_deviation'
+		GROUP BY parent
+	""", {"tenders": tenders}))
+
+	expected = {}
+	for row in tender_rows:
+		expected.setdefault((row.parent, row.item_code), []).append(row)
+
+	existing = {}
+	for row in existing_rows:
+		existing.setdefault((row.parent, row.item), []).append(row)
+
+	changes = 0
+	for key, rows in expected.items():
+		tender, item_code = key
+		item_cost = item_costs[item_code]
+		deviations = [
+			row for row in rows
+			# Same rule as Tenders.calculate_price_deviations
+			if row.tender_price and flt(row.tender_price) < item_cost
+		]
+		current = existing.get(key, [])
+
+		for deviation_row, tender_row in zip(current, deviations):
+			deviation_amount = item_cost - flt(tender_row.tender_price)
+			if flt(deviation_row.item_cost) == item_cost and flt(deviation_row.tender_price) == flt(tender_row.tender_price):
+				continue
+
+			frappe.db.set_value("Tender Price Deviation", deviation_row.name, {
+				"tender_price": tender_row.tender_price,
+				"item_cost": item_cost,
+				"deviation_amount": deviation_amount,
+				"deviation_percent": round(deviation_amount / item_cost * 100, 2) if item_cost > 0 else 0,
+				"deviation_status": "Pending Approval"
+			}, update_modified=False)
+			changes += 1
+
+		for deviation_row in current[len(deviations):]:
+			# Price is no longer below cost
+			frappe.db.delete("Tender Price Deviation", {"name": deviation_row.name})
+			changes += 1
+
+		for tender_row in deviations[len(current):]:
+			deviation_amount = item_cost - flt(tender_row.tender_price)
+			max_idx[tender] = (max_idx.get(tender) or 0) + 1
+			frappe.get_doc({
+				"doctype": "Tender Price Deviation",
+				"parent": tender,
+				"parenttype": "Tenders",
+				"parentfield": "tender_price_deviation",
+				"idx": max_idx[tender],
+				"item": item_code,
+				"item_name": tender_row.item_name,
+				"tender_price": tender_row.tender_price,
+				"item_cost": item_cost,
+				"deviation_amount": deviation_amount,
+				"deviation_percent": round(deviation_amount / item_cost * 100, 2) if item_cost > 0 else 0,
+				"deviation_status": "Pending Approval"
+			}).db_insert()
+			changes += 1
+
+	return changes
@@ -0,0 +1,170 @@
+import frappe
+from frappe import _
+
+
+def on_sales_invoice_submit(doc, method):
+    """Post supplied quantities of a tender Sales Invoice to the fulfillment ledger"""
+    if not doc.get("custom_tender_ref"):
+        return
+
+    # An invoice is posted once; its net ledger balance is non-zero until cancelled
+    if get_posted_quantities(doc.name):
+        return
+
+    item_qty = {}
+    for item in doc.items:
+        if item.item_code:
+            item_qty[item.item_code] = item_qty.get(item.item_code, 0) + (item.qty or 0)
+
+    post_fulfillment(doc.custom_tender_ref, doc.name, doc.posting_date, item_qty)
+
+
+def on_sales_invoice_cancel(doc, method):
+    """Reverse whatever the Sales Invoice posted to the fulfillment ledger"""
+    if not doc.get("custom_tender_ref"):
+        return
+
+    posted = get_posted_quantities(doc.name)
+    if not posted:
+        return
+
+    reversal = {item_code: -qty for item_code, qty in posted.items()}
+    post_fulfillment(doc.custom_tender_ref, doc.name, doc.posting_date, reversal)
+
+
+def get_posted_quantities(sales_invoice):
+    """Return the net quantity per item currently posted by a Sales Invoice"""
+    rows = frappe.db.sql("""
+        SELECT item_code, SUM(qty) AS qty
+        FROM `tabTender Fulfillment Ledger`
+        WHERE sales_invoice = %s
+        GROUP BY item_code
+        HAVING SUM(qty) != 0
+    """, sales_invoice, as_dict=True)
+
+    return {row.item_code: row.qty for row in rows}
+
+
+def post_fulfillment(tender, sales_invoice, posting_date, item_qty):
+    """Insert signed ledger entries and apply the same deltas to the tender status rows
+
+    Args:
+        tender: Name of the Tenders document
+        sales_invoice: Sales Invoice posting the movement
+        posting_date: Posting date of the Sales Invoice
+        item_qty: dict of item_code -> signed quantity delta
+    """
+    item_qty = {item_code: qty for item_code, qty in item_qty.items() if qty}
+    if not item_qty:
+        return
+
+    for item_code, qty in item_qty.items():
+        frappe.get_doc({
+            "doctype": "Tender Fulfillment Ledger",
+            "tender": tender,
+            "item_code": item_code,
+            "qty": qty,
+            "sales_invoice": sales_invoice,
+            "posting_date": posting_date
+        }).insert(ignore_permissions=True)
+
+    item_codes = tuple(item_qty)
+    # Only the first status row of an item carries its supplied quantity
+    status_rows = get_status_row_names(tender, item_codes)
+    row_qty = {status_rows[item_code]: qty for item_code, qty in item_qty.items() if item_code in status_rows}
+
+    if row_qty:
+        supplied_case = " ".join(["WHEN %s THEN %s"] * len(row_qty))
+        case_values = [value for row in row_qty.items() for value in row]
+
+        frappe.db.sql(f"""
+            UPDATE `tabTender Status`
+            SET supplied_quantity = IFNULL(supplied_quantity, 0) + CASE name {supplied_case} ELSE 0 END
+            WHERE name IN %s
+        """, (*case_values, tuple(row_qty)))
+
+    refresh_status_figures(tender, item_codes)
+
+
+def get_status_row_names(tender, item_codes=None):
+    """Name of the first Tender Status row (lowest idx) per item of a tender"""
+    filters = {"parent": tender, "parenttype": "Tenders"}
+    if item_codes:
+        filters["item_name"] = ["in", list(item_codes)]
+
+    status_rows = {}
+    for row in frappe.get_all("Tender Status", filters=filters, fields=["name", "item_name"], order_by="idx asc"):
+        status_rows.setdefault(row.item_name, row.name)
+    return status_rows
+
+
+def get_supplied_quantities(tender):
+    """Net supplied quantity per item of a tender, read from the fulfillment ledger"""
+    return dict(frappe.db.sql("""
+        SELECT item_code, SUM(qty)
+        FROM `tabTender Fulfillment Ledger`
+        WHERE tender = %s
+        GROUP BY item_code
+    """, tender))
+
+
+def refresh_status_figures(tender=None, item_codes=None):
+    """Recompute remaining quantity and fulfillment percent from supplied quantity"""
+    conditions = ["parenttype = 'Tenders'"]
+    values = {}
+    if tender:
+        conditions.append("parent = %(tender)s")
+        values["tender"] = tender
+    if item_codes:
+        conditions.append("item_name IN %(item_codes)s")
+        values["item_codes"] = tuple(item_codes)
+
+    frappe.db.sql(f"""
+        UPDATE `tabTender Status`
+        SET remaining_quantity = IFNULL(tender_quantity, 0) - IFNULL(supplied_quantity, 0),
+            fulfillment_percent = IF(tender_quantity > 0, IFNULL(supplied_quantity, 0) / tender_quantity * 100, 0)
+        WHERE {" AND ".join(conditions)}
+    """, values)
+
+
+@frappe.whitelist()
+def rebuild_tender_fulfillment(tender=None):
+    """Recompute tender status quantities from the fulfillment ledger
+
+    Rebuilds a single tender when `tender` is given, otherwise every tender, using
+    one aggregate query over the ledger. Can also be run from the console:
+        bench --site [site-name] execute onco.onco.tender_fulfillment.rebuild_tender_fulfillment
+    """
+    if tender:
+        frappe.has_permission("Tenders", "write", tender, throw=True)
+    else:
+        frappe.only_for("System Manager")
+
+    tender_condition = "AND ts.parent = %(tender)s" if tender else ""
+    ledger_condition = "WHERE tender = %(tender)s" if tender else ""
+
+    # Only the first status row of an item carries its supplied quantity; duplicates get 0
+    frappe.db.sql(f"""
+        UPDATE `tabTender Status` ts
+        LEFT JOIN (
+            SELECT parent, item_name, MIN(idx) AS idx
+            FROM `tabTender Status`
+            WHERE parenttype = 'Tenders' {tender_condition.replace("ts.", "")}
+            GROUP BY parent, item_name
+        ) first_row ON first_row.parent = ts.parent AND first_row.item_name = ts.item_name AND first_row.idx = ts.idx
+        LEFT JOIN (
+            SELECT tender, item_code, SUM(qty) AS qty
+            FROM `tabTender Fulfillment Ledger`
+            {ledger_condition}
+            GROUP BY tender, item_code
+        ) ledger ON ledger.tender = first_row.parent AND ledger.item_code = first_row.item_name
+        SET ts.supplied_quantity = IFNULL(ledger.qty, 0)
+        WHERE ts.parenttype = 'Tenders' {tender_condition}
+    """, {"tender": tender})
+
+    refresh_status_figures(tender)
+
+    if tender:
+        frappe.msgprint(_("Tender status rebuilt from submitted Sales Invoices"), alert=True)
+
+    return True
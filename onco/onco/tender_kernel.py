@@ -0,0 +1,124 @@
+"""
+Frappe-free arithmetic for tender quantities, fulfillment and deviations
+
+Every function works on plain column sequences (one value per child row) and
+returns columns or totals, so it can be benchmarked and tested without a site.
+When the inputs are NumPy arrays the vectorized path is used instead of the
+pure-Python loop; NumPy is never imported unless an array is passed in.
+`Tenders` delegates its row arithmetic here.
+"""
+
+EXTRA_QTY_TYPES = ("Percent", "Quantity")
+
+
+def _is_array(values):
+	return type(values).__name__ == "ndarray"
+
+
+def _np():
+	import numpy
+	return numpy
+
+
+def apply_extra_qty(quantities, extra_qty_type, extra_qty_value):
+	"""Apply an extra quantity rule to original quantities
+
+	Returns the new quantities, or None when the rule type is unknown (the
+	quantities are then left untouched, as in Tenders.apply_extra_quantity_logic).
+	"""
+	if extra_qty_type not in EXTRA_QTY_TYPES:
+		return None
+
+	extra_qty_value = extra_qty_value or 0
+	if _is_array(quantities):
+		if extra_qty_type == "Percent":
+			return quantities + quantities * (extra_qty_value / 100)
+		return quantities + extra_qty_value
+
+	if extra_qty_type == "Percent":
+		return [(qty or 0) + (qty or 0) * (extra_qty_value / 100) for qty in quantities]
+	return [(qty or 0) + extra_qty_value for qty in quantities]
+
+
+def status_figures(tender_quantities, supplied_quantities):
+	"""Remaining quantity and fulfillment percent per tender status row
+
+	Returns a (remaining_quantities, fulfillment_percents) pair of columns.
+	"""
+	if _is_array(tender_quantities):
+		np = _np()
+		remaining = tender_quantities - supplied_quantities
+		with np.errstate(divide="ignore", invalid="ignore"):
+			percent = np.where(tender_quantities > 0, supplied_quantities / tender_quantities * 100, 0.0)
+		return remaining, percent
+
+	remaining, percent = [], []
+	for tender_qty, supplied_qty in zip(tender_quantities, supplied_quantities):
+		tender_qty, supplied_qty = tender_qty or 0, supplied_qty or 0
+		remaining.append(tender_qty - supplied_qty)
+		percent.append(supplied_qty / tender_qty * 100 if tender_qty > 0 else 0)
+	return remaining, percent
+
+
+def fulfillment_ratio(tender_quantities, supplied_quantities):
+	"""Overall supplied / tendered ratio (0 when nothing is tendered)"""
+	if _is_array(tender_quantities):
+		total_tender_qty = float(tender_quantities.sum())
+		total_supplied_qty = float(supplied_quantities.sum())
+	else:
+		total_tender_qty = sum(qty or 0 for qty in tender_quantities)
+		total_supplied_qty = sum(qty or 0 for qty in supplied_quantities)
+
+	if total_tender_qty > 0:
+		return total_supplied_qty / total_tender_qty
+	return 0
+
+
+def fulfillment_percent(tender_quantities, supplied_quantities):
+	"""Overall fulfillment percent rounded to 2 decimals, as shown on the tender"""
+	return round(fulfillment_ratio(tender_quantities, supplied_quantities) * 100, 2)
+
+
+def price_deviations(tender_prices, item_costs):
+	"""Deviation amount and percent for rows whose tender price is below cost
+
+	Returns (deviating, amounts, percents) columns. `deviating` flags the rows
+	with a non-zero tender price below item cost; amounts and percents are only
+	meaningful for those rows. Percents are rounded to 2 decimals.
+	"""
+	if _is_array(tender_prices):
+		np = _np()
+		deviating = (tender_prices != 0) & (tender_prices < item_costs)
+		amounts = np.where(deviating, item_costs - tender_prices, 0.0)
+		with np.errstate(divide="ignore", invalid="ignore"):
+			percents = np.round(np.where(deviating & (item_costs > 0), amounts / item_costs * 100, 0.0), 2)
+		return deviating, amounts, percents
+
+	deviating, amounts, percents = [], [], []
+	for tender_price, item_cost in zip(tender_prices, item_costs):
+		item_cost = item_cost or 0
+		is_deviating = bool(tender_price) and tender_price < item_cost
+		amount = item_cost - tender_price if is_deviating else 0
+		deviating.append(is_deviating)
+		amounts.append(amount)
+		percents.append(round(amount / item_cost * 100, 2) if is_deviating and item_cost > 0 else 0)
+	return deviating, amounts, percents
+
+
+def deviation_summary(deviation_amounts, deviation_statuses):
+	"""Totals shown in the tender price deviation summary"""
+	if _is_array(deviation_amounts):
+		total_deviation = float(deviation_amounts.sum())
+		pending_approval = int((deviation_statuses == "Pending Approval").sum())
+		approved_deviations = int((deviation_statuses == "Approved").sum())
+	else:
+		total_deviation = sum(amount or 0 for amount in deviation_amounts)
+		pending_approval = sum(1 for status in deviation_statuses if status == "Pending Approval")
+		approved_deviations = sum(1 for status in deviation_statuses if status == "Approved")
+
+	return {
+		"total_deviation": total_deviation,
+		"total_items_with_deviation": len(deviation_amounts),
+		"pending_approval": pending_approval,
+		"approved_deviations": approved_deviations
+	}
@@ -0,0 +1,142 @@
+"""
+Per-step timing of the Tenders validate pipeline
+
+Profiling is off by default and costs one flag check per step. Enable it with
+`"onco_profile_tender_validate": 1` in site_config.json, by setting
+`frappe.flags.profile_tender_validate`, or per request with the
+`X-Onco-Profile: 1` header. When enabled, each step's wall time and database
+query count is:
+
+- returned in the `X-Onco-Tender-Profile` response header (when the request
+  supports response headers),
+- aggregated per site, by tender type and size, into a cached summary that
+  System Managers can read with `get_tender_validate_profile`.
+"""
+
+import json
+import time
+
+import frappe
+
+PROFILE_CACHE_KEY = "onco_tender_validate_profile"
+PROFILE_HEADER = "X-Onco-Tender-Profile"
+
+# Upper bounds (exclusive) of the row count buckets used to group tender sizes
+SIZE_BUCKETS = (50, 200, 500, 1000)
+
+
+def is_profiling_enabled():
+	if frappe.flags.get("profile_tender_validate") or frappe.conf.get("onco_profile_tender_validate"):
+		return True
+	try:
+		return frappe.get_request_header("X-Onco-Profile") == "1"
+	except Exception:
+		# No request context (background job, console)
+		return False
+
+
+class TenderValidateProfiler:
+	"""Run validate steps, recording wall time and query count per step when enabled"""
+
+	def __init__(self, doc):
+		self.doc = doc
+		self.enabled = is_profiling_enabled()
+		self.steps = []
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc, tb):
+		if self.enabled and self.steps and not exc_type:
+			self.publish()
+		return False
+
+	def run(self, step):
+		if not self.enabled:
+			return step()
+
+		queries = 0
+		db = frappe.db
+		sql = db.sql
+		# frappe.db.sql may already be wrapped on the instance (e.g. by a test)
+		sql_was_patched = "sql" in db.__dict__
+
+		def counting_sql(*args, **kwargs):
+			nonlocal queries
+			queries += 1
+			return sql(*args, **kwargs)
+
+		db.sql = counting_sql
+		start = time.perf_counter()
+		try:
+			return step()
+		finally:
+			elapsed = time.perf_counter() - start
+			if sql_was_patched:
+				db.sql = sql
+			else:
+				del db.sql
+			self.steps.append({
+				"step": step.__name__,
+				"time_ms": round(elapsed * 1000, 3),
+				"queries": queries
+			})
+
+	def get_shape(self):
+		"""Tender type and row-count bucket used to group the aggregated summary"""
+		rows = sum(len(self.doc.get(table) or []) for table in ("items_fmd", "item_tender", "tender_supplier"))
+		bucket = next((f"<{bound}" for bound in SIZE_BUCKETS if rows < bound), f">={SIZE_BUCKETS[-1]}")
+		return f"{self.doc.tender_type or 'Unknown'} ({bucket} rows)"
+
+	def publish(self):
+		shape = self.get_shape()
+
+		response_headers = getattr(frappe.local, "response_headers", None)
+		if response_headers is not None:
+			response_headers[PROFILE_HEADER] = json.dumps({"shape": shape, "steps": self.steps})
+
+		record_profile(shape, self.steps)
+
+
+def record_profile(shape, steps):
+	"""Fold one validate run into the per-site summary"""
+	cache = frappe.cache()
+	for step in steps:
+		key = f"{shape}|{step['step']}"
+		stats = cache.hget(PROFILE_CACHE_KEY, key) or {
+			"runs": 0, "total_time_ms": 0, "max_time_ms": 0, "total_queries": 0, "max_queries": 0
+		}
+		stats["runs"] += 1
+		stats["total_time_ms"] += step["time_ms"]
+		stats["max_time_ms"] = max(stats["max_time_ms"], step["time_ms"])
+		stats["total_queries"] += step["queries"]
+		stats["max_queries"] = max(stats["max_queries"], step["queries"])
+		cache.hset(PROFILE_CACHE_KEY, key, stats)
+
+
+@frappe.whitelist()
+def get_tender_validate_profile():
+	"""Return the aggregated per-step profile, slowest average step first"""
+	frappe.only_for("System Manager")
+
+	summary = []
+	for key, stats in (frappe.cache().hgetall(PROFILE_CACHE_KEY) or {}).items():
+		key = frappe.safe_decode(key)
+		shape, step = key.rsplit("|", 1)
+		summary.append({
+			"shape": shape,
+			"step": step,
+			"runs": stats["runs"],
+			"avg_time_ms": round(stats["total_time_ms"] / stats["runs"], 3),
+			"max_time_ms": stats["max_time_ms"],
+			"avg_queries": round(stats["total_queries"] / stats["runs"], 2),
+			"max_queries": stats["max_queries"]
+		})
+
+	return sorted(summary, key=lambda row: row["avg_time_ms"], reverse=True)
+
+
+@frappe.whitelist()
+def reset_tender_validate_profile():
+	frappe.only_for("System Manager")
+	frappe.cache().delete_value(PROFILE_CACHE_KEY)
@@ -0,0 +1,189 @@
+"""
+What-if simulation of tender extra-quantity rules
+
+Loads the item tables of many tenders at once into NumPy arrays and applies
+candidate `extra_qty_type` / `extra_qty_value` scenarios in bulk, mirroring
+`Tenders.apply_extra_quantity_logic` without writing anything.
+"""
+
+import json
+
+import frappe
+from frappe import _
+from frappe.utils import nowdate
+
+from onco.onco.tender_kernel import apply_extra_qty
+
+# Tender type -> (child doctype, parentfield, item field, quantity field, original quantity field),
+# the tables Tenders.apply_extra_quantity_logic changes; Tender Submission has none
+TENDER_QTY_TABLES = {
+	"Tenders for market data": ("Items FMD", "items_fmd", "item", "quantity", "original_quantity"),
+	"Awarded Tenders": ("Item Tender", "item_tender", "item_code", "tender_qty", "original_qty"),
+	"Accepted Tenders": ("Tender Supplier", "tender_supplier", "item_code", "supply_qty", "original_supply_qty"),
+}
+
+
+@frappe.whitelist()
+def simulate_extra_quantity_rules(scenarios, tenders=None):
+	"""Project the effect of extra-quantity scenarios on required stock and losses
+
+	Args:
+		scenarios: JSON list of {"extra_qty_type": "Percent"|"Quantity", "extra_qty_value": float}
+		tenders: optional JSON list of tender names; defaults to every open tender
+
+	Returns:
+		list with one result per scenario: quantity totals, affected items, the
+		projected loss delta (valuation cost above tender price times extra
+		quantity) and a per-tender breakdown.
+	"""
+	frappe.has_permission("Tenders", "read", throw=True)
+
+	scenarios = parse_scenarios(scenarios)
+	if isinstance(tenders, str):
+		tenders = json.loads(tenders)
+
+	tender_names, columns = load_tender_quantities(tenders)
+	return run_scenarios(tender_names, columns, scenarios)
+
+
+def parse_scenarios(scenarios):
+	"""Validate and normalise scenario definitions"""
+	if isinstance(scenarios, str):
+		scenarios = json.loads(scenarios)
+	if isinstance(scenarios, dict):
+		scenarios = [scenarios]
+
+	parsed = []
+	for scenario in scenarios or []:
+		extra_qty_type = scenario.get("extra_qty_type")
+		if extra_qty_type not in ("Percent", "Quantity"):
+			frappe.throw(_("Extra Quantity Type must be Percent or Quantity, got {0}").format(extra_qty_type))
+		parsed.append(frappe._dict({
+			"extra_qty_type": extra_qty_type,
+			"extra_qty_value": frappe.utils.flt(scenario.get("extra_qty_value"))
+		}))
+
+	if not parsed:
+		frappe.throw(_("At least one scenario is required"))
+
+	return parsed
+
+
+def get_open_tenders():
+	"""Non-cancelled tenders whose end date has not passed"""
+	return frappe.get_all("Tenders",
+		filters={"docstatus": ["<", 2]},
+		or_filters=[
+			["tender_end_date", ">=", nowdate()],
+			["tender_end_date", "is", "not set"]
+		],
+		pluck="name")
+
+
+def load_tender_quantities(tenders=None):
+	"""Load the quantity rows of the given tenders into column arrays
+
+	Issues one query for the tenders and one per child table, whatever the
+	number of tenders. Returns the ordered tender names and a dict of NumPy
+	arrays: tender (position in tender names), item, qty (the original quantity
+	the rule is applied to), price and cost.
+	"""
+	import numpy as np
+	from onco.onco.doctype.tenders.tenders import get_item_pricing
+
+	if tenders is None:
+		tenders = get_open_tenders()
+
+	tender_types = dict(frappe.get_all("Tenders",
+		filters={"name": ["in", tenders]},
+		fields=["name", "tender_type"],
+		as_list=True)) if tenders else {}
+	tender_names = list(tender_types)
+	position = {name: i for i, name in enumerate(tender_names)}
+
+	tender_pos, items, qtys, prices = [], [], [], []
+	for doctype, parentfield, item_field, qty_field, original_field in TENDER_QTY_TABLES.values():
+		parents = [
+			name for name, tender_type in tender_types.items()
+			if TENDER_QTY_TABLES.get(tender_type, (None, None))[1] == parentfield
+		]
+		meta = frappe.get_meta(doctype)
+		# The rule only changes rows that carry the quantity field
+		if not parents or not meta.has_field(qty_field):
+			continue
+
+		fields = ["parent", f"{qty_field} as qty"]
+		if meta.has_field(item_field):
+			fields.append(f"{item_field} as item")
+		# The rule starts from the original quantity, falling back to the current one
+		if meta.has_field(original_field):
+			fields.append(f"{original_field} as original_qty")
+		# Item Tender has no tender_price column on sites without the customization
+		if meta.has_field("tender_price"):
+			fields.append("tender_price as price")
+
+		for row in frappe.get_all(doctype,
+			filters={"parenttype": "Tenders", "parentfield": parentfield, "parent": ["in", parents]},
+			fields=fields):
+			tender_pos.append(position[row.parent])
+			items.append(row.get("item"))
+			qtys.append(row.get("original_qty") or row.qty or 0)
+			prices.append(row.get("price") or 0)
+
+	# Items FMD rows hold free-text item names; only real item codes get a cost
+	item_pricing = get_item_pricing(items)
+	costs = [
+		(item_pricing[item].valuation_rate or 0) if item in item_pricing else 0
+		for item in items
+	]
+
+	return tender_names, {
+		"tender": np.array(tender_pos, dtype=np.int64),
+		"item": np.array(items, dtype=object),
+		"qty": np.array(qtys, dtype=np.float64),
+		"price": np.array(prices, dtype=np.float64),
+		"cost": np.array(costs, dtype=np.float64),
+	}
+
+
+def run_scenarios(tender_names, columns, scenarios):
+	"""Apply each scenario to the loaded columns; pure computation, no database access"""
+	import numpy as np
+
+	tender_count = len(tender_names)
+	base_qty = columns["qty"]
+	# Same loss rule as populate_tender_price_deviation_details: cost above tender price
+	unit_loss = np.where(columns["price"] < columns["cost"], columns["cost"] - columns["price"], 0.0)
+
+	results = []
+	for scenario in scenarios:
+		projected_qty = apply_extra_qty(base_qty, scenario.extra_qty_type, scenario.extra_qty_value)
+		extra_qty = projected_qty - base_qty
+		loss_delta = unit_loss * extra_qty
+		affected = extra_qty != 0
+
+		per_tender_qty = np.bincount(columns["tender"], weights=projected_qty, minlength=tender_count)
+		per_tender_extra = np.bincount(columns["tender"], weights=extra_qty, minlength=tender_count)
+		per_tender_loss = np.bincount(columns["tender"], weights=loss_delta, minlength=tender_count)
+
+		results.append({
+			"extra_qty_type": scenario.extra_qty_type,
+			"extra_qty_value": scenario.extra_qty_value,
+			"total_original_qty": float(base_qty.sum()),
+			"total_projected_qty": float(projected_qty.sum()),
+			"total_extra_qty": float(extra_qty.sum()),
+			"affected_rows": int(affected.sum()),
+			"affected_items": sorted({item for item in columns["item"][affected] if item}),
+			"loss_delta": float(loss_delta.sum()),
+			"tenders": [
+				{
+					"tender": tender_names[i],
+					"projected_qty": float(per_tender_qty[i]),
+					"extra_qty": float(per_tender_extra[i]),
+					"loss_delta": float(per_tender_loss[i])
+				}
+				for i in range(tender_count)
+			]
+		})
+
+	return results
@@ -1,20 +1,17 @@
 import frappe
 from frappe import _
 
+TENDER_PRICE_INDEX_CACHE_KEY = "onco_tender_price_index"
+
+
 def validate_sales_invoice_tender_price(doc, method):
     """
     Block Sales Invoice submission if item prices deviate from Tender prices
     without explicit manager approval and detailed reasoning.
     """
     if doc.get("custom_tender_ref"):
-        tender = frappe.get_doc("Tenders", doc.custom_tender_ref)
-        
-        # Build map of tender prices
-        tender_prices = {}
-        for row in tender.item_tender or []:
-            if row.item_code:
-                tender_prices[row.item_code] = row.tender_price
-            
+        tender_prices = get_tender_price_index(doc.custom_tender_ref)["prices"]
+
         for item in doc.items:
             if item.item_code in tender_prices:
                 t_price = tender_prices[item.item_code]
@@ -32,6 +29,155 @@ def validate_sales_invoice_tender_price(doc, method):
                     if not doc.get("custom_approved_by"):
                         frappe.throw(_("Please specify which manager approved this price deviation in 'Approved By'."))
 
-                    # Log deviation to Tender (for the price deviation details table)
-                    tender.update_deviation_details(doc.name, [item])
-                    tender.save(ignore_permissions=True)
+
+def post_sales_invoice_deviations(doc, method):
+    """Append one Tender Deviation Ledger entry per invoice line sold below the tender price
+
+    Runs on Sales Invoice submit. The tender itself is never loaded or saved, so
+    invoices against the same tender do not contend for its row lock.
+    """
+    if not doc.get("custom_tender_ref"):
+        return
+
+    from onco.onco.doctype.tenders.tenders import get_item_pricing
+
+    tender_prices = get_tender_price_index(doc.custom_tender_ref)["prices"]
+    deviating_items = [
+        item for item in doc.items
+        if item.item_code in tender_prices and item.rate < (tender_prices[item.item_code] or 0)
+    ]
+    if not deviating_items:
+        return
+
+    item_pricing = get_item_pricing([item.item_code for item in deviating_items])
+
+    for item in deviating_items:
+        # Use valuation rate as cost if available
+        pricing = item_pricing.get(item.item_code)
+        item_cost = (pricing.valuation_rate if pricing else 0) or 0
+
+        # Losses = (Cost - Rate) * Qty if rate < cost
+        losses = (item_cost - item.rate) * item.qty if item.rate < item_cost else 0
+
+        frappe.get_doc({
+            "doctype": "Tender Deviation Ledger",
+            "tender": doc.custom_tender_ref,
+            "item_code": item.item_code,
+            "sales_invoice": doc.name,
+            "sales_invoice_item": item.name,
+            "posting_date": doc.posting_date,
+            "tender_price": tender_prices[item.item_code],
+            "rate": item.rate,
+            "item_cost": item_cost,
+            "quantity_with_loss": item.qty,
+            "losses_value": losses,
+            "approved_status": "Approved" if doc.get("custom_price_deviation_approved") else "Pending",
+            "approved_by": doc.get("custom_approved_by"),
+            "cause_of_deviation": doc.get("custom_cause_of_deviation")
+        }).insert(ignore_permissions=True)
+
+
+def reverse_sales_invoice_deviations(doc, method):
+    """Append reversing ledger entries for a cancelled Sales Invoice
+
+    Reverses the net balance of every invoice line, so negative (return) entries are
+    reversed too and a repeated cancel hook posts nothing.
+    """
+    if not doc.get("custom_tender_ref"):
+        return
+
+    entries = frappe.get_all("Tender Deviation Ledger",
+        filters={"sales_invoice": doc.name},
+        fields=["*"],
+        order_by="creation asc")
+
+    balances = {}
+    for entry in entries:
+        key = entry.sales_invoice_item or entry.name
+        if key not in balances:
+            # The first entry of a line is the posting; it supplies the reversal details
+            balances[key] = frappe._dict(entry=entry, quantity_with_loss=0, losses_value=0)
+        balances[key].quantity_with_loss += entry.quantity_with_loss or 0
+        balances[key].losses_value += entry.losses_value or 0
+
+    for balance in balances.values():
+        if not balance.quantity_with_loss and not balance.losses_value:
+            continue
+
+        reversal = {key: balance.entry[key] for key in (
+            "tender", "item_code", "sales_invoice", "sales_invoice_item", "posting_date",
+            "tender_price", "rate", "item_cost", "approved_status", "approved_by", "cause_of_deviation"
+        )}
+        reversal.update({
+            "doctype": "Tender Deviation Ledger",
+            "quantity_with_loss": -balance.quantity_with_loss,
+            "losses_value": -balance.losses_value
+        })
+        frappe.get_doc(reversal).insert(ignore_permissions=True)
+
+
+@frappe.whitelist()
+def get_tender_deviation_losses(tender=None, group_by_item=False):
+    """Aggregate deviation losses from the Tender Deviation Ledger
+
+    Returns one row per tender (or per tender and item when `group_by_item` is set)
+    with the net quantity sold at a loss and the net losses value.
+    """
+    if tender:
+        frappe.has_permission("Tenders", "read", tender, throw=True)
+    else:
+        frappe.has_permission("Tenders", "read", throw=True)
+
+    group_by_item = frappe.utils.cint(group_by_item)
+    group_fields = "tender, item_code" if group_by_item else "tender"
+
+    return frappe.db.sql(f"""
+        SELECT {group_fields},
+            SUM(quantity_with_loss) AS quantity_with_loss,
+            SUM(losses_value) AS losses_value
+        FROM `tabTender Deviation Ledger`
+        {"WHERE tender = %(tender)s" if tender else ""}
+        GROUP BY {group_fields}
+    """, {"tender": tender}, as_dict=True)
+
+
+def get_tender_price_index(tender):
+    """Return the compiled price index of a tender from the site cache
+
+    The index is a dict with the tender's `modified` timestamp and `prices`,
+    a map of item_code -> tender_price. It is built from the Item Tender
+    rows only (no full document load) and dropped by `clear_tender_price_index`
+    whenever the tender is updated.
+    """
+    index = frappe.cache().hget(TENDER_PRICE_INDEX_CACHE_KEY, tender)
+    if index is None:
+        index = build_tender_price_index(tender)
+        frappe.cache().hset(TENDER_PRICE_INDEX_CACHE_KEY, tender, index)
+    return index
+
+
+def build_tender_price_index(tender):
+    """Build the item_code -> tender_price map of a tender with a single child table query"""
+    prices = {}
+    # Item Tender has no tender_price column on sites without the customization
+    if frappe.get_meta("Item Tender").has_field("tender_price"):
+        rows = frappe.get_all("Item Tender",
+            filters={"parent": tender, "parenttype": "Tenders", "parentfield": "item_tender"},
+            fields=["item_code", "tender_price"],
+            order_by="idx asc")
+
+        # Later rows win, matching the order rows appear on the tender
+        prices = {row.item_code: row.tender_price for row in rows if row.item_code}
+
+    return {
+        "modified": str(frappe.db.get_value("Tenders", tender, "modified")),
+        "prices": prices
+    }
+
+
+def clear_tender_price_index(tender=None):
+    """Drop the cached price index of one tender, or of every tender"""
+    if tender:
+        frappe.cache().hdel(TENDER_PRICE_INDEX_CACHE_KEY, tender)
+    else:
+        frappe.cache().delete_value(TENDER_PRICE_INDEX_CACHE_KEY)
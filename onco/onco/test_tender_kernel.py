@@ -0,0 +1,78 @@
+# Copyright (c) 2026, ds and Contributors
+# See license.txt
+
+import unittest
+
+from onco.onco import tender_kernel
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+
+class TestTenderKernel(unittest.TestCase):
+	"""Test the Frappe-free tender arithmetic"""
+
+	def test_apply_extra_qty_percent(self):
+		self.assertEqual(tender_kernel.apply_extra_qty([100, 0, None], "Percent", 10), [110, 0, 0])
+
+	def test_apply_extra_qty_quantity(self):
+		self.assertEqual(tender_kernel.apply_extra_qty([100, 0], "Quantity", 25), [125, 25])
+
+	def test_apply_extra_qty_unknown_type(self):
+		self.assertIsNone(tender_kernel.apply_extra_qty([100], "Other", 25))
+
+	def test_status_figures(self):
+		remaining, percent = tender_kernel.status_figures([100, 0, 50], [25, 0, None])
+		self.assertEqual(remaining, [75, 0, 50])
+		self.assertEqual(percent, [25, 0, 0])
+
+	def test_fulfillment(self):
+		self.assertEqual(tender_kernel.fulfillment_ratio([100, 100], [80, 80]), 0.8)
+		self.assertEqual(tender_kernel.fulfillment_percent([300], [100]), 33.33)
+		self.assertEqual(tender_kernel.fulfillment_percent([0], [0]), 0)
+
+	def test_price_deviations(self):
+		deviating, amounts, percents = tender_kernel.price_deviations([80, 120, 0], [100, 100, 100])
+		self.assertEqual(deviating, [True, False, False])
+		self.assertEqual(amounts[0], 20)
+		self.assertEqual(percents[0], 20)
+
+	def test_deviation_summary(self):
+		summary = tender_kernel.deviation_summary([20, 50], ["Pending Approval", "Approved"])
+		self.assertEqual(summary, {
+			"total_deviation": 70,
+			"total_items_with_deviation": 2,
+			"pending_approval": 1,
+			"approved_deviations": 1
+		})
+
+	@unittest.skipUnless(np, "NumPy is not installed")
+	def test_numpy_path_matches_python_path(self):
+		tender_qty = [100.0, 0.0, 50.0, 300.0]
+		supplied_qty = [25.0, 0.0, 50.0, 100.0]
+		prices = [80.0, 120.0, 0.0, 99.5]
+		costs = [100.0, 100.0, 100.0, 100.0]
+		statuses = ["Pending Approval", "Approved", "Rejected", "Approved"]
+
+		self.assertEqual(
+			list(tender_kernel.apply_extra_qty(np.array(tender_qty), "Percent", 10)),
+			tender_kernel.apply_extra_qty(tender_qty, "Percent", 10))
+
+		for array_column, list_column in zip(
+			tender_kernel.status_figures(np.array(tender_qty), np.array(supplied_qty)),
+			tender_kernel.status_figures(tender_qty, supplied_qty)):
+			self.assertEqual(list(array_column), list_column)
+
+		for array_column, list_column in zip(
+			tender_kernel.price_deviations(np.array(prices), np.array(costs)),
+			tender_kernel.price_deviations(prices, costs)):
+			self.assertEqual(list(array_column), list_column)
+
+		self.assertEqual(
+			tender_kernel.fulfillment_percent(np.array(tender_qty), np.array(supplied_qty)),
+			tender_kernel.fulfillment_percent(tender_qty, supplied_qty))
+		self.assertEqual(
+			tender_kernel.deviation_summary(np.array(costs), np.array(statuses, dtype=object)),
+			tender_kernel.deviation_summary(costs, statuses))
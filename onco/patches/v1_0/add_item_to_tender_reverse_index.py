@@ -0,0 +1,8 @@
+from onco.onco.doctype.item_tender.item_tender import on_doctype_update as add_item_tender_index
+from onco.onco.doctype.tender_price_deviation.tender_price_deviation import on_doctype_update as add_deviation_index
+
+
+def execute():
+	"""Add the item -> tender reverse indexes used by the nightly cost-drift scan"""
+	add_item_tender_index()
+	add_deviation_index()
@@ -0,0 +1,10 @@
+import frappe
+
+
+def execute():
+	"""Index Sales Invoice Item for the per-item "last sale" lookup used by Accepted Tenders"""
+	frappe.db.add_index(
+		"Sales Invoice Item",
+		["item_code", "docstatus", "creation"],
+		index_name="item_code_docstatus_creation_index"
+	)
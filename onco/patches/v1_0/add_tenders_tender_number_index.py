@@ -0,0 +1,6 @@
+from onco.onco.doctype.tenders.tenders import on_doctype_update
+
+
+def execute():
+	"""Add the (tender_number, tender_type, docstatus) index used to find awarded tenders"""
+	on_doctype_update()
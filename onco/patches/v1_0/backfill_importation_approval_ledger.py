@@ -0,0 +1,57 @@
+import frappe
+from frappe.utils import now
+
+
+def execute():
+	"""Post already submitted approval-linked Purchase Orders to the Importation Approval Ledger"""
+	if not frappe.db.has_column("Purchase Order", "custom_importation_approval"):
+		return
+
+	# Quantities are charged to the first approval row of each item
+	rows = frappe.db.sql("""
+		SELECT po.custom_importation_approval AS importation_approval, first_row.name AS importation_approvals_item,
+			poi.item_code, SUM(poi.qty) AS qty, po.name AS purchase_order, po.transaction_date
+		FROM `tabPurchase Order Item` poi
+		INNER JOIN `tabPurchase Order` po ON po.name = poi.parent
+		INNER JOIN `tabImportation Approvals Item` first_row
+			ON first_row.parent = po.custom_importation_approval
+			AND first_row.parenttype = 'Importation Approvals'
+			AND first_row.item_code = poi.item_code
+			AND first_row.idx = (
+				SELECT MIN(iai.idx) FROM `tabImportation Approvals Item` iai
+				WHERE iai.parent = first_row.parent AND iai.parenttype = 'Importation Approvals'
+				AND iai.item_code = first_row.item_code
+			)
+		WHERE po.docstatus = 1
+		AND IFNULL(po.custom_importation_approval, '') != ''
+		AND IFNULL(poi.item_code, '') != ''
+		AND NOT EXISTS (
+			SELECT 1 FROM `tabImportation Approval Ledger` ial WHERE ial.purchase_order = po.name
+		)
+		GROUP BY po.name, poi.item_code, first_row.name
+	""", as_dict=True)
+
+	timestamp = now()
+	values = [
+		(frappe.generate_hash(length=10), timestamp, timestamp, "Administrator", "Administrator",
+			row.importation_approval, row.importation_approvals_item, row.item_code, row.qty,
+			row.purchase_order, row.transaction_date)
+		for row in rows
+	]
+
+	frappe.db.bulk_insert("Importation Approval Ledger",
+		fields=["name", "creation", "modified", "owner", "modified_by", "importation_approval",
+			"importation_approvals_item", "item_code", "qty", "purchase_order", "transaction_date"],
+		values=values)
+
+	from onco.onco.importation_consumption import carry_forward_consumption, rebuild_importation_consumption
+	frappe.set_user("Administrator")
+	rebuild_importation_consumption()
+
+	# Carry consumption along existing modification/extension chains, oldest version first
+	carried = set(frappe.get_all("Importation Approval Ledger",
+		filters={"carried_from": ["is", "set"]}, pluck="importation_approval", distinct=True))
+	for name in frappe.get_all("Importation Approvals",
+		filters={"original_document": ["is", "set"]}, order_by="lineage_root, lineage_version", pluck="name"):
+		if name not in carried:
+			carry_forward_consumption(frappe.get_doc("Importation Approvals", name))
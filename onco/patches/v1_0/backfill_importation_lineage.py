@@ -0,0 +1,36 @@
+import frappe
+
+from onco.onco.importation_lineage import LINEAGE_DOCTYPES, add_lineage_index
+
+
+def execute():
+	"""Index and backfill lineage_root / lineage_version by walking original_document chains once"""
+	for doctype in LINEAGE_DOCTYPES:
+		add_lineage_index(doctype)
+
+		parents = dict(frappe.db.sql(f"SELECT name, original_document FROM `tab{doctype}`"))
+		lineage = {}
+
+		def resolve(name):
+			chain = []
+			while name not in lineage:
+				parent = parents.get(name)
+				if not parent or parent not in parents or parent in chain or parent == name:
+					lineage[name] = (name, 0)
+					break
+				chain.append(name)
+				name = parent
+			root, version = lineage[name]
+			for child in reversed(chain):
+				version += 1
+				lineage[child] = (root, version)
+
+		for name in parents:
+			resolve(name)
+
+		for name, (root, version) in lineage.items():
+			frappe.db.sql(f"""
+				UPDATE `tab{doctype}`
+				SET lineage_root = %s, lineage_version = %s
+				WHERE name = %s
+			""", (root, version, name))
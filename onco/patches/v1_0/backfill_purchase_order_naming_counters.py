@@ -0,0 +1,38 @@
+import re
+
+import frappe
+from frappe.utils import now
+
+PO_NAME_PATTERN = re.compile(r"^PO-(\d{4})-(\d+)-(\d+)$")
+
+
+def execute():
+	"""Seed Purchase Order Naming Counter from the highest XXXX / ZZZ already issued"""
+	rows = frappe.db.sql("""
+		SELECT po.name, poi.item_code
+		FROM `tabPurchase Order` po
+		INNER JOIN `tabPurchase Order Item` poi ON poi.parent = po.name AND poi.idx = 1
+		WHERE po.name LIKE 'PO-%%'
+	""", as_dict=True)
+
+	counters = {}
+	for row in rows:
+		match = PO_NAME_PATTERN.match(row.name)
+		if not match:
+			continue
+
+		year, xxxx, zzz = match.group(1), int(match.group(2)), int(match.group(3))
+		year_key = f"YEAR-{year}"
+		counters[year_key] = max(counters.get(year_key, 0), xxxx)
+		if row.item_code:
+			item_key = f"ITEM-{row.item_code}"
+			counters[item_key] = max(counters.get(item_key, 0), zzz)
+
+	timestamp = now()
+	for key, current in counters.items():
+		frappe.db.sql("""
+			INSERT INTO `tabPurchase Order Naming Counter`
+				(name, current, creation, modified, owner, modified_by)
+			VALUES (%s, %s, %s, %s, 'Administrator', 'Administrator')
+			ON DUPLICATE KEY UPDATE current = GREATEST(current, VALUES(current))
+		""", (key, current, timestamp, timestamp))
@@ -0,0 +1,38 @@
+import frappe
+from frappe.utils import now
+
+
+def execute():
+	"""Post already submitted tender Sales Invoices to the Tender Fulfillment Ledger"""
+	if not frappe.db.has_column("Sales Invoice", "custom_tender_ref"):
+		return
+
+	rows = frappe.db.sql("""
+		SELECT si.custom_tender_ref AS tender, sii.item_code, SUM(sii.qty) AS qty,
+			si.name AS sales_invoice, si.posting_date
+		FROM `tabSales Invoice Item` sii
+		INNER JOIN `tabSales Invoice` si ON si.name = sii.parent
+		WHERE si.docstatus = 1
+		AND IFNULL(si.custom_tender_ref, '') != ''
+		AND IFNULL(sii.item_code, '') != ''
+		AND NOT EXISTS (
+			SELECT 1 FROM `tabTender Fulfillment Ledger` tfl WHERE tfl.sales_invoice = si.name
+		)
+		GROUP BY si.name, sii.item_code
+	""", as_dict=True)
+
+	timestamp = now()
+	values = [
+		(frappe.generate_hash(length=10), timestamp, timestamp, "Administrator", "Administrator",
+			row.tender, row.item_code, row.qty, row.sales_invoice, row.posting_date)
+		for row in rows
+	]
+
+	frappe.db.bulk_insert("Tender Fulfillment Ledger",
+		fields=["name", "creation", "modified", "owner", "modified_by",
+			"tender", "item_code", "qty", "sales_invoice", "posting_date"],
+		values=values)
+
+	from onco.onco.tender_fulfillment import rebuild_tender_fulfillment
+	frappe.set_user("Administrator")
+	rebuild_tender_fulfillment()
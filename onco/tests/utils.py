@@ -0,0 +1,21 @@
+# Copyright (c) 2026, Onco and Contributors
+# See license.txt
+
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import frappe
+
+
+@contextmanager
+def count_queries():
+	"""Count the SQL queries run inside the block
+
+	Yields the wrapped `frappe.db.sql`; read `.call_count` after the block, e.g.
+
+		with count_queries() as queries:
+			doc.validate()
+		self.assertLessEqual(queries.call_count, 2)
+	"""
+	with patch.object(frappe.db, "sql", wraps=frappe.db.sql) as sql:
+		yield sql